@@ -13,9 +13,12 @@ Este módulo ilustra as 4 etapas fundamentais do RAG:
 
 import streamlit as st
 import numpy as np
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
+import atexit
 import os
+import shutil
 import sys
+import tempfile
 
 # Adiciona o diretório raiz ao path para imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -35,6 +38,7 @@ from utils.text_processing import (
     chunk_text,
     count_tokens_approximate
 )
+from utils.vector_search import CompressedVectorIndex, VectorSearchIndex
 from services.llm_provider import (
     LLMConfig,
     EmbeddingConfig,
@@ -83,6 +87,18 @@ def initialize_session_state():
     if "rag_classic_embeddings" not in st.session_state:
         st.session_state.rag_classic_embeddings = None
     
+    if "rag_classic_search_index" not in st.session_state:
+        st.session_state.rag_classic_search_index = None
+    
+    if "rag_classic_vector_storage" not in st.session_state:
+        st.session_state.rag_classic_vector_storage = "float32"
+    
+    if "rag_classic_embeddings_file" not in st.session_state:
+        st.session_state.rag_classic_embeddings_file = None
+    
+    if "rag_classic_spill_dir" not in st.session_state:
+        st.session_state.rag_classic_spill_dir = None
+    
     if "rag_classic_query_results" not in st.session_state:
         st.session_state.rag_classic_query_results = None
 
@@ -91,59 +107,119 @@ initialize_session_state()
 
 # ==================== FUNÇÕES AUXILIARES ====================
 
-def calculate_cosine_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
+SearchIndex = Union[VectorSearchIndex, CompressedVectorIndex]
+
+
+def build_search_index(embeddings: np.ndarray, storage: str) -> SearchIndex:
     """
-    Calcula similaridade cosseno entre dois vetores.
+    Constrói o índice de busca no formato de armazenamento escolhido.
     
-    Args:
-        vec1: Primeiro vetor
-        vec2: Segundo vetor
-        
-    Returns:
-        Similaridade cosseno (0 a 1)
+    Em "float32" o índice guarda a matriz normalizada. Em "float16" e "int8"
+    o índice guarda apenas os vetores comprimidos e reordena os melhores
+    candidatos com `embeddings` em precisão total.
     """
-    dot_product = np.dot(vec1, vec2)
-    norm1 = np.linalg.norm(vec1)
-    norm2 = np.linalg.norm(vec2)
+    if storage == "float32":
+        return VectorSearchIndex(embeddings)
+    return CompressedVectorIndex(embeddings, dtype=storage, full_precision=embeddings)
+
+
+def get_spill_dir() -> str:
+    """
+    Diretório temporário da sessão para os embeddings gravados em disco.
     
-    if norm1 == 0 or norm2 == 0:
-        return 0.0
+    Removido ao encerrar o processo (atexit): arquivos de sessões abandonadas,
+    que nunca limparam os embeddings, não ficam no diretório temporário.
+    """
+    path = st.session_state.rag_classic_spill_dir
+    if path is None or not os.path.isdir(path):
+        path = tempfile.mkdtemp(prefix="rag_classic_")
+        atexit.register(shutil.rmtree, path, ignore_errors=True)
+        st.session_state.rag_classic_spill_dir = path
+    return path
+
+
+def spill_embeddings_to_disk(embeddings: np.ndarray) -> np.ndarray:
+    """
+    Grava os embeddings (float32) em um arquivo temporário e os reabre mapeados
+    em memória: a sessão guarda só o índice comprimido, e os vetores originais
+    são lidos do disco apenas para reordenar os candidatos.
+    """
+    fd, path = tempfile.mkstemp(prefix="embeddings_", suffix=".npy", dir=get_spill_dir())
+    os.close(fd)
+    np.save(path, embeddings)
+    st.session_state.rag_classic_embeddings_file = path
+    return np.load(path, mmap_mode="r")
+
+
+def clear_embeddings() -> None:
+    """
+    Descarta os embeddings da sessão, o índice de busca e o arquivo temporário dos vetores.
     
-    return dot_product / (norm1 * norm2)
+    Se o arquivo ainda estiver mapeado em memória por alguma referência viva
+    (no Windows, os.remove falha com PermissionError), ele fica para a limpeza
+    do diretório da sessão ao encerrar o processo (get_spill_dir).
+    """
+    path = st.session_state.rag_classic_embeddings_file
+    # Referências ao memmap soltas antes de apagar o arquivo
+    st.session_state.rag_classic_embeddings = None
+    st.session_state.rag_classic_search_index = None
+    st.session_state.rag_classic_query_results = None
+    st.session_state.rag_classic_embeddings_file = None
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def get_search_index() -> SearchIndex:
+    """
+    Retorna o índice de busca dos embeddings da sessão, construindo-o se necessário.
+    
+    O índice guarda a matriz já normalizada, então é construído uma única vez
+    por conjunto de embeddings e reutilizado em todas as buscas.
+    """
+    index = st.session_state.rag_classic_search_index
+    if index is None or len(index) != len(st.session_state.rag_classic_embeddings):
+        index = build_search_index(
+            st.session_state.rag_classic_embeddings,
+            st.session_state.rag_classic_vector_storage
+        )
+        st.session_state.rag_classic_search_index = index
+    return index
 
 
 def search_similar_chunks(
     query_embedding: np.ndarray,
-    chunk_embeddings: np.ndarray,
+    search_index: SearchIndex,
     chunks: List[str],
     top_k: int = 5
 ) -> List[Dict[str, Any]]:
     """
     Busca chunks mais similares à query usando similaridade cosseno.
     
+    A busca é vetorizada: um único produto matriz-vetor sobre os embeddings
+    pré-normalizados e seleção dos Top-K com argpartition.
+    
     Args:
         query_embedding: Embedding da query
-        chunk_embeddings: Embeddings dos chunks
+        search_index: Índice com os embeddings dos chunks
         chunks: Lista de chunks de texto
         top_k: Número de resultados a retornar
         
     Returns:
-        Lista de dicionários com chunks e scores
+        Lista de dicionários com chunks e scores (maior score primeiro)
     """
-    similarities = []
+    indices, scores = search_index.search(query_embedding, top_k=top_k)
     
-    for i, chunk_emb in enumerate(chunk_embeddings):
-        similarity = calculate_cosine_similarity(query_embedding, chunk_emb)
-        similarities.append({
-            'index': i,
+    return [
+        {
+            'index': int(i),
             'chunk': chunks[i],
-            'score': float(similarity)
-        })
-    
-    # Ordena por score decrescente
-    similarities.sort(key=lambda x: x['score'], reverse=True)
-    
-    return similarities[:top_k]
+            'score': float(score)
+        }
+        for i, score in zip(indices, scores)
+    ]
 
 
 def generate_rag_response(
@@ -286,6 +362,8 @@ with tab1:
                         overlap=overlap
                     )
                     st.session_state.rag_classic_chunks = chunks
+                    # Embeddings dos chunks anteriores não valem para os novos
+                    clear_embeddings()
                 
                 st.success(f"✅ Documento dividido em {len(chunks)} chunks!")
     
@@ -399,6 +477,17 @@ with tab2:
         
         st.info(f"📏 Dimensão dos vetores: **{embedding_dim}**")
         
+        vector_storage = st.selectbox(
+            "Armazenamento dos Vetores",
+            ["float32", "float16", "int8"],
+            help=(
+                "float32: vetores completos em memória. "
+                "float16 (2x menor) e int8 com escala por vetor (4x menor): a busca usa os vetores "
+                "comprimidos e reordena os melhores candidatos com os vetores originais, "
+                "mantidos em disco"
+            )
+        )
+        
         # Validação de API key
         if embedding_provider == "openai":
             api_key_valid = validate_api_key("openai")
@@ -434,9 +523,20 @@ with tab2:
                         chunks = st.session_state.rag_classic_chunks
                         embeddings = embed_func(chunks)
                         
-                        # Converte para numpy array
-                        embeddings_array = np.array(embeddings)
+                        # Converte para numpy array (float32: np.array produziria float64)
+                        embeddings_array = np.asarray(embeddings, dtype=np.float32)
+                        clear_embeddings()
+                        if vector_storage != "float32":
+                            # Vetores originais ficam em disco; na memória, só o índice comprimido
+                            embeddings_array = spill_embeddings_to_disk(embeddings_array)
+                        
+                        # Pré-normaliza (e comprime) a matriz uma única vez para as buscas.
+                        # A sessão guarda os vetores originais do modelo para a PCA; a
+                        # cópia normalizada fica só dentro do índice
+                        search_index = build_search_index(embeddings_array, vector_storage)
                         st.session_state.rag_classic_embeddings = embeddings_array
+                        st.session_state.rag_classic_vector_storage = vector_storage
+                        st.session_state.rag_classic_search_index = search_index
                     
                     st.success(f"✅ Embeddings gerados com sucesso! Shape: {embeddings_array.shape}")
                 
@@ -451,13 +551,28 @@ with tab2:
             embeddings = st.session_state.rag_classic_embeddings
             
             # Estatísticas
-            col1, col2, col3 = st.columns(3)
+            col1, col2, col3, col4 = st.columns(4)
             with col1:
                 st.metric("Número de Vetores", embeddings.shape[0])
             with col2:
                 st.metric("Dimensões", embeddings.shape[1])
             with col3:
                 st.metric("Tamanho Total", f"{embeddings.nbytes / 1024:.2f} KB")
+            with col4:
+                index_bytes = get_search_index().nbytes
+                st.metric(
+                    f"Índice ({st.session_state.rag_classic_vector_storage})",
+                    f"{index_bytes / 1024:.2f} KB",
+                    delta=f"{index_bytes / embeddings.nbytes:.0%} do float32",
+                    delta_color="off",
+                    help="Memória ocupada pelo índice de busca"
+                )
+            
+            if st.button("🗑️ Limpar Embeddings", help="Libera os vetores da sessão e o arquivo temporário"):
+                # A view local mapeia o mesmo arquivo: solta antes de apagá-lo
+                del embeddings
+                clear_embeddings()
+                st.rerun()
             
             # ==================== SEÇÃO EDUCACIONAL: POR QUE VISUALIZAR? ====================
             
@@ -686,7 +801,7 @@ with tab3:
                     # Busca chunks similares
                     results = search_similar_chunks(
                         query_embedding,
-                        st.session_state.rag_classic_embeddings,
+                        get_search_index(),
                         st.session_state.rag_classic_chunks,
                         top_k=top_k
                     )
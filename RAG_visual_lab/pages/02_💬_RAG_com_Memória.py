@@ -25,6 +25,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from services.memory_provider import MemoryProvider
 from services.augmentation_provider import AugmentationProvider
+from services.reranker import CrossEncoderReranker
+from services.multi_collection_retriever import MultiCollectionRetriever
 from services.retriever_provider import RetrieverProvider
 from services.gemini_provider import (
     GeminiConfig,
@@ -53,6 +55,10 @@ st.divider()
 
 # ==================== INICIALIZAÇÃO DO STATE ====================
 
+# Escopo da busca: a coleção selecionada ou todas (MultiCollectionRetriever)
+SCOPE_SELECTED_COLLECTION = "Coleção selecionada"
+SCOPE_ALL_COLLECTIONS = "Todas as coleções"
+
 def initialize_session_state():
     """Inicializa as variáveis de estado da sessão."""
     if "rag_memoria_talk_id" not in st.session_state:
@@ -77,6 +83,15 @@ def initialize_session_state():
     if "chroma_n_results" not in st.session_state:
         st.session_state.chroma_n_results = 10
     
+    if "chroma_rerank" not in st.session_state:
+        st.session_state.chroma_rerank = False
+    
+    if "chroma_min_similarity" not in st.session_state:
+        st.session_state.chroma_min_similarity = 0.0
+    
+    if "chroma_search_scope" not in st.session_state:
+        st.session_state.chroma_search_scope = SCOPE_SELECTED_COLLECTION
+    
     # Lista de coleções disponíveis no ChromaDB
     if "available_collections" not in st.session_state:
         st.session_state.available_collections = [
@@ -118,10 +133,19 @@ with st.sidebar:
         help="Caminho para o diretório do ChromaDB persistente"
     )
     
+    st.session_state.chroma_search_scope = st.radio(
+        "Escopo da Busca",
+        options=[SCOPE_SELECTED_COLLECTION, SCOPE_ALL_COLLECTIONS],
+        index=[SCOPE_SELECTED_COLLECTION, SCOPE_ALL_COLLECTIONS].index(st.session_state.chroma_search_scope),
+        help="Todas as coleções: a pergunta é codificada uma vez, as coleções são consultadas "
+             "em paralelo e os chunks são intercalados por similaridade"
+    )
+    
     st.session_state.chroma_collection_name = st.selectbox(
         "Nome da Coleção",
         options=st.session_state.available_collections,
         index=st.session_state.available_collections.index(st.session_state.chroma_collection_name),
+        disabled=st.session_state.chroma_search_scope == SCOPE_ALL_COLLECTIONS,
         help="Selecione a coleção de documentos no ChromaDB"
     )
     
@@ -133,6 +157,23 @@ with st.sidebar:
         help="Quantidade de chunks a recuperar por consulta"
     )
     
+    st.session_state.chroma_rerank = st.checkbox(
+        "Reranking (cross-encoder)",
+        value=st.session_state.chroma_rerank,
+        help="Busca 3x mais candidatos e reordena com um cross-encoder na CPU: "
+             "com menos chunks mais relevantes, o prompt enviado ao Gemini fica menor"
+    )
+    
+    st.session_state.chroma_min_similarity = st.slider(
+        "Similaridade Mínima",
+        min_value=0.0,
+        max_value=1.0,
+        step=0.05,
+        value=st.session_state.chroma_min_similarity,
+        help="Descarta chunks com similaridade cosseno abaixo do limiar. Se nenhum chunk "
+             "atingir o limiar, o Gemini não é chamado. 0 desativa o filtro"
+    )
+    
     st.divider()
     
     # Informações da sessão
@@ -160,6 +201,14 @@ with st.sidebar:
 
 # ==================== FUNÇÃO AUXILIAR - GERAÇÃO DE RESPOSTA ====================
 
+# Resposta quando nenhum chunk atinge a similaridade mínima (sem chamada ao LLM)
+NO_RELEVANT_CHUNKS_MESSAGE = (
+    "🔍 Não encontrei trechos relevantes nos documentos para esta pergunta "
+    "(similaridade mínima: {threshold:.2f}). Tente reformular a pergunta ou "
+    "reduzir a similaridade mínima na barra lateral."
+)
+
+
 def build_rag_with_memory_pipeline(query: str, talk_id: str, api_key: str) -> tuple[str, str]:
     """
     Pipeline RAG + Memória que combina recuperação de documentos com contexto conversacional.
@@ -184,17 +233,41 @@ def build_rag_with_memory_pipeline(query: str, talk_id: str, api_key: str) -> tu
     prompt = ""
     try:
         # ===== ETAPA 1: RETRIEVAL (R do RAG) =====
-        # Inicializa o RetrieverProvider com configurações da sessão
-        retriever = RetrieverProvider(
-            db_path=st.session_state.chroma_db_path,
-            collection_name=st.session_state.chroma_collection_name
-        )
+        # Limiar de similaridade (0 = desativado)
+        min_similarity = st.session_state.chroma_min_similarity or None
+        
+        # Inicializa o retriever com configurações da sessão
+        # (modelo e cliente ChromaDB são reutilizados do registro do processo)
+        reranker = CrossEncoderReranker() if st.session_state.chroma_rerank else None
+        if st.session_state.chroma_search_scope == SCOPE_ALL_COLLECTIONS:
+            retriever = MultiCollectionRetriever(
+                db_path=st.session_state.chroma_db_path,
+                collection_names=st.session_state.available_collections,
+                reranker=reranker
+            )
+        else:
+            retriever = RetrieverProvider(
+                db_path=st.session_state.chroma_db_path,
+                collection_name=st.session_state.chroma_collection_name,
+                reranker=reranker
+            )
         
         # Busca chunks relevantes no ChromaDB
-        chunks = retriever.search(
-            query_text=query,
-            n_results=st.session_state.chroma_n_results
-        )
+        try:
+            results = retriever.search_results(
+                query_text=query,
+                n_results=st.session_state.chroma_n_results,
+                min_similarity=min_similarity
+            )
+        finally:
+            retriever.close()
+        chunks = [result.text for result in results]
+        
+        # Nada acima do limiar: responde sem chamar o LLM (um erro na busca,
+        # sem candidatos descartados, segue para o aviso abaixo)
+        if not chunks and retriever.last_below_threshold:
+            print("⏭️ [GENERATION] Nenhum chunk acima do limiar: Gemini não foi chamado")
+            return NO_RELEVANT_CHUNKS_MESSAGE.format(threshold=min_similarity), prompt
         
         # Fallback para chunks de exemplo se ChromaDB estiver vazio ou houver erro
         if not chunks:
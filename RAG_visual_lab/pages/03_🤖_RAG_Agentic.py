@@ -32,6 +32,8 @@ from typing import Dict, Optional
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from services.agentic_rag_provider import AgenticRAGProvider
+from services.multi_collection_retriever import MultiCollectionRetriever
+from services.reranker import CrossEncoderReranker
 from services.retriever_provider import RetrieverProvider
 from services.augmentation_provider import AugmentationProvider
 from services.gemini_provider import (
@@ -62,6 +64,10 @@ st.divider()
 
 # ==================== INICIALIZAÇÃO DO STATE ====================
 
+# Modo de busca: uma coleção escolhida pelo agente ou todas (MultiCollectionRetriever)
+SCOPE_AGENT_ROUTING = "Roteamento pelo agente"
+SCOPE_ALL_COLLECTIONS = "Todas as coleções"
+
 def initialize_session_state():
     """Inicializa as variáveis de estado da sessão."""
     if "rag_agentic_messages" not in st.session_state:
@@ -79,6 +85,15 @@ def initialize_session_state():
     
     if "agentic_chroma_n_results" not in st.session_state:
         st.session_state.agentic_chroma_n_results = 10
+    
+    if "agentic_chroma_rerank" not in st.session_state:
+        st.session_state.agentic_chroma_rerank = False
+    
+    if "agentic_chroma_min_similarity" not in st.session_state:
+        st.session_state.agentic_chroma_min_similarity = 0.0
+    
+    if "agentic_search_scope" not in st.session_state:
+        st.session_state.agentic_search_scope = SCOPE_AGENT_ROUTING
 
 initialize_session_state()
 
@@ -114,6 +129,15 @@ with st.sidebar:
         help="Caminho para o diretório do ChromaDB persistente"
     )
     
+    st.session_state.agentic_search_scope = st.radio(
+        "Modo de Busca",
+        options=[SCOPE_AGENT_ROUTING, SCOPE_ALL_COLLECTIONS],
+        index=[SCOPE_AGENT_ROUTING, SCOPE_ALL_COLLECTIONS].index(st.session_state.agentic_search_scope),
+        help="Todas as coleções: sem roteamento pelo CrewAI, a pergunta é buscada em todos os "
+             "datasets em paralelo e os chunks são intercalados por similaridade. Útil quando "
+             "a pergunta cruza os datasets"
+    )
+    
     st.session_state.agentic_chroma_n_results = st.slider(
         "Número de Chunks",
         min_value=1,
@@ -122,6 +146,23 @@ with st.sidebar:
         help="Quantidade de chunks a recuperar por consulta"
     )
     
+    st.session_state.agentic_chroma_rerank = st.checkbox(
+        "Reranking (cross-encoder)",
+        value=st.session_state.agentic_chroma_rerank,
+        help="Busca 3x mais candidatos e reordena com um cross-encoder na CPU: "
+             "com menos chunks mais relevantes, o prompt enviado ao Gemini fica menor"
+    )
+    
+    st.session_state.agentic_chroma_min_similarity = st.slider(
+        "Similaridade Mínima",
+        min_value=0.0,
+        max_value=1.0,
+        step=0.05,
+        value=st.session_state.agentic_chroma_min_similarity,
+        help="Descarta chunks com similaridade cosseno abaixo do limiar. Se nenhum chunk "
+             "atingir o limiar, o Gemini não é chamado. 0 desativa o filtro"
+    )
+    
     st.divider()
     
     # Botão para limpar histórico
@@ -148,6 +189,14 @@ with st.sidebar:
 
 # ==================== FUNÇÃO AUXILIAR - PIPELINE AGENTE RAG ====================
 
+# Resposta quando nenhum chunk atinge a similaridade mínima (sem chamada ao LLM)
+NO_RELEVANT_CHUNKS_MESSAGE = (
+    "🔍 Não encontrei trechos relevantes nos documentos para esta pergunta "
+    "(similaridade mínima: {threshold:.2f}). Tente reformular a pergunta ou "
+    "reduzir a similaridade mínima na barra lateral."
+)
+
+
 def build_agentic_rag_pipeline(query: str, api_key: str) -> tuple[str, Dict, str]:
     """
     Pipeline Agentic RAG que roteia queries para datasets apropriados.
@@ -169,38 +218,75 @@ def build_agentic_rag_pipeline(query: str, api_key: str) -> tuple[str, Dict, str
     routing_result = {}
     
     try:
-        # ===== ETAPA 1: AGENTIC ROUTING =====
-        print(f"\n🤖 [AGENTIC ROUTING] Analisando query para rotear dataset...")
-        
-        # Executar roteamento (os logs já vão para o terminal via TeeOutput no provider)
-        routing_result = st.session_state.rag_agentic_provider.route_query(query)
-        
-        # Obter logs capturados do provider
-        agent_reasoning = st.session_state.rag_agentic_provider.last_logs
+        search_all = st.session_state.agentic_search_scope == SCOPE_ALL_COLLECTIONS
         
-        if not routing_result:
-            return "❌ Erro: O agente não conseguiu rotear a query.", {}, agent_reasoning
-        
-        dataset_name = routing_result.get("dataset_name")
-        locale = routing_result.get("locale")
-        translated_query = routing_result.get("query", query)
-        
-        print(f"✅ [AGENTIC ROUTING] Dataset selecionado: {dataset_name}")
-        print(f"   └─ Locale: {locale}")
-        print(f"   └─ Query traduzida: {translated_query}")
+        if search_all:
+            # ===== ETAPA 1: SEM ROTEAMENTO (todas as coleções) =====
+            # O modelo de embeddings é multilíngue: a query original serve para todos os datasets
+            collection_names = [
+                dataset["dataset"]
+                for dataset in st.session_state.rag_agentic_provider.datasets_provider.get_datasets()
+            ]
+            dataset_name = ", ".join(collection_names)
+            translated_query = query
+            routing_result = {"dataset_name": dataset_name, "locale": None, "query": query}
+            agent_reasoning = "Roteamento desativado: a pergunta é buscada em todas as coleções."
+            print(f"\n⏭️ [AGENTIC ROUTING] Roteamento desativado: buscando em {dataset_name}")
+        else:
+            # ===== ETAPA 1: AGENTIC ROUTING =====
+            print(f"\n🤖 [AGENTIC ROUTING] Analisando query para rotear dataset...")
+            
+            # Executar roteamento (os logs já vão para o terminal via TeeOutput no provider)
+            routing_result = st.session_state.rag_agentic_provider.route_query(query)
+            
+            # Obter logs capturados do provider
+            agent_reasoning = st.session_state.rag_agentic_provider.last_logs
+            
+            if not routing_result:
+                return "❌ Erro: O agente não conseguiu rotear a query.", {}, agent_reasoning
+            
+            dataset_name = routing_result.get("dataset_name")
+            locale = routing_result.get("locale")
+            translated_query = routing_result.get("query", query)
+            
+            print(f"✅ [AGENTIC ROUTING] Dataset selecionado: {dataset_name}")
+            print(f"   └─ Locale: {locale}")
+            print(f"   └─ Query traduzida: {translated_query}")
         
         # ===== ETAPA 2: RETRIEVAL =====
         print(f"\n🔎 [RETRIEVAL] Buscando chunks em '{dataset_name}'...")
         
-        retriever = RetrieverProvider(
-            db_path=st.session_state.agentic_chroma_db_path,
-            collection_name=dataset_name
-        )
+        # Limiar de similaridade (0 = desativado)
+        min_similarity = st.session_state.agentic_chroma_min_similarity or None
+        reranker = CrossEncoderReranker() if st.session_state.agentic_chroma_rerank else None
+        if search_all:
+            retriever = MultiCollectionRetriever(
+                db_path=st.session_state.agentic_chroma_db_path,
+                collection_names=collection_names,
+                reranker=reranker
+            )
+        else:
+            retriever = RetrieverProvider(
+                db_path=st.session_state.agentic_chroma_db_path,
+                collection_name=dataset_name,
+                reranker=reranker
+            )
+        
+        try:
+            results = retriever.search_results(
+                query_text=translated_query,
+                n_results=st.session_state.agentic_chroma_n_results,
+                min_similarity=min_similarity
+            )
+        finally:
+            retriever.close()
+        chunks = [result.text for result in results]
         
-        chunks = retriever.search(
-            query_text=translated_query,
-            n_results=st.session_state.agentic_chroma_n_results
-        )
+        # Nada acima do limiar: responde sem chamar o LLM (um erro na busca,
+        # sem candidatos descartados, segue para o aviso abaixo)
+        if not chunks and retriever.last_below_threshold:
+            print("⏭️ [GENERATION] Nenhum chunk acima do limiar: Gemini não foi chamado")
+            return NO_RELEVANT_CHUNKS_MESSAGE.format(threshold=min_similarity), routing_result, agent_reasoning
         
         if not chunks:
             st.warning(f"""
@@ -0,0 +1,283 @@
+# services/bm25_index.py
+
+"""
+BM25 Index
+==========
+
+Índice lexical (BM25) persistido ao lado da coleção do ChromaDB, usado pelo
+modo híbrido do RetrieverProvider.
+
+O modelo de embeddings aproxima o sentido do texto, mas não garante
+correspondência exata de termos raros: números de artigos ("art. 5º"),
+incisos e identificadores de papers ("2111.01888v1"). O BM25 recupera esses
+chunks pelo termo exato, e a fusão por rank (RRF) combina as duas listas.
+
+Formato (um diretório por coleção, ver bm25_index_path):
+- index.json: parâmetros, vocabulário (termos ordenados) e ids dos chunks
+- offsets.npy: início das postings de cada termo (int64, n_termos + 1)
+- doc_ids.npy: posições dos chunks de cada termo, em ordem (uint32)
+- tfs.npy: frequência do termo em cada chunk (uint16)
+- doc_lengths.npy: número de termos de cada chunk (uint32)
+
+As postings de um termo são fatias contíguas de arrays mapeados em memória:
+pontuar um termo é uma soma vetorizada sobre as suas `df` posições.
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.vector_search import top_k_indices
+
+FORMAT_VERSION = 1
+
+# Palavras e identificadores compostos: "2111.01888v1", "5º", "covid-19"
+_TOKEN_PATTERN = re.compile(r"\w+(?:[.\-/]\w+)*")
+_PART_PATTERN = re.compile(r"[.\-/]")
+
+
+def bm25_index_path(db_path: str, collection_name: str) -> str:
+    """Diretório do índice BM25 de `collection_name`, ao lado do banco ChromaDB."""
+    return os.path.join(db_path, "bm25", collection_name)
+
+
+def analyze(text: str) -> List[str]:
+    """
+    Converte um texto nos termos do índice.
+
+    Minúsculas, sem acentos ("5º" vira "5o"); termos compostos são mantidos
+    inteiros e também divididos nas suas partes.
+
+    Exemplo:
+        >>> analyze("Art. 5º da Constituição, ver 2111.01888v1")
+        ['art', '5o', 'da', 'constituicao', 'ver', '2111.01888v1', '2111', '01888v1']
+    """
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(char for char in folded if not unicodedata.combining(char))
+    terms = []
+    for token in _TOKEN_PATTERN.findall(folded):
+        terms.append(token)
+        if _PART_PATTERN.search(token):
+            terms.extend(part for part in _PART_PATTERN.split(token) if part)
+    return terms
+
+
+def build_bm25_index(collection: Any, path: str, batch_size: int = 1000) -> Dict[str, Any]:
+    """
+    Constrói o índice BM25 com todos os chunks de uma coleção do ChromaDB.
+
+    Args:
+        collection: Coleção do ChromaDB (get/count/name)
+        path: Diretório de destino (ver bm25_index_path)
+        batch_size: Chunks lidos por chamada a collection.get
+
+    Returns:
+        dict: chunks, termos, postings e bytes no disco
+    """
+    ids: List[str] = []
+    doc_lengths: List[int] = []
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+
+    count = collection.count()
+    for offset in range(0, count, batch_size):
+        page = collection.get(limit=batch_size, offset=offset, include=["documents"])
+        for chunk_id, document in zip(page["ids"], page["documents"]):
+            position = len(ids)
+            terms = Counter(analyze(document or ""))
+            for term, tf in terms.items():
+                postings.setdefault(term, []).append((position, min(tf, 65535)))
+            ids.append(chunk_id)
+            doc_lengths.append(sum(terms.values()))
+
+    vocabulary = sorted(postings)
+    offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(postings[term]) for term in vocabulary])
+    doc_ids = np.empty(offsets[-1], dtype=np.uint32)
+    tfs = np.empty(offsets[-1], dtype=np.uint16)
+    for i, term in enumerate(vocabulary):
+        entries = np.asarray(postings[term], dtype=np.uint32).reshape(-1, 2)
+        doc_ids[offsets[i]:offsets[i + 1]] = entries[:, 0]
+        tfs[offsets[i]:offsets[i + 1]] = entries[:, 1]
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, "offsets.npy"), offsets)
+    np.save(os.path.join(tmp_path, "doc_ids.npy"), doc_ids)
+    np.save(os.path.join(tmp_path, "tfs.npy"), tfs)
+    np.save(os.path.join(tmp_path, "doc_lengths.npy"), np.asarray(doc_lengths, dtype=np.uint32))
+    with open(os.path.join(tmp_path, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {"format_version": FORMAT_VERSION, "name": collection.name, "terms": vocabulary, "ids": ids},
+            f,
+            ensure_ascii=False,
+        )
+
+    # Substitui o índice anterior só depois de tudo gravado
+    old_path = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    print(f"🔤 Índice BM25 de '{collection.name}': {len(ids)} chunks, {len(vocabulary)} termos")
+    return {"chunks": len(ids), "termos": len(vocabulary), "postings": int(offsets[-1]), "bytes": size}
+
+
+class BM25Index:
+    """
+    Índice BM25 somente leitura.
+
+    Guarda também, por filtro `where`, a máscara dos chunks que o satisfazem
+    (filter_mask): o índice fica no registro do processo e é recriado a cada
+    build, então as máscaras acompanham o estado da coleção.
+
+    Exemplo de uso:
+        >>> index = BM25Index(bm25_index_path("./chroma_db", "direito_constitucional"))
+        >>> index.search("art. 5º inciso XI", n_results=3)
+        [('5f1c...', 12.7), ('a93e...', 9.1), ('0b2d...', 8.4)]
+    """
+
+    # Máscaras de filtros em cache (len(index) bytes cada)
+    MAX_CACHED_FILTERS = 32
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            path: Diretório criado por build_bm25_index
+            k1: Saturação da frequência do termo
+            b: Peso da normalização pelo tamanho do chunk
+
+        Raises:
+            FileNotFoundError: Se o índice não existir
+            ValueError: Se o formato for incompatível
+        """
+        with open(os.path.join(path, "index.json"), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        if info.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Formato de índice BM25 incompatível em '{path}'")
+
+        self.path = path
+        self.name: str = info["name"]
+        self.ids: List[str] = info["ids"]
+        self.k1 = k1
+        self._terms = {term: i for i, term in enumerate(info["terms"])}
+        self._positions: Optional[Dict[str, int]] = None  # id -> posição, criado na primeira busca filtrada
+        self._masks: "OrderedDict[str, np.ndarray]" = OrderedDict()  # filtro -> máscara (LRU)
+        self._lock = threading.Lock()
+
+        self._offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self._doc_ids = np.load(os.path.join(path, "doc_ids.npy"), mmap_mode="r")
+        self._tfs = np.load(os.path.join(path, "tfs.npy"), mmap_mode="r")
+
+        doc_lengths = np.load(os.path.join(path, "doc_lengths.npy")).astype(np.float32)
+        average = float(doc_lengths.mean()) if len(doc_lengths) and doc_lengths.mean() > 0 else 1.0
+        # Parte do denominador que só depende do chunk: k1 * (1 - b + b * |d| / média)
+        self._length_norm = k1 * (1.0 - b + b * doc_lengths / average)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def scores(self, query: str) -> np.ndarray:
+        """Score BM25 da query para todos os chunks (float32, zero sem termos em comum)."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term, query_tf in Counter(analyze(query)).items():
+            term_id = self._terms.get(term)
+            if term_id is None:
+                continue
+            start, end = int(self._offsets[term_id]), int(self._offsets[term_id + 1])
+            docs = np.asarray(self._doc_ids[start:end])
+            tfs = np.asarray(self._tfs[start:end], dtype=np.float32)
+            df = end - start
+            idf = np.log1p((len(self.ids) - df + 0.5) / (df + 0.5))
+            # Postings de um termo não repetem chunks: a soma indexada é segura
+            scores[docs] += query_tf * idf * tfs * (self.k1 + 1.0) / (tfs + self._length_norm[docs])
+        return scores
+
+    def search(
+        self,
+        query: str,
+        n_results: int = 10,
+        allowed_ids: Optional[Iterable[str]] = None,
+        mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Busca os `n_results` chunks com maior score BM25.
+
+        Args:
+            query: Texto da consulta
+            n_results: Número máximo de resultados
+            allowed_ids: Restringe a busca a esses chunks (ex.: os que satisfazem
+                         um filtro de metadados). None = todos
+            mask: Alternativa a allowed_ids já no formato do índice (ver filter_mask)
+
+        Returns:
+            list[tuple[str, float]]: (id do chunk, score), do maior para o menor;
+            apenas chunks com ao menos um termo da query
+        """
+        scores = self.scores(query)
+        if allowed_ids is not None:
+            mask = self._ids_mask(allowed_ids)
+        if mask is not None:
+            scores[~mask] = 0.0
+        indices = top_k_indices(scores, min(n_results, int(np.count_nonzero(scores))))
+        return [(self.ids[i], float(scores[i])) for i in indices]
+
+    def filter_mask(self, where: Dict[str, Any], allowed_ids: Callable[[], Iterable[str]]) -> np.ndarray:
+        """
+        Máscara dos chunks que satisfazem um filtro `where`, em cache por filtro.
+
+        Args:
+            where: Filtro de metadados (chave do cache)
+            allowed_ids: Lê os ids que satisfazem o filtro (ex.: collection.get);
+                         chamado apenas na primeira vez que o filtro aparece
+
+        Exemplo:
+            >>> where = {"source_file": "cf88.pdf"}
+            >>> mask = index.filter_mask(where, lambda: collection.get(where=where, include=[])["ids"])
+            >>> index.search("art. 5º", n_results=3, mask=mask)
+        """
+        key = json.dumps(where, sort_keys=True, ensure_ascii=False, default=str)
+        with self._lock:
+            mask = self._masks.get(key)
+            if mask is not None:
+                self._masks.move_to_end(key)
+                return mask
+
+        mask = self._ids_mask(allowed_ids())
+        mask.flags.writeable = False
+        with self._lock:
+            self._masks[key] = mask
+            while len(self._masks) > self.MAX_CACHED_FILTERS:
+                self._masks.popitem(last=False)
+        return mask
+
+    def _ids_mask(self, allowed_ids: Iterable[str]) -> np.ndarray:
+        if self._positions is None:
+            self._positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        mask = np.zeros(len(self.ids), dtype=bool)
+        mask[[self._positions[chunk_id] for chunk_id in allowed_ids if chunk_id in self._positions]] = True
+        return mask
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Funde listas ordenadas de ids: score(id) = soma de 1 / (k + posição).
+
+    Exemplo:
+        >>> reciprocal_rank_fusion([["a", "b"], ["b", "c"]], k=60)
+        [('b', 0.0325...), ('a', 0.0164...), ('c', 0.0161...)]
+    """
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda entry: entry[1], reverse=True)
@@ -0,0 +1,136 @@
+# services/embedding_backend.py
+
+"""
+Embedding Backend
+=================
+
+Carrega o modelo SentenceTransformer no backend de inferência escolhido.
+
+Backends:
+- "torch" (padrão): PyTorch, o caminho original
+- "onnx": mesmo modelo exportado para ONNX e executado com o ONNX Runtime
+- "onnx-int8": ONNX com quantização dinâmica int8 dos pesos, a opção mais
+  rápida em CPU (sem GPU nos servidores do laboratório)
+
+O modelo int8 é exportado uma única vez para `ONNX_MODELS_DIR` e reutilizado
+nas execuções seguintes. A configuração de quantização (arm64, avx2, avx512,
+avx512_vnni) é escolhida pelas instruções suportadas pela CPU.
+
+Os backends ONNX exigem dependências opcionais:
+    pip install "sentence-transformers[onnx]"
+"""
+
+import os
+import platform
+from typing import Any, Optional
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_BACKEND = "torch"
+
+# Modelos int8 exportados (um subdiretório por modelo)
+ONNX_MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+
+
+def validate_backend(backend: str) -> str:
+    """Valida o nome do backend, retornando-o."""
+    if backend not in BACKENDS:
+        raise ValueError(f"backend deve ser um de {BACKENDS}, recebido: '{backend}'")
+    return backend
+
+
+def model_key(model_name: str, backend: str = DEFAULT_BACKEND) -> str:
+    """
+    Chave do modelo no registro do processo e no cache de embeddings.
+
+    O backend faz parte da chave: vetores int8 diferem levemente dos vetores
+    em float32 e não devem ser misturados no cache.
+    """
+    return model_name if backend == DEFAULT_BACKEND else f"{model_name}@{backend}"
+
+
+def quantization_config() -> str:
+    """Escolhe a configuração de quantização dinâmica do ONNX Runtime para esta CPU."""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            flags = set(f.read().split())
+    except OSError:
+        return "avx2"
+
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512f" in flags:
+        return "avx512"
+    return "avx2"
+
+
+def _require_onnx() -> None:
+    try:
+        import onnxruntime  # noqa: F401
+        import optimum.onnxruntime  # noqa: F401
+    except ImportError as exc:
+        raise ImportError(
+            "Os backends 'onnx' e 'onnx-int8' exigem optimum e onnxruntime. "
+            'Execute: pip install "sentence-transformers[onnx]"'
+        ) from exc
+
+
+def load_onnx_model(
+    model_name: str,
+    quantized: bool = True,
+    models_dir: str = ONNX_MODELS_DIR,
+    config: Optional[str] = None,
+) -> Any:
+    """
+    Carrega o modelo com o backend ONNX, exportando a versão int8 se necessário.
+
+    Args:
+        model_name: Nome do modelo no Hugging Face Hub ou caminho local
+        quantized: Usa a versão com pesos int8 (quantização dinâmica)
+        models_dir: Diretório onde o modelo quantizado é salvo
+        config: Configuração de quantização (default: detectada pela CPU)
+
+    Returns:
+        SentenceTransformer com backend="onnx"
+
+    Raises:
+        ImportError: Se optimum/onnxruntime não estiverem instalados
+    """
+    _require_onnx()
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    if not quantized:
+        return SentenceTransformer(model_name, backend="onnx")
+
+    config = config or quantization_config()
+    local_dir = os.path.join(models_dir, model_name.replace("/", "__"))
+    file_name = f"onnx/model_qint8_{config}.onnx"
+
+    if not os.path.exists(os.path.join(local_dir, file_name)):
+        print(f"🔧 Exportando '{model_name}' para ONNX int8 ({config}) em '{local_dir}'...")
+        # Exporta o modelo para ONNX (float32) e salva a cópia local que
+        # receberá o arquivo quantizado em onnx/
+        onnx_model = SentenceTransformer(model_name, backend="onnx")
+        onnx_model.save(local_dir)
+        export_dynamic_quantized_onnx_model(onnx_model, config, local_dir)
+
+    return SentenceTransformer(local_dir, backend="onnx", model_kwargs={"file_name": file_name})
+
+
+def load_sentence_transformer(model_name: str, backend: str = DEFAULT_BACKEND) -> Any:
+    """
+    Carrega `model_name` no backend indicado.
+
+    Exemplo:
+        >>> model = load_sentence_transformer("paraphrase-multilingual-MiniLM-L12-v2", "onnx-int8")
+        >>> model.encode(["O que é RAG?"]).shape
+        (1, 384)
+    """
+    validate_backend(backend)
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(model_name)
+    return load_onnx_model(model_name, quantized=backend == "onnx-int8")
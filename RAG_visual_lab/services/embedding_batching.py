@@ -0,0 +1,115 @@
+# services/embedding_batching.py
+
+"""
+Embedding Batching
+==================
+
+Agrupa os textos por comprimento em tokens antes do encode.
+
+Cada batch é preenchido (padding) até o seu texto mais longo; um fragmento
+de 20 tokens no mesmo batch de chunks de 128 tokens custa o mesmo que um
+chunk cheio. Aqui os textos são ordenados pelo número de tokens que o
+modelo realmente processa (limitado ao max_seq_length), divididos em
+buckets consecutivos de `batch_size`, cada bucket vira um único forward
+pass e os embeddings voltam na ordem original.
+
+O SentenceTransformer já ordena cada chamada pelo número de caracteres, que
+é só uma aproximação: pontuação, números e termos técnicos mudam muito a
+razão caracteres/token, e textos acima do limite do modelo têm todos o mesmo
+custo, seja qual for o tamanho.
+"""
+
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+
+
+def has_fast_tokenizer(model: Any) -> bool:
+    """Verdadeiro se o modelo expõe um tokenizer rápido (HuggingFace "fast")."""
+    tokenizer = getattr(model, "tokenizer", None)
+    return tokenizer is not None and getattr(tokenizer, "is_fast", False) is True
+
+
+def token_lengths(model: Any, texts: Sequence[str], truncate: bool = True) -> np.ndarray:
+    """
+    Número de tokens (com os especiais) de cada texto.
+
+    Usa o tokenizer do modelo sem padding, máscaras ou tensores: só os ids,
+    que são descartados depois de contados. Com `truncate`, o tokenizer corta
+    cada texto no max_seq_length (o que o modelo realmente processa); sem,
+    devolve o comprimento completo, para medir o truncamento. O encode
+    tokeniza os textos de novo; esse custo extra aparece em
+    benchmark_embeddings.py --batching. Sem tokenizer rápido, usa o número
+    de caracteres.
+    """
+    if not has_fast_tokenizer(model):
+        return np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+
+    max_seq_length = getattr(model, "max_seq_length", None)
+    truncate = truncate and isinstance(max_seq_length, int) and max_seq_length > 0
+    encoding = model.tokenizer(
+        list(texts),
+        add_special_tokens=True,
+        truncation=truncate,
+        max_length=max_seq_length if truncate else None,
+        padding=False,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+        verbose=False,
+    )
+    lengths = np.fromiter((len(ids) for ids in encoding["input_ids"]), dtype=np.int64, count=len(texts))
+    if truncate:
+        np.minimum(lengths, max_seq_length, out=lengths)
+    return lengths
+
+
+def length_buckets(lengths: Sequence[int], batch_size: int) -> List[np.ndarray]:
+    """
+    Divide os índices em buckets de até `batch_size`, do mais longo ao mais curto.
+
+    Exemplo:
+        >>> [b.tolist() for b in length_buckets([3, 9, 1, 7], batch_size=2)]
+        [[1, 3], [0, 2]]
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size deve ser positivo")
+    order = np.argsort(-np.asarray(lengths, dtype=np.int64), kind="stable")
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def encode_bucketed(
+    model: Any,
+    texts: Sequence[str],
+    batch_size: int = 32,
+    lengths: Optional[Sequence[int]] = None
+) -> np.ndarray:
+    """
+    Codifica `texts` em buckets de comprimento parecido, preservando a ordem.
+
+    Args:
+        model: Objeto com encode(list[str], batch_size=...) (ex: SentenceTransformer)
+        texts: Textos a codificar
+        batch_size: Textos por forward pass
+        lengths: Comprimentos em tokens já calculados (ex: token_lengths com
+                 truncate=False, reaproveitados do relatório de truncamento).
+                 Default: calculados aqui
+
+    Returns:
+        np.ndarray: Matriz (len(texts), dim), na ordem de `texts`
+    """
+    texts = list(texts)
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    if len(texts) <= batch_size:
+        # Um único forward pass: a ordem não muda o padding
+        return np.asarray(model.encode(texts))
+
+    embeddings = None
+    if lengths is None:
+        lengths = token_lengths(model, texts)
+    for bucket in length_buckets(lengths, batch_size):
+        encoded = np.asarray(model.encode([texts[i] for i in bucket], batch_size=len(bucket)))
+        if embeddings is None:
+            embeddings = np.empty((len(texts), encoded.shape[1]), dtype=encoded.dtype)
+        embeddings[bucket] = encoded
+    return embeddings
@@ -0,0 +1,200 @@
+# services/embedding_cache.py
+
+"""
+Query Embedding Cache
+=====================
+
+Cache LRU de embeddings de queries, limitado por número de entradas, por
+memória e (opcionalmente) por tempo de vida.
+
+Usuários repetem e reformulam as mesmas perguntas; com o cache, uma query já
+vista não passa novamente pelo forward pass do SentenceTransformer.
+
+Chave: (nome do modelo, texto normalizado). A normalização aplica NFC, remove
+espaços das pontas e colapsa espaços internos — mudanças que não alteram a
+tokenização. Maiúsculas/minúsculas são preservadas porque o modelo
+multilíngue padrão diferencia caixa.
+"""
+
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.embedding_batching import encode_bucketed
+
+
+class QueryEmbeddingCache:
+    """
+    Cache LRU thread-safe de embeddings de queries.
+
+    Exemplo de uso:
+        >>> cache = QueryEmbeddingCache(max_entries=512, ttl_seconds=3600)
+        >>> vectors = encode_with_cache(model, "minilm", ["O que é RAG?"], cache)
+        >>> cache.stats()["misses"]
+        1
+    """
+
+    DEFAULT_MAX_ENTRIES = 1024
+    DEFAULT_MAX_BYTES = 16 * 1024 * 1024  # 16 MB
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl_seconds: Optional[float] = None,
+    ):
+        """
+        Args:
+            max_entries: Número máximo de embeddings armazenados
+            max_bytes: Memória máxima ocupada pelos vetores
+            ttl_seconds: Tempo de vida de cada entrada. None = sem expiração
+        """
+        if max_entries <= 0 or max_bytes <= 0:
+            raise ValueError("max_entries e max_bytes devem ser positivos")
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, float]]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_query(text: str) -> str:
+        """Normaliza o texto da query para uso como chave."""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def get(self, model_name: str, text: str) -> Optional[np.ndarray]:
+        """
+        Retorna o embedding em cache ou None (contabilizando hit/miss).
+        """
+        key = (model_name, self.normalize_query(text))
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and self._is_expired(item[1]):
+                self._remove_locked(key)
+                item = None
+
+            if item is None:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return item[0]
+
+    def put(self, model_name: str, text: str, embedding: np.ndarray) -> None:
+        """
+        Armazena o embedding da query, despejando as entradas menos usadas
+        até respeitar os limites de entradas e memória.
+        """
+        vector = np.array(embedding, dtype=np.float32).reshape(-1)
+        vector.setflags(write=False)
+        if vector.nbytes > self.max_bytes:
+            return
+
+        key = (model_name, self.normalize_query(text))
+        with self._lock:
+            if key in self._entries:
+                self._remove_locked(key)
+
+            self._entries[key] = (vector, time.monotonic())
+            self._bytes += vector.nbytes
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove_locked(oldest)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """Remove todas as entradas e zera os contadores."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._hits = self._misses = self._evictions = 0
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: hits, misses, hit_rate, entries, bytes, evictions e limites
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "evictions": self._evictions,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.monotonic() - created_at > self.ttl_seconds
+
+    def _remove_locked(self, key: Tuple[str, str]) -> None:
+        vector, _ = self._entries.pop(key)
+        self._bytes -= vector.nbytes
+
+
+# Cache compartilhado pelo processo (RetrieverProvider e Retriever)
+query_embedding_cache = QueryEmbeddingCache()
+
+
+def encode_with_cache(
+    model: Any,
+    model_name: str,
+    texts: Sequence[str],
+    cache: Optional[QueryEmbeddingCache] = None,
+) -> np.ndarray:
+    """
+    Codifica `texts` reaproveitando embeddings em cache.
+
+    Apenas as queries ausentes do cache são enviadas ao modelo, agrupadas
+    por comprimento em tokens (services.embedding_batching); o resultado é
+    armazenado e a ordem original é preservada.
+
+    Args:
+        model: Objeto com método encode(list[str]) (ex: SentenceTransformer)
+        model_name: Nome do modelo, parte da chave do cache
+        texts: Queries a codificar
+        cache: Cache a usar (default: cache do processo)
+
+    Returns:
+        np.ndarray: Matriz (len(texts), dim) em float32
+    """
+    cache = cache if cache is not None else query_embedding_cache
+    texts = list(texts)
+
+    vectors: list = [cache.get(model_name, text) for text in texts]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+    if missing:
+        # Textos repetidos no mesmo lote são codificados uma única vez
+        unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+        encoded = np.asarray(encode_bucketed(model, unique_texts), dtype=np.float32)
+        by_text = dict(zip(unique_texts, encoded))
+
+        for text, vector in by_text.items():
+            cache.put(model_name, text, vector)
+        for i in missing:
+            vectors[i] = by_text[texts[i]]
+
+    if not vectors:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.vstack(vectors)
@@ -0,0 +1,169 @@
+# services/embedding_pool.py
+
+"""
+Embedding Pool
+==============
+
+Distribui a geração de embeddings entre vários processos na CPU.
+
+Usa o pool multi-processo do SentenceTransformer
+(`start_multi_process_pool` + `encode(pool=...)`): cada processo recebe uma
+cópia do modelo e consome shards dos textos de uma fila. Antes de dividir,
+os textos são ordenados pelo comprimento em tokens
+(services.embedding_batching), então cada shard (e cada batch dentro dele)
+reúne textos de comprimento parecido e quase não há padding. Os embeddings
+voltam na ordem original.
+
+Há SHARDS_PER_WORKER shards por processo (cada um múltiplo de batch_size):
+com um único shard por processo, o primeiro receberia todos os textos mais
+longos e os demais terminariam antes, ociosos. Com shards menores, o
+processo que termina pega o próximo da fila e a carga se equilibra.
+
+Cada chamada a encode() espera o processo mais lento antes da próxima: o
+SemanticEncoder junta vários micro-batches em uma janela (window_size) para
+que cada chamada encha a fila com vários shards por processo.
+
+Cada processo usa cpu_count / workers threads: sem esse limite, N processos
+disputariam todos os núcleos com as threads do PyTorch.
+"""
+
+import math
+import os
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from services.embedding_batching import token_lengths
+
+# Shards por processo na fila do pool (balanceamento de carga)
+SHARDS_PER_WORKER = 4
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """Número de processos: None usa todos os núcleos."""
+    if workers is None:
+        return os.cpu_count() or 1
+    if workers <= 0:
+        raise ValueError("encode_workers deve ser positivo ou None")
+    return workers
+
+
+def shard_size(n_texts: int, workers: int, batch_size: int) -> int:
+    """
+    Tamanho dos shards enviados ao pool: cerca de SHARDS_PER_WORKER shards
+    por processo, arredondado para um múltiplo de batch_size (nenhum batch
+    atravessa dois shards).
+
+    Exemplo:
+        >>> shard_size(1000, workers=4, batch_size=32)
+        64
+    """
+    size = math.ceil(n_texts / (workers * SHARDS_PER_WORKER))
+    return max(1, math.ceil(size / batch_size)) * batch_size
+
+
+def window_size(workers: int, batch_size: int, min_texts: int = 1) -> int:
+    """
+    Textos por chamada ao pool: o menor múltiplo de
+    workers * SHARDS_PER_WORKER * batch_size que cobre `min_texts`. Com esse
+    tamanho, shard_size divide a janela em SHARDS_PER_WORKER shards por processo.
+
+    Exemplo:
+        >>> window_size(workers=8, batch_size=32, min_texts=256)
+        1024
+    """
+    unit = workers * SHARDS_PER_WORKER * batch_size
+    return max(1, math.ceil(min_texts / unit)) * unit
+
+
+class EncodePool:
+    """
+    Pool de processos para `model.encode`, iniciado na primeira chamada.
+
+    Exemplo de uso:
+        >>> with EncodePool(model, workers=4) as pool:
+        ...     embeddings = pool.encode(chunks, batch_size=64)
+        >>> embeddings.shape
+        (1200, 384)
+    """
+
+    # Batch de cada processo
+    DEFAULT_BATCH_SIZE = 32
+
+    def __init__(self, model: Any, workers: Optional[int] = None):
+        """
+        Args:
+            model: SentenceTransformer já carregado
+            workers: Processos de encode (default: todos os núcleos)
+        """
+        self.model = model
+        self.workers = resolve_workers(workers)
+        self._pool: Optional[Dict[str, Any]] = None
+
+    def start(self) -> None:
+        """Inicia os processos (uma cópia do modelo em cada um)."""
+        if self._pool is not None:
+            return
+
+        print(f"🧵 Iniciando {self.workers} processos de embedding...")
+        threads = str(max(1, (os.cpu_count() or 1) // self.workers))
+        previous = os.environ.get("OMP_NUM_THREADS")
+        # Os processos filhos herdam o ambiente no momento do spawn
+        os.environ["OMP_NUM_THREADS"] = threads
+        try:
+            self._pool = self.model.start_multi_process_pool(target_devices=["cpu"] * self.workers)
+        finally:
+            if previous is None:
+                os.environ.pop("OMP_NUM_THREADS", None)
+            else:
+                os.environ["OMP_NUM_THREADS"] = previous
+
+    def encode(
+        self,
+        texts: Sequence[str],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        lengths: Optional[Sequence[int]] = None
+    ) -> np.ndarray:
+        """
+        Gera os embeddings de `texts` nos processos do pool.
+
+        Args:
+            texts: Textos a embedar
+            batch_size: Batch de cada processo
+            lengths: Comprimentos em tokens já calculados (default: calculados aqui)
+
+        Returns:
+            np.ndarray: Matriz (len(texts), dim), na ordem de `texts`
+        """
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        self.start()
+
+        # Ordena por tokens e divide em vários shards por processo: a fila do
+        # pool distribui os shards longos e curtos entre os processos
+        if lengths is None:
+            lengths = token_lengths(self.model, texts)
+        order = np.argsort(-np.asarray(lengths, dtype=np.int64), kind="stable")
+        embeddings = self.model.encode(
+            [texts[i] for i in order],
+            batch_size=batch_size,
+            pool=self._pool,
+            chunk_size=shard_size(len(texts), self.workers, batch_size),
+        )
+
+        restored = np.empty_like(embeddings)
+        restored[order] = embeddings
+        return restored
+
+    def close(self) -> None:
+        """Encerra os processos. Chamadas repetidas são seguras."""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            self.model.stop_multi_process_pool(pool)
+
+    def __enter__(self) -> "EncodePool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
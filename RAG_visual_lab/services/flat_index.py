@@ -0,0 +1,415 @@
+# services/flat_index.py
+
+"""
+Flat Index
+==========
+
+Índice vetorial local, exportado de uma coleção do ChromaDB, para coleções
+que só são lidas (synthetic_dataset_papers, direito_constitucional).
+
+Abrir um PersistentClient carrega o SQLite e o índice HNSW; aqui os arquivos
+são mapeados em memória (mmap) e a abertura é instantânea: o sistema
+operacional só lê as páginas quando a busca as usa. A busca é exata (todos
+os vetores são comparados), então o recall é determinístico.
+
+Formato (um diretório por coleção, ver flat_index_path):
+- embeddings.npy: matriz (n, dim) em float32, float16 ou int8
+- scales.npy: escala de cada vetor (apenas int8: vetor ≈ codes * escala)
+- full.npy: vetores em float32 para reordenar os candidatos (opcional,
+  apenas para float16/int8)
+- sq_norms.npy: normas ao quadrado de cada vetor (float32)
+- texts.bin + offsets.npy: documentos em UTF-8 concatenados e seus limites
+- index.json: nome, métrica, dtype, ids e metadados de cada chunk
+
+A busca reproduz a métrica da coleção de origem ("l2", "cosine" ou "ip",
+metadado "hnsw:space" do ChromaDB, default "l2"), inclusive nas distâncias
+retornadas.
+
+Filtros `where` (mesmo formato do ChromaDB, ver utils.document_metadata)
+são avaliados sobre os metadados em memória antes da varredura: só os
+vetores dos chunks selecionados são lidos e comparados.
+
+Com float16 ou int8, a varredura lê 2x ou 4x menos bytes. Se full.npy
+existir, os `RESCORE_FACTOR * n_results` melhores candidatos são
+reordenados com os vetores originais (só essas linhas são lidas do disco),
+e a ordem e as distâncias finais são as da busca em float32.
+"""
+
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.document_metadata import matches_where
+from utils.vector_search import quantize_int8, top_k_indices, top_k_indices_batch
+
+FORMAT_VERSION = 1
+DTYPES = ("float32", "float16", "int8")
+METRICS = ("l2", "cosine", "ip")
+
+# Vetores convertidos para float32 por vez durante a busca
+SEARCH_BLOCK_ROWS = 65536
+
+
+def flat_index_path(db_path: str, collection_name: str) -> str:
+    """Diretório do índice flat de `collection_name`, ao lado do banco ChromaDB."""
+    return os.path.join(db_path, "flat", collection_name)
+
+
+def export_flat_index(
+    collection: Any,
+    path: str,
+    dtype: str = "float32",
+    batch_size: int = 1000,
+    rescore: bool = True,
+) -> Dict[str, Any]:
+    """
+    Exporta uma coleção do ChromaDB para o formato flat.
+
+    Os chunks são lidos em páginas de `batch_size` e gravados diretamente nos
+    arquivos finais; o diretório só substitui o índice anterior quando a
+    exportação termina.
+
+    Args:
+        collection: Coleção do ChromaDB (get/count/name/metadata)
+        path: Diretório de destino (ver flat_index_path)
+        dtype: "float32", "float16" (metade do espaço, ~3 dígitos de precisão)
+               ou "int8" (um quarto do espaço, escala por vetor)
+        batch_size: Chunks lidos por chamada a collection.get
+        rescore: Com float16/int8, grava também full.npy (float32) para
+                 reordenar os candidatos em precisão total
+
+    Returns:
+        dict: colecao, chunks, dim, dtype, metrica e bytes no disco
+
+    Exemplo:
+        >>> export_flat_index(encoder.collection, flat_index_path("./chroma_db", "docs"), dtype="float16")
+        {'colecao': 'docs', 'chunks': 1240, 'dim': 384, 'dtype': 'float16', 'metrica': 'l2', 'bytes': 2712345}
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype deve ser um de {DTYPES}, recebido: '{dtype}'")
+
+    metadata = dict(collection.metadata or {})
+    metric = metadata.get("hnsw:space", "l2")
+    if metric not in METRICS:
+        raise ValueError(f"Métrica '{metric}' não suportada pelo índice flat")
+
+    count = collection.count()
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    ids: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    sq_norms = np.zeros(count, dtype=np.float32)
+    scales = np.zeros(count, dtype=np.float32)
+    matrix = None
+    full = None
+    position = 0
+
+    with open(os.path.join(tmp_path, "texts.bin"), "wb") as texts_file:
+        for offset in range(0, count, batch_size):
+            page = collection.get(
+                limit=batch_size,
+                offset=offset,
+                include=["embeddings", "documents", "metadatas"],
+            )
+            embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+            if not len(embeddings):
+                break
+            if matrix is None:
+                shape = (count, embeddings.shape[1])
+                matrix = np.lib.format.open_memmap(
+                    os.path.join(tmp_path, "embeddings.npy"), mode="w+", dtype=dtype, shape=shape
+                )
+                if rescore and dtype != "float32":
+                    full = np.lib.format.open_memmap(
+                        os.path.join(tmp_path, "full.npy"), mode="w+", dtype=np.float32, shape=shape
+                    )
+
+            end = position + len(embeddings)
+            if dtype == "int8":
+                matrix[position:end], scales[position:end] = quantize_int8(embeddings)
+                stored = matrix[position:end] * scales[position:end, None]
+            else:
+                matrix[position:end] = embeddings
+                stored = np.asarray(matrix[position:end], dtype=np.float32)
+            if full is not None:
+                full[position:end] = embeddings
+            # Normas dos valores gravados (já arredondados para o dtype)
+            sq_norms[position:end] = np.einsum("ij,ij->i", stored, stored)
+
+            for i, document in enumerate(page["documents"], position):
+                encoded = (document or "").encode("utf-8")
+                texts_file.write(encoded)
+                offsets[i + 1] = offsets[i] + len(encoded)
+
+            ids.extend(page["ids"])
+            metadatas.extend(page.get("metadatas") or [{}] * len(embeddings))
+            position = end
+
+    dim = 0 if matrix is None else matrix.shape[1]
+    if matrix is None:
+        np.save(os.path.join(tmp_path, "embeddings.npy"), np.zeros((0, 0), dtype=dtype))
+    else:
+        matrix.flush()
+        del matrix
+    if full is not None:
+        full.flush()
+        del full
+    if dtype == "int8":
+        np.save(os.path.join(tmp_path, "scales.npy"), scales[:position])
+
+    np.save(os.path.join(tmp_path, "sq_norms.npy"), sq_norms[:position])
+    np.save(os.path.join(tmp_path, "offsets.npy"), offsets[:position + 1])
+    with open(os.path.join(tmp_path, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "format_version": FORMAT_VERSION,
+                "name": collection.name,
+                "metadata": metadata,
+                "metric": metric,
+                "dtype": dtype,
+                "dim": dim,
+                "ids": ids,
+                "metadatas": [m or {} for m in metadatas],
+            },
+            f,
+            ensure_ascii=False,
+        )
+
+    # Substitui o índice anterior só depois de tudo gravado
+    old_path = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    print(f"📦 Índice flat de '{collection.name}' exportado: {position} chunks ({dtype}, {size / 1e6:.1f} MB)")
+    return {
+        "colecao": collection.name,
+        "chunks": position,
+        "dim": dim,
+        "dtype": dtype,
+        "metrica": metric,
+        "bytes": size,
+    }
+
+
+class FlatIndex:
+    """
+    Índice flat somente leitura, com a mesma interface de consulta de uma
+    coleção do ChromaDB (query, count, name, metadata).
+
+    Exemplo de uso:
+        >>> index = FlatIndex(flat_index_path("./chroma_db", "docs"))
+        >>> results = index.query(query_embeddings=[embedding], n_results=5)
+        >>> results["documents"][0][0]
+        'RAG combina recuperação de documentos com geração...'
+    """
+
+    # Candidatos por resultado reordenados com full.npy
+    RESCORE_FACTOR = 4
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Diretório criado por export_flat_index
+
+        Raises:
+            FileNotFoundError: Se o índice não existir
+            ValueError: Se o formato for incompatível
+        """
+        with open(os.path.join(path, "index.json"), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        if info.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Formato de índice flat incompatível em '{path}'")
+
+        self.path = path
+        self.name: str = info["name"]
+        self.metadata: Dict[str, Any] = info.get("metadata") or {}
+        self.metric: str = info["metric"]
+        self.dtype: str = info["dtype"]
+        self._ids: List[str] = info["ids"]
+        self._metadatas: List[Dict[str, Any]] = info["metadatas"]
+        self._positions: Optional[Dict[str, int]] = None  # id -> posição, criado no primeiro get()
+
+        self.embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+        self.sq_norms = np.load(os.path.join(path, "sq_norms.npy"))
+        self.scales = self._load_optional(path, "scales.npy")
+        self.full_precision = self._load_optional(path, "full.npy", mmap_mode="r")
+        self._offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        texts_path = os.path.join(path, "texts.bin")
+        self._texts = (
+            np.memmap(texts_path, dtype=np.uint8, mode="r")
+            if os.path.getsize(texts_path)
+            else np.zeros(0, dtype=np.uint8)
+        )
+
+    @staticmethod
+    def _load_optional(path: str, name: str, mmap_mode: Optional[str] = None) -> Optional[np.ndarray]:
+        file_path = os.path.join(path, name)
+        return np.load(file_path, mmap_mode=mmap_mode) if os.path.exists(file_path) else None
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    def document(self, index: int) -> str:
+        """Texto do chunk na posição `index`, lido do arquivo mapeado."""
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return self._texts[start:end].tobytes().decode("utf-8")
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        include: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Lê chunks pelo id e/ou por um filtro de metadados, no formato de
+        collection.get do ChromaDB.
+
+        Ids inexistentes são ignorados. Sem ids, lê todos os chunks que
+        satisfazem `where`.
+        """
+        include = ("documents", "metadatas") if include is None else include
+        if ids is None:
+            indices = list(range(self.count()))
+        else:
+            if self._positions is None:
+                self._positions = {chunk_id: i for i, chunk_id in enumerate(self._ids)}
+            indices = [self._positions[chunk_id] for chunk_id in ids if chunk_id in self._positions]
+        if where is not None:
+            indices = [i for i in indices if matches_where(self._metadatas[i], where)]
+
+        results: Dict[str, Any] = {"ids": [self._ids[i] for i in indices]}
+        if "documents" in include:
+            results["documents"] = [self.document(i) for i in indices]
+        if "metadatas" in include:
+            results["metadatas"] = [self._metadatas[i] for i in indices]
+        if "embeddings" in include:
+            results["embeddings"] = self.vectors(np.asarray(indices, dtype=np.intp))
+        return results
+
+    def vectors(self, indices: np.ndarray) -> np.ndarray:
+        """Vetores das posições `indices` em float32 (de full.npy, se existir)."""
+        if self.full_precision is not None:
+            return np.asarray(self.full_precision[indices], dtype=np.float32)
+        vectors = np.asarray(self.embeddings[indices], dtype=np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[indices][:, None]
+        return vectors
+
+    def filter(self, where: Dict[str, Any]) -> np.ndarray:
+        """Posições dos chunks cujos metadados satisfazem `where` (ordem do índice)."""
+        return np.asarray(
+            [i for i, metadata in enumerate(self._metadatas) if matches_where(metadata, where)],
+            dtype=np.intp,
+        )
+
+    def distances(self, query_embeddings: np.ndarray, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Distância de cada query aos vetores, na métrica da coleção.
+
+        Args:
+            query_embeddings: Matriz (n_queries, dim)
+            indices: Posições dos vetores comparados (default: todos)
+
+        Returns:
+            np.ndarray: Matriz (n_queries, n) em float32, n = len(indices)
+                        quando informado
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.embeddings.shape[-1])
+        n = self.count() if indices is None else len(indices)
+        dots = np.empty((len(queries), n), dtype=np.float32)
+        for start in range(0, n, SEARCH_BLOCK_ROWS):
+            rows = (
+                self.embeddings[start:start + SEARCH_BLOCK_ROWS]
+                if indices is None
+                else self.embeddings[indices[start:start + SEARCH_BLOCK_ROWS]]
+            )
+            block = np.asarray(rows, dtype=np.float32)
+            dots[:, start:start + len(block)] = queries @ block.T
+        scales = self.scales if indices is None or self.scales is None else self.scales[indices]
+        sq_norms = self.sq_norms if indices is None else self.sq_norms[indices]
+        if scales is not None:
+            dots *= scales[None, :]
+        return self._metric_distances(queries, dots, sq_norms[None, :])
+
+    def _exact_distances(self, query: np.ndarray, indices: np.ndarray) -> np.ndarray:
+        """Distâncias de uma query aos vetores `indices` em full.npy (float32)."""
+        vectors = np.asarray(self.full_precision[indices], dtype=np.float32)
+        queries = np.asarray(query, dtype=np.float32).reshape(1, -1)
+        sq_norms = np.einsum("ij,ij->i", vectors, vectors)[None, :]
+        return self._metric_distances(queries, queries @ vectors.T, sq_norms)[0]
+
+    def _metric_distances(self, queries: np.ndarray, dots: np.ndarray, sq_norms: np.ndarray) -> np.ndarray:
+        if self.metric == "ip":
+            return 1.0 - dots
+        query_sq_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+        if self.metric == "cosine":
+            denominator = np.sqrt(query_sq_norms * sq_norms)
+            return 1.0 - np.divide(dots, denominator, out=np.zeros_like(dots), where=denominator > 0)
+        # l2 (quadrado, como no ChromaDB): |q|² - 2 q·x + |x|²
+        return np.maximum(query_sq_norms - 2.0 * dots + sq_norms, 0.0)
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        include: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Busca os `n_results` chunks mais próximos de cada query.
+
+        A busca é exata em float32 e, em float16/int8, também quando full.npy
+        existe (os candidatos são reordenados em precisão total). Com `where`,
+        apenas os chunks que satisfazem o filtro são comparados.
+
+        Returns:
+            dict: Listas paralelas por query, no formato de collection.query
+                  do ChromaDB: ids, documents, distances e metadatas
+                  (e embeddings, se pedidos em `include`)
+        """
+        include = ("documents", "distances", "metadatas") if include is None else include
+        results: Dict[str, Any] = {"ids": [], "documents": [], "distances": [], "metadatas": []}
+        selected = None if where is None else self.filter(where)
+        if self.count() == 0 or (selected is not None and not len(selected)):
+            n_queries = len(np.atleast_2d(np.asarray(query_embeddings)))
+            return {key: [[] for _ in range(n_queries)] for key in results}
+
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.embeddings.shape[-1])
+        distances = self.distances(queries, selected)
+
+        def positions(columns: np.ndarray) -> np.ndarray:
+            # Colunas de `distances` -> posições no índice
+            return columns if selected is None else selected[columns]
+
+        if self.full_precision is None:
+            top = top_k_indices_batch(-distances, n_results)
+            ranked = [(positions(columns), distances[row, columns]) for row, columns in enumerate(top)]
+        else:
+            # Reordena os melhores candidatos com os vetores em float32
+            ranked = []
+            for query, columns in zip(queries, top_k_indices_batch(-distances, n_results * self.RESCORE_FACTOR)):
+                candidates = np.sort(positions(columns))
+                exact = self._exact_distances(query, candidates)
+                best = top_k_indices(-exact, n_results)
+                ranked.append((candidates[best], exact[best]))
+
+        for indices, row_distances in ranked:
+            results["ids"].append([self._ids[i] for i in indices])
+            if "documents" in include:
+                results["documents"].append([self.document(i) for i in indices])
+            if "distances" in include:
+                results["distances"].append(row_distances.tolist())
+            if "metadatas" in include:
+                results["metadatas"].append([self._metadatas[i] for i in indices])
+            if "embeddings" in include:
+                results.setdefault("embeddings", []).append(self.vectors(indices))
+        return results
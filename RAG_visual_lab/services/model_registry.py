@@ -0,0 +1,256 @@
+# services/model_registry.py
+
+"""
+Model Registry
+==============
+
+Registro de processo para recursos caros de inicializar: modelos
+SentenceTransformer e clientes ChromaDB persistentes.
+
+Carregar 'paraphrase-multilingual-MiniLM-L12-v2' leva alguns segundos e
+abrir um PersistentClient reabre o SQLite/HNSW do disco. Como as páginas
+criam um RetrieverProvider por mensagem, esses custos eram pagos a cada
+consulta. O registro mantém uma única instância por chave (nome do modelo
+ou caminho do banco) compartilhada entre todos os consumidores do processo.
+
+Funcionalidades:
+- Contagem de referências: cada acquire() deve ter um release() correspondente
+- Despejo por ociosidade: recursos sem referências há mais de
+  `idle_timeout_seconds` são descartados na próxima operação
+- Thread-safe: o Streamlit executa sessões em threads distintas. A criação
+  de um recurso acontece fora do lock do registro: só quem pede a mesma
+  chave espera pelo carregamento
+- Versões: índices exportados para o disco (flat, BM25) são registrados com a
+  versão dos seus arquivos (file_version); uma reexportação abre uma nova
+  instância em vez de servir a antiga
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _RegistryEntry:
+    """Recurso registrado com seu contador de referências."""
+
+    __slots__ = ("resource", "refcount", "last_used")
+
+    def __init__(self, resource: Any):
+        self.resource = resource
+        self.refcount = 0
+        self.last_used = time.monotonic()
+
+
+class ResourceRegistry:
+    """
+    Registro genérico de recursos compartilhados com contagem de referências.
+
+    Exemplo de uso:
+        >>> registry = ResourceRegistry(idle_timeout_seconds=600)
+        >>> model = registry.acquire("minilm", lambda: SentenceTransformer("minilm"))
+        >>> same = registry.acquire("minilm", lambda: SentenceTransformer("minilm"))
+        >>> model is same
+        True
+        >>> registry.release("minilm")
+        >>> registry.release("minilm")
+    """
+
+    DEFAULT_IDLE_TIMEOUT = 30 * 60  # 30 minutos
+
+    def __init__(self, idle_timeout_seconds: Optional[float] = DEFAULT_IDLE_TIMEOUT):
+        """
+        Args:
+            idle_timeout_seconds: Tempo sem referências após o qual o recurso é
+                                  despejado. None desativa o despejo automático.
+        """
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self._entries: Dict[Hashable, _RegistryEntry] = {}
+        # Chaves em criação: quem pede a mesma chave espera pelo evento
+        self._loading: Dict[Hashable, threading.Event] = {}
+        self._lock = threading.RLock()
+
+    def acquire(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Retorna o recurso associado à chave, criando-o com `factory` se necessário.
+
+        Args:
+            key: Chave do recurso (ex: nome do modelo ou caminho do banco)
+            factory: Função sem argumentos que cria o recurso
+
+        Returns:
+            O recurso compartilhado. O chamador passa a deter uma referência.
+        """
+        while True:
+            with self._lock:
+                self._evict_idle_locked(time.monotonic())
+
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refcount += 1
+                    entry.last_used = time.monotonic()
+                    return entry.resource
+
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Event()
+                    break
+            # Outra thread está criando o recurso: espera e consulta de novo
+            # (se a criação falhou, esta thread tenta criá-lo)
+            loading.wait()
+
+        # A criação roda fora do lock: um modelo demorando para carregar não
+        # bloqueia acquire/release das outras chaves
+        try:
+            resource = factory()
+            with self._lock:
+                entry = _RegistryEntry(resource)
+                entry.refcount = 1
+                self._entries[key] = entry
+            return resource
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+
+    def release(self, key: Hashable) -> None:
+        """
+        Libera uma referência ao recurso. Chaves desconhecidas são ignoradas.
+
+        O recurso permanece em memória até ficar ocioso por mais de
+        `idle_timeout_seconds`, de modo que a próxima consulta o reutilize.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.refcount > 0:
+                entry.refcount -= 1
+                entry.last_used = time.monotonic()
+            self._evict_idle_locked(time.monotonic())
+
+    def evict_idle(self) -> int:
+        """
+        Despeja recursos sem referências que excederam o tempo de ociosidade.
+
+        Returns:
+            int: Número de recursos despejados
+        """
+        with self._lock:
+            return self._evict_idle_locked(time.monotonic())
+
+    def discard_unreferenced(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Remove, sem esperar a ociosidade, os recursos sem referências cuja chave
+        satisfaz `predicate` (ex.: versões antigas de um índice).
+
+        Returns:
+            int: Número de recursos removidos
+        """
+        with self._lock:
+            discarded = [
+                key for key, entry in self._entries.items()
+                if entry.refcount == 0 and predicate(key)
+            ]
+            for key in discarded:
+                del self._entries[key]
+            return len(discarded)
+
+    def clear(self) -> None:
+        """Remove todos os recursos, independentemente das referências."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Mapeamento chave -> {"refcount", "idle_seconds"}
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                key: {
+                    "refcount": entry.refcount,
+                    "idle_seconds": round(now - entry.last_used, 3),
+                }
+                for key, entry in self._entries.items()
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _evict_idle_locked(self, now: float) -> int:
+        if self.idle_timeout_seconds is None:
+            return 0
+
+        expired = [
+            key
+            for key, entry in self._entries.items()
+            if entry.refcount == 0 and now - entry.last_used > self.idle_timeout_seconds
+        ]
+        for key in expired:
+            del self._entries[key]
+        return len(expired)
+
+
+# ==================== REGISTROS DO PROCESSO ====================
+
+model_registry = ResourceRegistry()
+client_registry = ResourceRegistry()
+
+
+def _client_key(db_path: str, version: Optional[Hashable] = None) -> Hashable:
+    """Normaliza o caminho para que './chroma_db' e o absoluto compartilhem o cliente."""
+    path = os.path.normcase(os.path.abspath(db_path))
+    return path if version is None else (path, version)
+
+
+def file_version(path: str) -> Optional[Tuple[int, int]]:
+    """
+    Versão de um arquivo no disco: (mtime em ns, tamanho). Muda quando o
+    arquivo é regravado; None se ele não existir.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def acquire_model(model_name: str, factory: Callable[[], Any]) -> Any:
+    """Obtém (carregando se necessário) o modelo de embeddings `model_name`."""
+    return model_registry.acquire(model_name, factory)
+
+
+def release_model(model_name: str) -> None:
+    """Libera uma referência obtida com acquire_model()."""
+    model_registry.release(model_name)
+
+
+def acquire_client(db_path: str, factory: Callable[[], Any], version: Optional[Hashable] = None) -> Any:
+    """
+    Obtém (abrindo se necessário) o cliente ChromaDB do caminho `db_path`.
+
+    Args:
+        db_path: Caminho do banco (ou do índice)
+        factory: Função sem argumentos que abre o cliente
+        version: Versão do conteúdo no disco (ex.: file_version do índice).
+                 Uma versão diferente abre uma nova instância; as versões
+                 anteriores sem referências são descartadas
+    """
+    key = _client_key(db_path, version)
+    client = client_registry.acquire(key, factory)
+    if version is not None:
+        path = key[0]
+        client_registry.discard_unreferenced(
+            lambda other: isinstance(other, tuple) and other[0] == path and other != key
+        )
+    return client
+
+
+def release_client(db_path: str, version: Optional[Hashable] = None) -> None:
+    """Libera uma referência obtida com acquire_client() (com a mesma versão)."""
+    client_registry.release(_client_key(db_path, version))
@@ -0,0 +1,272 @@
+# services/multi_collection_retriever.py
+
+"""
+MultiCollectionRetriever Service
+================================
+
+Busca uma pergunta em várias coleções do ChromaDB e devolve uma única lista
+ordenada.
+
+Perguntas que cruzam os datasets (ex.: o uso de dados sintéticos à luz do
+direito constitucional) não cabem em uma única coleção. Aqui:
+
+1. A query é codificada uma única vez (com o cache de embeddings do processo)
+2. Cada coleção é consultada com o mesmo embedding, em paralelo, em um pool
+   de threads (a busca no ChromaDB e os produtos matriciais do NumPy liberam
+   o GIL)
+3. As distâncias não são comparáveis entre coleções (cada uma tem a sua
+   métrica: "l2", "cosine" ou "ip"); os resultados são normalizados para a
+   similaridade cosseno com a query, calculada a partir dos embeddings dos
+   chunks, e intercalados em uma única lista. Cada coleção contribui com os
+   seus melhores resultados pela própria métrica, que coincide com a ordem
+   por cosseno quando os embeddings têm norma semelhante. No modo híbrido a
+   lista unificada segue o score da fusão (RRF) de cada coleção, e não o
+   cosseno: todas fundem as mesmas duas listas com o mesmo k, e os chunks
+   encontrados só pelo BM25 ("art. 5º", "2111.01888v1") mantêm a posição
+4. Com reranker, cada coleção contribui com rerank_factor vezes mais
+   candidatos e o cross-encoder reordena a lista unificada de uma só vez
+
+Os RetrieverProvider de cada coleção compartilham o modelo e o cliente pelo
+registro do processo (services.model_registry).
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Sequence
+
+import numpy as np
+
+from services.embedding_backend import DEFAULT_BACKEND
+from services.embedding_cache import QueryEmbeddingCache, encode_with_cache, query_embedding_cache
+from services.reranker import CrossEncoderReranker, rerank_hits
+from services.retriever_provider import RetrievalResult, RetrieverProvider
+
+
+class MultiCollectionRetriever:
+    """
+    Recupera chunks de várias coleções com uma única lista de resultados.
+
+    Tem a mesma interface de busca do RetrieverProvider (search e
+    search_results), então as páginas podem usar um ou outro.
+
+    Exemplo de uso:
+        >>> with MultiCollectionRetriever(
+        ...     collection_names=["synthetic_dataset_papers", "direito_constitucional"]
+        ... ) as retriever:
+        ...     results = retriever.search_results("Dados sintéticos e a LGPD", n_results=5)
+        >>> [(r.collection, round(r.similarity, 2)) for r in results[:3]]
+        [('direito_constitucional', 0.58), ('synthetic_dataset_papers', 0.55), ('direito_constitucional', 0.51)]
+    """
+
+    def __init__(
+        self,
+        db_path: str = RetrieverProvider.DEFAULT_DB_PATH,
+        collection_names: Sequence[str] = (),
+        model_name: str = RetrieverProvider.DEFAULT_MODEL,
+        embedding_cache: Optional[QueryEmbeddingCache] = None,
+        backend: str = DEFAULT_BACKEND,
+        vector_store: str = "chroma",
+        retrieval_mode: str = "dense",
+        reranker: Optional[CrossEncoderReranker] = None,
+        rerank_factor: int = 3,
+        max_workers: Optional[int] = None
+    ):
+        """
+        Args:
+            db_path: Caminho do banco ChromaDB (ou dos índices flat/BM25)
+            collection_names: Coleções consultadas. Devem existir previamente
+            model_name: Modelo de embeddings usado em todas as coleções
+            embedding_cache: Cache de embeddings de queries. Default: cache do processo
+            backend: Backend de inferência do modelo ("torch", "onnx" ou "onnx-int8")
+            vector_store: "chroma" (default) ou "flat", para todas as coleções
+            retrieval_mode: "dense" (default) ou "hybrid", para todas as coleções
+            reranker: Cross-encoder aplicado à lista unificada (None = sem reranking).
+                      Fechado junto com o MultiCollectionRetriever
+            rerank_factor: Candidatos buscados por resultado em cada coleção quando há reranker
+            max_workers: Threads de consulta (default: uma por coleção)
+
+        Raises:
+            ValueError: Se collection_names estiver vazio ou rerank_factor < 1
+            Exception: Se alguma coleção não existir (as já abertas são fechadas)
+        """
+        collection_names = list(dict.fromkeys(collection_names))
+        if not collection_names:
+            raise ValueError("collection_names não pode ser vazio")
+        if rerank_factor < 1:
+            raise ValueError("rerank_factor deve ser >= 1")
+
+        self.db_path = db_path
+        self.collection_names = collection_names
+        self.embedding_cache = embedding_cache if embedding_cache is not None else query_embedding_cache
+        self.retrieval_mode = retrieval_mode
+        self.reranker = reranker
+        self.rerank_factor = rerank_factor
+        self.max_workers = max(1, min(max_workers or len(collection_names), len(collection_names)))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        # Chunks descartados por min_similarity no último search_results
+        self.last_below_threshold = 0
+
+        # Um RetrieverProvider por coleção, sem reranker: o reranking é feito
+        # uma única vez sobre a lista unificada
+        self.retrievers: list[RetrieverProvider] = []
+        try:
+            for collection_name in collection_names:
+                self.retrievers.append(RetrieverProvider(
+                    db_path=db_path,
+                    collection_name=collection_name,
+                    model_name=model_name,
+                    embedding_cache=self.embedding_cache,
+                    backend=backend,
+                    vector_store=vector_store,
+                    retrieval_mode=retrieval_mode,
+                ))
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        """Fecha os retrievers de cada coleção, o pool de threads e o reranker."""
+        for retriever in self.retrievers:
+            retriever.close()
+        self.retrievers = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self.reranker is not None:
+            self.reranker.close()
+
+    def __enter__(self) -> "MultiCollectionRetriever":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def search(self, query_text: str, n_results: int = 10, where: Optional[dict] = None) -> list[str]:
+        """
+        Busca chunks em todas as coleções e devolve apenas os textos.
+
+        Returns:
+            list[str]: Chunks do mais ao menos similar, de qualquer coleção.
+                      Lista vazia em caso de erro.
+        """
+        return [result.text for result in self.search_results(query_text, n_results, where=where)]
+
+    def search_results(
+        self,
+        query_text: str,
+        n_results: int = 10,
+        min_similarity: Optional[float] = None,
+        where: Optional[dict] = None
+    ) -> list[RetrievalResult]:
+        """
+        Busca chunks em todas as coleções e intercala os resultados.
+
+        Uma coleção que falha na consulta é ignorada (as demais respondem).
+
+        Args:
+            query_text: Texto da consulta do usuário
+            n_results: Número máximo de chunks a retornar (no total, não por coleção)
+            min_similarity: Descarta chunks com similaridade abaixo do limiar (None = sem limiar)
+            where: Filtro de metadados aplicado em todas as coleções (ver RetrieverProvider.search)
+
+        Returns:
+            list[RetrievalResult]: Resultados com a coleção de origem (key collection),
+                do mais ao menos relevante. Lista vazia em caso de erro ou se nada
+                passar do limiar (ver last_below_threshold).
+        """
+        self.last_below_threshold = 0
+        try:
+            print(
+                f"\n🔎 [RETRIEVAL] Buscando chunks em {len(self.retrievers)} coleções "
+                f"para query: '{query_text[:50]}...'"
+            )
+
+            # 1. Um único embedding para todas as coleções
+            model = self.retrievers[0].modelo
+            query_embedding = encode_with_cache(
+                model, self.retrievers[0].model_key, [query_text], self.embedding_cache
+            )
+
+            # 2. Consultas em paralelo
+            n_candidates = n_results * self.rerank_factor if self.reranker is not None else n_results
+            executor = self._get_executor()
+            futures = [
+                (retriever.collection_name, executor.submit(
+                    retriever.search_embeddings, [query_text], query_embedding, n_candidates, where
+                ))
+                for retriever in self.retrievers
+            ]
+            hits = []
+            for collection_name, future in futures:
+                try:
+                    collection_hits = future.result()[0]
+                except Exception as e:
+                    print(f"⚠️ [RETRIEVAL] Erro na coleção '{collection_name}', ignorando: {e}")
+                    continue
+                hits.extend({**hit, "collection": collection_name} for hit in collection_hits)
+
+            # 3. Similaridade cosseno (ou score da fusão, no modo híbrido) como
+            # escala comum entre as coleções
+            hits = self._merge(hits)
+            if self.reranker is not None:
+                hits = rerank_hits(self.reranker, query_text, hits, n_results)
+            results = [RetrievalResult.from_hit(hit) for hit in hits[:n_results]]
+
+            if min_similarity is not None:
+                candidates = len(results)
+                results = [
+                    result for result in results
+                    if result.similarity is not None and result.similarity >= min_similarity
+                ]
+                self.last_below_threshold = candidates - len(results)
+
+            per_collection = {name: 0 for name in self.collection_names}
+            for result in results:
+                per_collection[result.collection] += 1
+            print(f"✅ [RETRIEVAL] {len(results)} chunks selecionados: {per_collection}")
+
+            return results
+
+        except Exception as e:
+            print(f"❌ [RETRIEVAL] Erro na busca multi-coleção: {e}")
+            return []
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Pool de threads criado na primeira busca e mantido até close()."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="multi-collection"
+                )
+            return self._executor
+
+    def _merge(self, hits: list[dict]) -> list[dict]:
+        """
+        Ordena os resultados de todas as coleções pela similaridade cosseno.
+
+        No modo híbrido, ordena pelo score da fusão (key score) de cada
+        coleção: a ordem por cosseno descartaria a contribuição do BM25.
+        Resultados sem similaridade (ou sem score) vão para o fim, na ordem
+        em que chegaram.
+        """
+        key = "score" if self.retrieval_mode == "hybrid" else "similarity"
+        return sorted(
+            hits,
+            key=lambda hit: -np.inf if hit.get(key) is None else hit[key],
+            reverse=True,
+        )
+
+    def get_collection_info(self) -> dict:
+        """
+        Informações de cada coleção (ver RetrieverProvider.get_collection_info).
+
+        Returns:
+            dict: names, count (total de chunks) e collections (informações por coleção)
+        """
+        infos = [retriever.get_collection_info() for retriever in self.retrievers]
+        return {
+            "names": [info["name"] for info in infos],
+            "count": sum(info["count"] for info in infos),
+            "collections": infos,
+        }
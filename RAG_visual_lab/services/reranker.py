@@ -0,0 +1,301 @@
+# services/reranker.py
+
+"""
+Cross-Encoder Reranker
+======================
+
+Reordena os chunks recuperados pela busca vetorial com um cross-encoder.
+
+O bi-encoder (SentenceTransformer) compara vetores calculados separadamente
+para a query e para o chunk; o cross-encoder lê os dois juntos e estima a
+relevância do par com muito mais precisão. O RetrieverProvider busca mais
+candidatos do que o necessário (over-fetch), o reranker pontua os pares
+(query, chunk) em batches e apenas os melhores seguem para o prompt:
+menos chunks, mais relevantes, menos tokens de geração.
+
+Custos sob controle:
+- Scores de pares já vistos vêm de um cache LRU compartilhado pelo processo
+  (PairScoreCache): perguntas repetidas não passam de novo pelo modelo
+- Orçamento de latência por query: se os batches restantes não cabem no
+  orçamento (pelo custo por par medido ou configurado), o reranking é
+  abandonado e a ordem da busca vetorial é mantida
+- O modelo vem do registro do processo (services.model_registry)
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from services.embedding_cache import QueryEmbeddingCache
+from services.model_registry import acquire_model, release_model
+
+
+class PairScoreCache:
+    """
+    Cache LRU thread-safe de scores (query, chunk) por modelo.
+
+    Chave: (modelo, query normalizada, SHA-1 do chunk); o texto do chunk não
+    fica em memória.
+    """
+
+    DEFAULT_MAX_ENTRIES = 16384
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        if max_entries <= 0:
+            raise ValueError("max_entries deve ser positivo")
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_name: str, query: str, document: str) -> Tuple[str, str, str]:
+        digest = hashlib.sha1(document.encode("utf-8")).hexdigest()
+        return (model_name, QueryEmbeddingCache.normalize_query(query), digest)
+
+    def get_many(self, model_name: str, query: str, documents: Sequence[str]) -> List[Optional[float]]:
+        """Scores em cache de cada documento (None quando ausente)."""
+        keys = [self._key(model_name, query, document) for document in documents]
+        scores: List[Optional[float]] = []
+        with self._lock:
+            for key in keys:
+                score = self._entries.get(key)
+                if score is None:
+                    self._misses += 1
+                else:
+                    self._hits += 1
+                    self._entries.move_to_end(key)
+                scores.append(score)
+        return scores
+
+    def put_many(self, model_name: str, query: str, documents: Sequence[str], scores: Sequence[float]) -> None:
+        """Armazena os scores, descartando os pares menos usados além do limite."""
+        keys = [self._key(model_name, query, document) for document in documents]
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._entries[key] = float(score)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove todas as entradas e zera as estatísticas."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+# Cache compartilhado por todos os rerankers do processo
+pair_score_cache = PairScoreCache()
+
+# Menor custo por par (ms) medido para cada modelo. Compartilhado pelo processo
+# (as páginas criam um reranker por pergunta). O menor custo é uma estimativa
+# otimista: um batch lento (aquecimento do modelo) não faz as próximas
+# queries desistirem de um reranking que caberia no orçamento
+measured_pair_costs: Dict[str, float] = {}
+
+
+class CrossEncoderReranker:
+    """
+    Reordena documentos por relevância para a query com um cross-encoder.
+
+    Exemplo de uso:
+        >>> reranker = CrossEncoderReranker(latency_budget_ms=300)
+        >>> reranker.rerank("O que é RAG?", ["Redis guarda o histórico...", "RAG combina..."])
+        [(1, 7.91), (0, -3.42)]
+    """
+
+    # Multilíngue (mMARCO): os datasets têm documentos em português e inglês
+    DEFAULT_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        batch_size: int = 16,
+        latency_budget_ms: Optional[float] = 1000.0,
+        max_length: int = 256,
+        cache: Optional[PairScoreCache] = None,
+        pair_cost_ms: Optional[float] = None,
+    ):
+        """
+        Args:
+            model_name: Modelo CrossEncoder do sentence-transformers
+            batch_size: Pares pontuados por forward pass
+            latency_budget_ms: Tempo máximo de reranking por query (None = sem limite).
+                               Não inclui a carga do modelo
+            max_length: Tokens por par (query + chunk); o restante é truncado
+            cache: Cache de scores. Default: cache compartilhado pelo processo
+            pair_cost_ms: Custo estimado de um par, usado até a primeira medição
+                          do modelo no processo. None = o primeiro batch da
+                          primeira query roda sem verificação
+        """
+        if batch_size <= 0:
+            raise ValueError("batch_size deve ser positivo")
+        if pair_cost_ms is not None and pair_cost_ms < 0:
+            raise ValueError("pair_cost_ms não pode ser negativo")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.latency_budget_ms = latency_budget_ms
+        self.max_length = max_length
+        self.cache = cache if cache is not None else pair_score_cache
+        self.pair_cost_ms = pair_cost_ms
+        # Chave no registro, separada dos modelos de embedding
+        self.model_key = f"cross-encoder:{model_name}@{max_length}"
+        self.model = None
+        self._stats = {"queries": 0, "reranked": 0, "fallbacks": 0, "pairs_scored": 0}
+        self._lock = threading.Lock()
+
+    def _load_model(self) -> Any:
+        """Carrega o cross-encoder (chamado apenas quando não está no registro)."""
+        from sentence_transformers import CrossEncoder
+
+        print(f"🔄 Carregando cross-encoder '{self.model_name}'...")
+        return CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+
+    def _ensure_model(self) -> Any:
+        if self.model is None:
+            self.model = acquire_model(self.model_key, self._load_model)
+        return self.model
+
+    def rerank(self, query: str, documents: Sequence[str]) -> Optional[List[Tuple[int, float]]]:
+        """
+        Pontua os pares (query, documento) e ordena do mais ao menos relevante.
+
+        Os pares sem score em cache são pontuados em batches. Antes de cada
+        batch, inclusive o primeiro, o custo por par estima se os pares
+        restantes cabem no orçamento; se não couberem, nenhum reordenamento
+        é feito. A estimativa é o custo médio dos pares já pontuados nesta
+        query ou, antes do primeiro batch, o menor custo medido no processo
+        (ou o pair_cost_ms configurado). Sem nenhuma estimativa, o primeiro
+        batch roda sem verificação e serve de medição.
+
+        Args:
+            query: Texto da consulta
+            documents: Candidatos na ordem da busca vetorial
+
+        Returns:
+            list[tuple[int, float]]: (índice em `documents`, score), do mais
+            relevante ao menos relevante; None se o orçamento de latência foi
+            excedido (o chamador mantém a ordem original)
+        """
+        documents = list(documents)
+        model = self._ensure_model()
+        start = time.perf_counter()
+
+        scores = self.cache.get_many(self.model_key, query, documents)
+        pending = [i for i, score in enumerate(scores) if score is None]
+        scored = 0
+        scoring_ms = 0.0
+        exceeded = False
+
+        for batch_start in range(0, len(pending), self.batch_size):
+            pair_cost_ms = scoring_ms / scored if scored else self.estimated_pair_cost_ms()
+            if self.latency_budget_ms is not None and pair_cost_ms is not None:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                remaining_ms = pair_cost_ms * (len(pending) - scored)
+                if elapsed_ms + remaining_ms > self.latency_budget_ms:
+                    exceeded = True
+                    break
+
+            batch = pending[batch_start:batch_start + self.batch_size]
+            batch_started = time.perf_counter()
+            batch_scores = model.predict(
+                [(query, documents[i]) for i in batch],
+                batch_size=len(batch),
+                show_progress_bar=False,
+            )
+            batch_ms = (time.perf_counter() - batch_started) * 1000
+            scoring_ms += batch_ms
+            self._record_pair_cost(batch_ms / len(batch))
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+            # Scores parciais também vão para o cache: a próxima tentativa é mais rápida
+            self.cache.put_many(self.model_key, query, [documents[i] for i in batch], batch_scores)
+            scored += len(batch)
+
+        with self._lock:
+            self._stats["queries"] += 1
+            self._stats["pairs_scored"] += scored
+            self._stats["fallbacks" if exceeded else "reranked"] += 1
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if exceeded:
+            print(
+                f"⚠️ [RERANK] Orçamento de {self.latency_budget_ms:.0f} ms excedido "
+                f"({scored}/{len(pending)} pares pontuados): mantendo a ordem da busca vetorial"
+            )
+            return None
+
+        print(f"🏅 [RERANK] {len(documents)} candidatos reordenados em {elapsed_ms:.0f} ms")
+        return sorted(
+            ((i, float(score)) for i, score in enumerate(scores)),
+            key=lambda entry: entry[1],
+            reverse=True,
+        )
+
+    def estimated_pair_cost_ms(self) -> Optional[float]:
+        """Menor custo por par medido para o modelo ou, sem medição, o pair_cost_ms configurado."""
+        return measured_pair_costs.get(self.model_key, self.pair_cost_ms)
+
+    def _record_pair_cost(self, pair_cost_ms: float) -> None:
+        with self._lock:
+            previous = measured_pair_costs.get(self.model_key)
+            if previous is None or pair_cost_ms < previous:
+                measured_pair_costs[self.model_key] = pair_cost_ms
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: queries, reranked, fallbacks e pairs_scored (contagens),
+                  pair_cost_ms (custo estimado de um par) e cache
+        """
+        with self._lock:
+            return {
+                **self._stats,
+                "pair_cost_ms": self.estimated_pair_cost_ms(),
+                "cache": self.cache.stats(),
+            }
+
+    def close(self) -> None:
+        """Libera a referência ao modelo no registro. Chamadas repetidas são seguras."""
+        if self.model is not None:
+            release_model(self.model_key)
+            self.model = None
+
+
+def rerank_hits(
+    reranker: CrossEncoderReranker, query: str, hits: List[dict], n_results: int
+) -> List[dict]:
+    """
+    Reordena os resultados de uma busca com o cross-encoder e mantém os
+    n_results melhores, com a key rerank_score.
+
+    Se o orçamento de latência for excedido (ou o cross-encoder falhar),
+    mantém a ordem recebida. Usado pelo RetrieverProvider e pelo
+    MultiCollectionRetriever.
+    """
+    if len(hits) <= 1:
+        return hits[:n_results]
+    try:
+        ranking = reranker.rerank(query, [hit["document"] for hit in hits])
+    except Exception as e:
+        print(f"⚠️ [RERANK] Erro no cross-encoder, mantendo a ordem da busca: {e}")
+        ranking = None
+    if ranking is None:
+        return hits[:n_results]
+    return [{**hits[i], "rerank_score": score} for i, score in ranking[:n_results]]
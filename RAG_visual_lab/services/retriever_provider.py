@@ -5,12 +5,109 @@ RetrieverProvider Service
 =========================
 
 Encapsula a lógica de recuperação de chunks do ChromaDB para o pipeline RAG.
+
+search() devolve apenas os textos (formato do AugmentationProvider);
+search_results() devolve RetrievalResult, com id, distância, similaridade e
+metadados de cada chunk, e aceita um limiar de similaridade.
+
+Todas as buscas aceitam um filtro `where` sobre os metadados dos chunks
+(source_file, title, page_start/page_end, ingested_at), no formato do
+ChromaDB e aplicado pelo próprio armazenamento antes da busca vetorial.
 """
 
+import os
+
 import chromadb
 from sentence_transformers import SentenceTransformer
 from typing import Optional
 
+import numpy as np
+
+from services.bm25_index import BM25Index, bm25_index_path, reciprocal_rank_fusion
+from services.embedding_backend import (
+    DEFAULT_BACKEND,
+    load_sentence_transformer,
+    model_key,
+    validate_backend,
+)
+from services.embedding_cache import (
+    QueryEmbeddingCache,
+    encode_with_cache,
+    query_embedding_cache,
+)
+from services.flat_index import FlatIndex, flat_index_path
+from services.model_registry import (
+    acquire_client,
+    acquire_model,
+    file_version,
+    release_client,
+    release_model,
+)
+from services.reranker import CrossEncoderReranker, rerank_hits
+from utils.vector_search import mmr_select, normalize_rows
+
+
+class RetrievalResult:
+    """
+    Chunk recuperado com as informações da busca.
+    
+    Usa __slots__: sem __dict__ por instância, cada resultado ocupa apenas
+    os seus sete campos.
+    
+    Atributos:
+        text: Texto do chunk
+        id: ID do chunk na coleção
+        distance: Distância para a query na métrica da coleção (None para
+                  chunks encontrados apenas pelo BM25)
+        similarity: Similaridade cosseno com a query, em [-1, 1]
+        score: Score da etapa que definiu a ordem (cross-encoder ou fusão
+               híbrida); None na busca puramente vetorial
+        metadata: Metadados do chunk
+        collection: Coleção de origem (preenchida pelo MultiCollectionRetriever)
+    """
+    
+    __slots__ = ("text", "id", "distance", "similarity", "score", "metadata", "collection")
+    
+    def __init__(
+        self,
+        text: str,
+        id: Optional[str] = None,
+        distance: Optional[float] = None,
+        similarity: Optional[float] = None,
+        score: Optional[float] = None,
+        metadata: Optional[dict] = None,
+        collection: Optional[str] = None
+    ):
+        self.text = text
+        self.id = id
+        self.distance = distance
+        self.similarity = similarity
+        self.score = score
+        self.metadata = metadata or {}
+        self.collection = collection
+    
+    @classmethod
+    def from_hit(cls, hit: dict) -> "RetrievalResult":
+        """Cria o resultado a partir de um dict de search_many()."""
+        return cls(
+            text=hit["document"],
+            id=hit.get("id"),
+            distance=hit.get("distance"),
+            similarity=hit.get("similarity"),
+            score=hit.get("rerank_score", hit.get("score")),
+            metadata=hit.get("metadata"),
+            collection=hit.get("collection"),
+        )
+    
+    @property
+    def source(self) -> Optional[str]:
+        """Arquivo de origem do chunk (metadado source_file), para citações."""
+        return self.metadata.get("source_file")
+    
+    def __repr__(self) -> str:
+        similarity = "None" if self.similarity is None else f"{self.similarity:.3f}"
+        return f"RetrievalResult(id={self.id!r}, similarity={similarity}, text={self.text[:40]!r})"
+
 
 class RetrieverProvider:
     """
@@ -25,6 +122,28 @@ class RetrieverProvider:
     - Segue o padrão Service do projeto (similar a MemoryProvider)
     - Retorna chunks no formato esperado pelo AugmentationProvider (list[str])
     - Isolado de dependências externas para facilitar testes
+    - Modelo e cliente vêm do registro do processo (services.model_registry):
+      criar um RetrieverProvider por consulta não recarrega o modelo
+    - Embeddings de queries repetidas vêm de um cache LRU compartilhado
+      (services.embedding_cache), evitando o forward pass do modelo
+    - O backend de inferência é configurável (services.embedding_backend):
+      "torch" (padrão), "onnx" ou "onnx-int8" (mais rápido em CPU)
+    - O armazenamento é configurável: "chroma" (padrão) ou "flat", o índice
+      mapeado em memória exportado da coleção (services.flat_index), com
+      abertura instantânea e busca exata
+    - O modo de recuperação é configurável: "dense" (padrão, só vetores) ou
+      "hybrid", que funde a busca vetorial com o índice BM25 da coleção
+      (services.bm25_index) por reciprocal rank fusion, recuperando termos
+      exatos como números de artigos e identificadores de papers
+    - Reranking opcional (services.reranker): busca rerank_factor vezes mais
+      candidatos e um cross-encoder escolhe os n_results mais relevantes,
+      dentro de um orçamento de latência por query
+    - Seleção por MMR opcional (selection="mmr"): busca mmr_fetch_factor vezes
+      mais candidatos com os embeddings e escolhe um top-k relevante e diverso,
+      evitando chunks sobrepostos quase idênticos no prompt
+    - Filtro de metadados (`where`) repassado ao armazenamento: no ChromaDB e
+      no índice flat, só os chunks selecionados são comparados; no modo
+      híbrido, o BM25 é restrito aos mesmos chunks
     
     Exemplo de uso:
         >>> retriever = RetrieverProvider(
@@ -38,12 +157,27 @@ class RetrieverProvider:
     
     DEFAULT_DB_PATH = "./chroma_db"
     DEFAULT_MODEL = 'paraphrase-multilingual-MiniLM-L12-v2'
+    VECTOR_STORES = ("chroma", "flat")
+    RETRIEVAL_MODES = ("dense", "hybrid")
+    SELECTION_MODES = ("similarity", "mmr")
+    # Candidatos de cada lista (vetorial e BM25) antes da fusão no modo híbrido
+    HYBRID_CANDIDATES = 50
     
     def __init__(
         self, 
         db_path: str = DEFAULT_DB_PATH, 
         collection_name: str = "",
-        model_name: str = DEFAULT_MODEL
+        model_name: str = DEFAULT_MODEL,
+        embedding_cache: Optional[QueryEmbeddingCache] = None,
+        backend: str = DEFAULT_BACKEND,
+        vector_store: str = "chroma",
+        retrieval_mode: str = "dense",
+        rrf_k: int = 60,
+        reranker: Optional[CrossEncoderReranker] = None,
+        rerank_factor: int = 3,
+        selection: str = "similarity",
+        mmr_lambda: float = 0.5,
+        mmr_fetch_factor: int = 4
     ):
         """
         Inicializa o RetrieverProvider com conexão ao ChromaDB.
@@ -55,9 +189,27 @@ class RetrieverProvider:
                            Exemplo: "synthetic_dataset_papers"
             model_name: Nome do modelo SentenceTransformer para gerar embeddings.
                        Default: 'paraphrase-multilingual-MiniLM-L12-v2'
+            embedding_cache: Cache de embeddings de queries.
+                            Default: cache compartilhado pelo processo
+            backend: Backend de inferência do modelo: "torch", "onnx" ou "onnx-int8".
+                     Default: "torch"
+            vector_store: "chroma" (default) ou "flat". Com "flat", a coleção é lida de
+                          <db_path>/flat/<collection_name> (ver services.flat_index)
+            retrieval_mode: "dense" (default) ou "hybrid". O modo híbrido lê o índice BM25
+                            de <db_path>/bm25/<collection_name>, criado pelo SemanticEncoder.build
+            rrf_k: Constante k da reciprocal rank fusion (maior = ranks mais uniformes)
+            reranker: Cross-encoder que reordena os candidatos (None = sem reranking).
+                      Fechado junto com o RetrieverProvider
+            rerank_factor: Candidatos buscados por resultado quando há reranker
+            selection: "similarity" (default, ordem da busca) ou "mmr" (Maximal Marginal
+                       Relevance: relevantes e diversos)
+            mmr_lambda: Peso da relevância no MMR (1.0 = só relevância, 0.0 = só diversidade)
+            mmr_fetch_factor: Candidatos buscados por resultado no MMR
         
         Raises:
-            ValueError: Se collection_name estiver vazio ou for None
+            ValueError: Se collection_name estiver vazio, backend/vector_store/retrieval_mode
+                        for inválido, selection for inválido, rerank_factor/mmr_fetch_factor < 1
+                        ou mmr_lambda fora de [0, 1]
             Exception: Se a coleção não existir no ChromaDB ou houver erro de conexão
         
         Exemplo:
@@ -68,13 +220,52 @@ class RetrieverProvider:
         """
         if not collection_name:
             raise ValueError("collection_name não pode ser vazio")
+        if vector_store not in self.VECTOR_STORES:
+            raise ValueError(f"vector_store deve ser um de {self.VECTOR_STORES}, recebido: '{vector_store}'")
+        if retrieval_mode not in self.RETRIEVAL_MODES:
+            raise ValueError(
+                f"retrieval_mode deve ser um de {self.RETRIEVAL_MODES}, recebido: '{retrieval_mode}'"
+            )
         
         self.db_path = db_path
         self.collection_name = collection_name
         self.model_name = model_name
-        self.client = None  # chromadb.PersistentClient
-        self.collection = None  # chromadb.Collection
+        self.backend = validate_backend(backend)
+        # Chave no registro e no cache: o mesmo modelo em outro backend é outra entrada
+        self.model_key = model_key(model_name, self.backend)
+        self.vector_store = vector_store
+        # Chave do cliente no registro: o banco ChromaDB ou o diretório do índice flat
+        self._store_path = (
+            flat_index_path(db_path, collection_name) if vector_store == "flat" else db_path
+        )
+        self._store_version = None  # versão do índice flat no registro (ver _initialize)
+        self._lexical_version = None  # versão do índice BM25 no registro
+        if rerank_factor < 1:
+            raise ValueError("rerank_factor deve ser >= 1")
+        if selection not in self.SELECTION_MODES:
+            raise ValueError(f"selection deve ser um de {self.SELECTION_MODES}, recebido: '{selection}'")
+        if mmr_fetch_factor < 1:
+            raise ValueError("mmr_fetch_factor deve ser >= 1")
+        if not 0.0 <= mmr_lambda <= 1.0:
+            raise ValueError("mmr_lambda deve estar entre 0 e 1")
+        self.retrieval_mode = retrieval_mode
+        self.rrf_k = rrf_k
+        self.reranker = reranker
+        self.rerank_factor = rerank_factor
+        self.selection = selection
+        self.mmr_lambda = mmr_lambda
+        self.mmr_fetch_factor = mmr_fetch_factor
+        self._lexical_path = bm25_index_path(db_path, collection_name)
+        self.embedding_cache = (
+            embedding_cache if embedding_cache is not None else query_embedding_cache
+        )
+        self.client = None  # chromadb.PersistentClient (ou FlatIndex)
+        self.collection = None  # chromadb.Collection (ou FlatIndex)
         self.modelo = None  # SentenceTransformer
+        self.lexical_index = None  # BM25Index (modo híbrido)
+        # Chunks descartados por min_similarity no último search_results
+        # (0 se não houve limiar ou se a busca falhou)
+        self.last_below_threshold = 0
         
         self._initialize()
     
@@ -85,43 +276,107 @@ class RetrieverProvider:
         Este método é chamado automaticamente durante __init__.
         Separa a lógica de inicialização para facilitar testes (pode ser mockado).
         
+        O cliente e o modelo são obtidos do registro do processo: apenas a
+        primeira instância paga o custo de abrir o banco e carregar o modelo.
+        
         Raises:
             Exception: Se houver erro ao conectar ao ChromaDB ou carregar o modelo
         """
         try:
-            # Conectar ao ChromaDB em modo persistente
-            # Referência: https://docs.trychroma.com/docs/run-chroma/persistent-client
-            self.client = chromadb.PersistentClient(path=self.db_path)
+            if self.vector_store == "flat":
+                # Índice flat: os arquivos são mapeados em memória, e o próprio
+                # índice responde às consultas como uma coleção. A versão do
+                # index.json identifica a exportação: uma reexportação abre
+                # um novo índice no registro
+                self._store_version = file_version(os.path.join(self._store_path, "index.json"))
+                self.client = acquire_client(
+                    self._store_path, lambda: FlatIndex(self._store_path), version=self._store_version
+                )
+                self.collection = self.client
+            else:
+                # Conectar ao ChromaDB em modo persistente (um cliente por caminho)
+                # Referência: https://docs.trychroma.com/docs/run-chroma/persistent-client
+                self.client = acquire_client(
+                    self.db_path, lambda: chromadb.PersistentClient(path=self.db_path)
+                )
+                
+                # Obter a coleção existente (não cria uma nova)
+                # Lança exceção se a coleção não existir
+                self.collection = self.client.get_collection(name=self.collection_name)
             
-            # Obter a coleção existente (não cria uma nova)
-            # Lança exceção se a coleção não existir
-            self.collection = self.client.get_collection(name=self.collection_name)
+            if self.retrieval_mode == "hybrid":
+                # Índice BM25 mapeado em memória, compartilhado como os clientes;
+                # recriado no registro quando o build regrava o índice
+                self._lexical_version = file_version(os.path.join(self._lexical_path, "index.json"))
+                self.lexical_index = acquire_client(
+                    self._lexical_path, lambda: BM25Index(self._lexical_path), version=self._lexical_version
+                )
             
-            # Carregar modelo de embeddings
+            # Carregar modelo de embeddings (um modelo por nome e backend)
             # Mesmo modelo usado no código de referência para garantir compatibilidade
-            print(f"🔄 Carregando modelo de embeddings '{self.model_name}'...")
-            self.modelo = SentenceTransformer(self.model_name)
+            self.modelo = acquire_model(self.model_key, self._load_model)
             
             print(f"✅ Conectado à coleção '{self.collection_name}'")
             print(f"📊 Total de documentos: {self.collection.count()}")
             
-        except ValueError as e:
-            # Coleção não existe
+        except (ValueError, FileNotFoundError) as e:
+            # Coleção (ou índice flat/BM25) não existe
+            self.close()
             raise Exception(
-                f"Coleção '{self.collection_name}' não encontrada em '{self.db_path}'. "
+                f"Coleção '{self.collection_name}' não encontrada em '{self._store_path}'. "
                 f"Certifique-se de que a coleção foi criada primeiro. Erro: {e}"
             )
         except Exception as e:
             # Outros erros (rede, permissões, modelo inválido, etc.)
+            self.close()
             raise Exception(f"Erro ao inicializar RetrieverProvider: {e}")
     
-    def search(self, query_text: str, n_results: int = 10) -> list[str]:
+    def _load_model(self) -> SentenceTransformer:
+        """Carrega o modelo de embeddings (chamado apenas quando não está no registro)."""
+        print(f"🔄 Carregando modelo de embeddings '{self.model_name}' (backend: {self.backend})...")
+        if self.backend == DEFAULT_BACKEND:
+            return SentenceTransformer(self.model_name)
+        return load_sentence_transformer(self.model_name, self.backend)
+    
+    def close(self) -> None:
+        """
+        Libera as referências ao modelo e ao cliente no registro do processo.
+        
+        Os recursos continuam carregados para as próximas instâncias e só são
+        descartados após ficarem ociosos. Chamadas repetidas são seguras.
+        """
+        if self.modelo is not None:
+            release_model(self.model_key)
+            self.modelo = None
+        if self.client is not None:
+            release_client(self._store_path, self._store_version)
+            self.client = None
+        if self.lexical_index is not None:
+            release_client(self._lexical_path, self._lexical_version)
+            self.lexical_index = None
+        if self.reranker is not None:
+            self.reranker.close()
+        self.collection = None
+    
+    def __enter__(self) -> "RetrieverProvider":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+    
+    def search(
+        self,
+        query_text: str,
+        n_results: int = 10,
+        where: Optional[dict] = None
+    ) -> list[str]:
         """
         Busca chunks de documentos similares à query usando busca vetorial.
         
         Processo:
-        1. Gera embedding da query usando SentenceTransformer
-        2. Busca os n_results chunks mais similares no ChromaDB (HNSW index)
+        1. Gera embedding da query usando SentenceTransformer (ou reaproveita do cache)
+        2. Busca os n_results chunks mais similares no ChromaDB (HNSW index);
+           com reranker, busca mais candidatos e o cross-encoder escolhe os n_results
         3. Retorna apenas os textos dos documentos (não metadados ou distâncias)
         
         Args:
@@ -129,6 +384,10 @@ class RetrieverProvider:
                        Exemplo: "What are the main concepts of RAG?"
             n_results: Número máximo de chunks a retornar.
                       Padrão: 10 (balanceado entre contexto e custo de tokens)
+            where: Filtro de metadados no formato do ChromaDB, aplicado antes da
+                   busca. Exemplo: {"source_file": "cf88.pdf"} ou
+                   {"$and": [{"title": "Eutanásia"}, {"page_start": {"$gte": 10}}]}.
+                   None = toda a coleção
         
         Returns:
             list[str]: Lista de chunks ordenados por similaridade (mais similar primeiro).
@@ -150,24 +409,14 @@ class RetrieverProvider:
             # 🔍 Logging: Início da busca
             print(f"\n🔎 [RETRIEVAL] Buscando chunks para query: '{query_text[:50]}...'")
             
-            # 1. Gerar embedding da query
-            # encode() retorna numpy array, convertemos para lista para ChromaDB
-            assert self.modelo is not None, "Modelo não foi inicializado"
-            query_embedding = self.modelo.encode([query_text])
+            # 1. Gerar embedding da query (ou obter do cache)
+            query_embedding = self._encode_queries([query_text])
             
-            # 2. Buscar no ChromaDB usando busca vetorial
-            # Referência: https://docs.trychroma.com/docs/querying-collections/query-and-get
-            assert self.collection is not None, "Collection não foi inicializada"
-            results = self.collection.query(
-                query_embeddings=query_embedding.tolist(),
-                n_results=n_results,
-                include=['documents', 'distances', 'metadatas']
-            )
+            # 2. Buscar (vetorial ou híbrida) e, se configurado, reordenar
+            results = self._retrieve([query_text], query_embedding, n_results, where=where)[0]
             
             # 3. Extrair apenas os textos dos documentos
-            # results['documents'] é uma lista de listas: [[doc1, doc2, ...]]
-            # Pegamos a primeira lista (única query)
-            chunks = results['documents'][0] if results['documents'] else []
+            chunks = [result["document"] for result in results]
             
             # ✅ Logging: Resultado da busca
             print(f"✅ [RETRIEVAL] Encontrados {len(chunks)} chunks relevantes")
@@ -179,6 +428,327 @@ class RetrieverProvider:
             # Retorna lista vazia em caso de erro para não quebrar o pipeline
             return []
     
+    def search_results(
+        self,
+        query_text: str,
+        n_results: int = 10,
+        min_similarity: Optional[float] = None,
+        where: Optional[dict] = None
+    ) -> list[RetrievalResult]:
+        """
+        Busca chunks como search(), devolvendo resultados estruturados.
+        
+        Os embeddings dos chunks são buscados junto para calcular a
+        similaridade cosseno com a query, independente da métrica da coleção.
+        
+        Args:
+            query_text: Texto da consulta do usuário
+            n_results: Número máximo de chunks a retornar
+            min_similarity: Descarta chunks com similaridade abaixo do limiar.
+                            Lista vazia = nada relevante: o chamador pode
+                            pular a chamada ao LLM. None = sem limiar
+            where: Filtro de metadados (ver search())
+        
+        Returns:
+            list[RetrievalResult]: Resultados na ordem da busca. Lista vazia
+                se houver erro ou nenhum resultado acima do limiar; para
+                distinguir os dois casos, last_below_threshold guarda quantos
+                chunks o limiar descartou.
+        
+        Exemplo:
+            >>> results = retriever.search_results("O que diz o art. 5º?", min_similarity=0.35)
+            >>> if not results and retriever.last_below_threshold:
+            ...     print("Nada relevante: sem chamada ao LLM")
+            >>> [(r.source, round(r.similarity, 2)) for r in results[:2]]
+            [('constituicao.pdf', 0.71), ('constituicao.pdf', 0.64)]
+        """
+        self.last_below_threshold = 0
+        try:
+            print(f"\n🔎 [RETRIEVAL] Buscando chunks para query: '{query_text[:50]}...'")
+            
+            query_embedding = self._encode_queries([query_text])
+            hits = self._retrieve(
+                [query_text], query_embedding, n_results, with_similarity=True, where=where
+            )[0]
+            results = [RetrievalResult.from_hit(hit) for hit in hits]
+            
+            if min_similarity is not None:
+                results = [
+                    result for result in results
+                    if result.similarity is not None and result.similarity >= min_similarity
+                ]
+                self.last_below_threshold = len(hits) - len(results)
+                print(
+                    f"✅ [RETRIEVAL] {len(results)} de {len(hits)} chunks com "
+                    f"similaridade >= {min_similarity:.2f}"
+                )
+            else:
+                print(f"✅ [RETRIEVAL] Encontrados {len(results)} chunks relevantes")
+            
+            return results
+            
+        except Exception as e:
+            print(f"❌ [RETRIEVAL] Erro na busca: {e}")
+            return []
+    
+    def search_many(
+        self,
+        queries: list[str],
+        n_results: int = 10,
+        where: Optional[dict] = None
+    ) -> list[list[dict]]:
+        """
+        Busca chunks para várias queries de uma só vez.
+        
+        Todas as queries são codificadas em um único batch do SentenceTransformer
+        e enviadas em uma única chamada collection.query, em vez de N forward
+        passes e N consultas. Útil para avaliações offline e expansão de query.
+        O modo híbrido e o reranking são aplicados como em search().
+        
+        Args:
+            queries: Lista de textos de consulta
+            n_results: Número máximo de chunks por query
+            where: Filtro de metadados aplicado a todas as queries (ver search())
+        
+        Returns:
+            list[list[dict]]: Uma lista de resultados por query, na mesma ordem
+                de `queries`. Cada resultado tem as keys:
+                - id: ID do chunk no ChromaDB
+                - document: Texto do chunk
+                - distance: Distância para a query (menor = mais similar)
+                - metadata: Metadados do chunk
+                No modo híbrido, distance é None para chunks encontrados apenas
+                pelo BM25 e há a key score (score da fusão, maior = melhor).
+                Com reranker, há a key rerank_score (score do cross-encoder).
+                Em caso de erro, retorna listas vazias para todas as queries.
+        
+        Exemplo:
+            >>> results = retriever.search_many(["What is RAG?", "What is HNSW?"], n_results=3)
+            >>> results[1][0]["document"]
+            'HNSW is a graph-based index...'
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+        
+        try:
+            print(f"\n🔎 [RETRIEVAL] Buscando chunks para {len(queries)} queries em lote")
+            
+            query_embeddings = self._encode_queries(queries)
+            
+            batched = self._retrieve(queries, query_embeddings, n_results, where=where)
+            
+            print(f"✅ [RETRIEVAL] Lote concluído ({sum(len(r) for r in batched)} chunks)")
+            
+            return batched
+            
+        except Exception as e:
+            print(f"❌ [RETRIEVAL] Erro na busca em lote: {e}")
+            return [[] for _ in queries]
+    
+    def search_embeddings(
+        self,
+        queries: list[str],
+        query_embeddings: np.ndarray,
+        n_results: int = 10,
+        where: Optional[dict] = None
+    ) -> list[list[dict]]:
+        """
+        Busca com embeddings de query já calculados.
+        
+        Permite codificar a query uma única vez e buscá-la em várias coleções
+        (ver services.multi_collection_retriever). Cada resultado tem as keys
+        de search_many() e a key similarity. Ao contrário das outras buscas,
+        erros são propagados ao chamador.
+        
+        Args:
+            queries: Textos das consultas (usados pelo BM25 e pelo reranker)
+            query_embeddings: Matriz (len(queries), dim) do mesmo modelo da coleção
+            n_results: Número máximo de chunks por query
+            where: Filtro de metadados (ver search())
+        """
+        return self._retrieve(
+            list(queries), np.asarray(query_embeddings), n_results, with_similarity=True, where=where
+        )
+    
+    def _encode_queries(self, queries: list[str]) -> np.ndarray:
+        """Codifica as queries em um único batch, reaproveitando o cache de embeddings."""
+        assert self.modelo is not None, "Modelo não foi inicializado"
+        return encode_with_cache(self.modelo, self.model_key, queries, self.embedding_cache)
+    
+    def _retrieve(
+        self,
+        queries: list[str],
+        query_embeddings: np.ndarray,
+        n_results: int,
+        with_similarity: bool = False,
+        where: Optional[dict] = None
+    ) -> list[list[dict]]:
+        """
+        Busca os resultados de cada query (vetorial ou híbrida), aplica a
+        seleção por MMR e o reranking.
+        
+        Com with_similarity, os embeddings dos chunks também são buscados e
+        cada resultado recebe a key similarity (cosseno com a query). O filtro
+        `where` é repassado ao armazenamento.
+        """
+        # Com reranker, busca mais candidatos do que serão devolvidos
+        n_candidates = n_results * self.rerank_factor if self.reranker is not None else n_results
+        # O MMR escolhe os n_candidates entre mmr_fetch_factor vezes mais chunks
+        use_mmr = self.selection == "mmr"
+        n_fetch = n_candidates * self.mmr_fetch_factor if use_mmr else n_candidates
+        with_embeddings = use_mmr or with_similarity
+        
+        if self.retrieval_mode == "hybrid":
+            batched = self._hybrid_query(
+                queries, query_embeddings, n_fetch, with_embeddings=with_embeddings, where=where
+            )
+        else:
+            # Referência: https://docs.trychroma.com/docs/querying-collections/query-and-get
+            assert self.collection is not None, "Collection não foi inicializada"
+            results = self.collection.query(
+                query_embeddings=query_embeddings.tolist(),
+                n_results=n_fetch,
+                where=where,
+                include=['documents', 'distances', 'metadatas'] + (['embeddings'] if with_embeddings else [])
+            )
+            batched = [self._unpack_query_results(results, i) for i in range(len(queries))]
+        
+        if use_mmr:
+            batched = [
+                self._select_mmr(query_embedding, hits, n_candidates)
+                for query_embedding, hits in zip(query_embeddings, batched)
+            ]
+        
+        if self.reranker is not None:
+            batched = [rerank_hits(self.reranker, query, hits, n_results) for query, hits in zip(queries, batched)]
+        
+        # Os embeddings dos chunks não seguem nos resultados
+        for query_embedding, hits in zip(query_embeddings, batched):
+            embeddings = [hit.pop("embedding", None) for hit in hits]
+            if with_similarity and hits and all(embedding is not None for embedding in embeddings):
+                similarities = normalize_rows(np.asarray(embeddings, dtype=np.float32)) @ normalize_rows(
+                    np.asarray(query_embedding, dtype=np.float32)
+                )
+                for hit, similarity in zip(hits, similarities):
+                    hit["similarity"] = float(similarity)
+        return batched
+    
+    def _select_mmr(self, query_embedding: np.ndarray, hits: list[dict], top_k: int) -> list[dict]:
+        """
+        Seleciona top_k resultados por MMR.
+        
+        No modo híbrido, a relevância é o score da fusão (normalizado em [0, 1]):
+        chunks encontrados só pelo BM25 não são penalizados pela similaridade vetorial.
+        """
+        embeddings = [hit.get("embedding") for hit in hits]
+        if not hits:
+            return hits
+        if any(embedding is None for embedding in embeddings):
+            print("⚠️ [RETRIEVAL] Embeddings ausentes nos resultados, mantendo a ordem da busca")
+            return hits[:top_k]
+        relevance = None
+        if all("score" in hit for hit in hits):
+            scores = np.array([hit["score"] for hit in hits], dtype=np.float32)
+            spread = scores.max() - scores.min()
+            relevance = (scores - scores.min()) / spread if spread > 0 else np.ones_like(scores)
+        order = mmr_select(
+            query_embedding, np.asarray(embeddings, dtype=np.float32), top_k, self.mmr_lambda, relevance
+        )
+        return [hits[i] for i in order]
+    
+    def _hybrid_query(
+        self,
+        queries: list[str],
+        query_embeddings: np.ndarray,
+        n_results: int,
+        with_embeddings: bool = False,
+        where: Optional[dict] = None
+    ) -> list[list[dict]]:
+        """
+        Funde, por query, o ranking vetorial e o ranking BM25 (reciprocal rank fusion).
+        
+        Cada lista contribui com até HYBRID_CANDIDATES candidatos; os chunks
+        encontrados só pelo BM25 são lidos da coleção pelo id. Com `where`, o
+        BM25 pontua apenas os chunks que satisfazem o filtro: os ids são lidos
+        da coleção na primeira vez que o filtro aparece e a máscara fica em
+        cache no índice BM25 (compartilhado pelo processo).
+        """
+        assert self.collection is not None, "Collection não foi inicializada"
+        assert self.lexical_index is not None, "Índice BM25 não foi inicializado"
+        candidates = max(n_results, self.HYBRID_CANDIDATES)
+        
+        dense = self.collection.query(
+            query_embeddings=query_embeddings.tolist(),
+            n_results=candidates,
+            where=where,
+            include=['documents', 'distances', 'metadatas'] + (['embeddings'] if with_embeddings else [])
+        )
+        mask = None if where is None else self.lexical_index.filter_mask(
+            where, lambda: self.collection.get(where=where, include=[])['ids']
+        )
+        
+        batched = []
+        for i, query in enumerate(queries):
+            dense_hits = {hit["id"]: hit for hit in self._unpack_query_results(dense, i)}
+            lexical_ids = [
+                chunk_id for chunk_id, _ in self.lexical_index.search(query, candidates, mask=mask)
+            ]
+            fused = reciprocal_rank_fusion([list(dense_hits), lexical_ids], k=self.rrf_k)[:n_results]
+            
+            missing = [chunk_id for chunk_id, _ in fused if chunk_id not in dense_hits]
+            if missing:
+                include = ['documents', 'metadatas'] + (['embeddings'] if with_embeddings else [])
+                found = self.collection.get(ids=missing, include=include)
+                for j, chunk_id in enumerate(found['ids']):
+                    hit = {
+                        "id": chunk_id,
+                        "document": found['documents'][j],
+                        "distance": None,
+                        "metadata": found['metadatas'][j] or {},
+                    }
+                    if with_embeddings:
+                        hit["embedding"] = found['embeddings'][j]
+                    dense_hits[chunk_id] = hit
+            
+            batched.append([
+                {**dense_hits[chunk_id], "score": score}
+                for chunk_id, score in fused
+                if chunk_id in dense_hits
+            ])
+        return batched
+    
+    @staticmethod
+    def _unpack_query_results(results: dict, query_index: int) -> list[dict]:
+        """Converte as listas paralelas do ChromaDB de uma query em uma lista de dicts."""
+        def column(key: str) -> list:
+            values = results.get(key)
+            # Embeddings podem vir como np.ndarray: sem teste de verdade sobre o valor
+            if values is None or query_index >= len(values) or values[query_index] is None:
+                return []
+            return list(values[query_index])
+        
+        documents = column('documents')
+        ids = column('ids') or [None] * len(documents)
+        distances = column('distances') or [None] * len(documents)
+        metadatas = column('metadatas') or [{}] * len(documents)
+        
+        hits = [
+            {
+                "id": chunk_id,
+                "document": document,
+                "distance": distance,
+                "metadata": metadata or {},
+            }
+            for chunk_id, document, distance, metadata
+            in zip(ids, documents, distances, metadatas)
+        ]
+        # Embeddings (seleção por MMR) ficam só até a seleção
+        embeddings = column('embeddings')
+        for hit, embedding in zip(hits, embeddings):
+            hit["embedding"] = embedding
+        return hits
+    
     def get_collection_info(self) -> dict:
         """
         Retorna informações sobre a coleção atual.
@@ -190,6 +760,7 @@ class RetrieverProvider:
                 - name: Nome da coleção
                 - count: Número total de documentos
                 - metadata: Metadados da coleção (se houver)
+                - query_cache: Estatísticas do cache de embeddings (ver get_cache_stats)
         
         Exemplo:
             >>> retriever = RetrieverProvider(collection_name="docs")
@@ -198,10 +769,26 @@ class RetrieverProvider:
             Collection: docs, Documents: 139
         """
         if not self.collection:
-            return {"name": None, "count": 0, "metadata": {}}
+            return {"name": None, "count": 0, "metadata": {}, "query_cache": self.get_cache_stats()}
         
         return {
             "name": self.collection.name,
             "count": self.collection.count(),
-            "metadata": self.collection.metadata or {}
+            "metadata": self.collection.metadata or {},
+            "query_cache": self.get_cache_stats()
         }
+    
+    def get_cache_stats(self) -> dict:
+        """
+        Retorna as estatísticas do cache de embeddings de queries.
+        
+        Returns:
+            dict: hits, misses, hit_rate, entries, bytes, evictions e limites
+        
+        Exemplo:
+            >>> retriever.search("O que é RAG?")
+            >>> retriever.search("O que é  RAG?")
+            >>> retriever.get_cache_stats()["hits"]
+            1
+        """
+        return self.embedding_cache.stats()
@@ -0,0 +1,35 @@
+"""
+Shared pytest fixtures.
+
+The services keep process-wide state (model/client registry, the query
+embedding cache, the reranker pair-score cache and pair costs) so that the Streamlit pages
+do not reload the embedding model on every query. Tests mock SentenceTransformer and chromadb per test, so that
+state must be reset between tests to keep one test's mocks from leaking into
+the next.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture(autouse=True)
+def reset_shared_registries():
+    """Clears the process-wide registries and caches around each test."""
+    from services.embedding_cache import query_embedding_cache
+    from services.model_registry import client_registry, model_registry
+    from services.reranker import measured_pair_costs, pair_score_cache
+
+    def clear():
+        model_registry.clear()
+        client_registry.clear()
+        query_embedding_cache.clear()
+        pair_score_cache.clear()
+        measured_pair_costs.clear()
+
+    clear()
+    yield
+    clear()
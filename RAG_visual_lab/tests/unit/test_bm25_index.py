@@ -0,0 +1,270 @@
+"""
+Unit Tests: BM25 Index
+======================
+
+Tests for services.bm25_index, the persisted lexical index built from a
+ChromaDB collection, and for RetrieverProvider(retrieval_mode="hybrid").
+
+Test Strategy:
+    - The analyzer keeps identifiers ("2111.01888v1", "5º") and folds accents
+    - Scores from the compact postings match a reference BM25 computed in Python
+    - Reciprocal rank fusion rewards items ranked high in several lists
+    - Hybrid retrieval surfaces an exact-term chunk the dense ranking misses,
+      with both the Chroma and the flat vector stores
+    - A `where` filter restricts both the dense and the lexical rankings; its
+      mask is cached on the index, so the filtered ids are read only once
+    - A rebuilt index replaces the registry-cached one (and its masks)
+"""
+
+import math
+import os
+import sys
+from collections import Counter
+from unittest.mock import MagicMock, patch
+
+import chromadb
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from services.bm25_index import (
+    BM25Index,
+    analyze,
+    bm25_index_path,
+    build_bm25_index,
+    reciprocal_rank_fusion,
+)
+from services.flat_index import export_flat_index, flat_index_path
+
+DOCUMENTS = [
+    "A Constituição garante a inviolabilidade do domicílio.",
+    "Art. 5º, inciso XI: a casa é asilo inviolável do indivíduo.",
+    "Retrieval-augmented generation combines retrieval and generation.",
+    "See arXiv 2111.01888v1 for the synthetic dataset of papers.",
+    "Dense retrieval uses embeddings; sparse retrieval uses term statistics.",
+    "O art. 6º trata dos direitos sociais, como educação e saúde.",
+]
+
+
+def _collection(tmp_path, dim=8, seed=0):
+    rng = np.random.RandomState(seed)
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    collection = client.create_collection(name="docs")
+    collection.add(
+        ids=[f"id-{i}" for i in range(len(DOCUMENTS))],
+        embeddings=rng.randn(len(DOCUMENTS), dim).tolist(),
+        documents=DOCUMENTS,
+        metadatas=[{"source_file": f"doc{i}.pdf"} for i in range(len(DOCUMENTS))],
+    )
+    return client, collection
+
+
+def _reference_scores(query, k1=1.2, b=0.75):
+    docs = [Counter(analyze(text)) for text in DOCUMENTS]
+    lengths = [sum(doc.values()) for doc in docs]
+    average = sum(lengths) / len(lengths)
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term, query_tf in Counter(analyze(query)).items():
+            df = sum(1 for other in docs if term in other)
+            if not df:
+                continue
+            idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            tf = doc[term]
+            score += query_tf * idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / average))
+        scores.append(score)
+    return np.array(scores)
+
+
+def test_analyze_keeps_identifiers_and_folds_accents():
+    terms = analyze("Art. 5º da Constituição, ver 2111.01888v1")
+
+    assert terms[:4] == ["art", "5o", "da", "constituicao"]
+    assert analyze("art. 5o") == analyze("Art. 5º")
+    assert "2111.01888v1" in terms
+    assert "2111" in terms and "01888v1" in terms
+
+
+def test_bm25_scores_match_reference(tmp_path):
+    _, collection = _collection(tmp_path)
+    path = bm25_index_path(str(tmp_path / "chroma"), "docs")
+
+    stats = build_bm25_index(collection, path, batch_size=4)
+    index = BM25Index(path)
+
+    assert stats["chunks"] == len(index) == len(DOCUMENTS)
+    assert index._doc_ids.dtype == np.uint32 and index._tfs.dtype == np.uint16
+    for query in ["retrieval generation", "art. 5º inviolável", "educação saúde"]:
+        np.testing.assert_allclose(index.scores(query), _reference_scores(query), rtol=1e-5)
+
+
+def test_bm25_search_finds_exact_identifier(tmp_path):
+    _, collection = _collection(tmp_path)
+    path = bm25_index_path(str(tmp_path), "docs")
+    build_bm25_index(collection, path)
+    index = BM25Index(path)
+
+    assert index.search("2111.01888v1", n_results=3)[0][0] == "id-3"
+    assert index.search("art. 5º", n_results=1)[0][0] == "id-1"
+    assert index.search("termo inexistente", n_results=3) == []
+
+
+def test_build_replaces_previous_index(tmp_path):
+    _, collection = _collection(tmp_path)
+    path = bm25_index_path(str(tmp_path), "docs")
+    build_bm25_index(collection, path)
+    collection.delete(ids=["id-3"])
+
+    build_bm25_index(collection, path)
+
+    assert BM25Index(path).search("2111.01888v1") == []
+    assert sorted(os.listdir(os.path.dirname(path))) == ["docs"]
+
+
+def test_reciprocal_rank_fusion_orders_by_summed_ranks():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c"]], k=60)
+
+    assert [item for item, _ in fused] == ["b", "c", "a"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+
+@pytest.mark.parametrize("vector_store", ["chroma", "flat"])
+def test_retriever_hybrid_surfaces_exact_term(tmp_path, vector_store):
+    client, collection = _collection(tmp_path)
+    db_path = str(tmp_path / "chroma")
+    build_bm25_index(collection, bm25_index_path(db_path, "docs"))
+    export_flat_index(collection, flat_index_path(db_path, "docs"))
+
+    # Query embedding equal to chunk 0: the dense ranking puts id-0 first
+    query_embedding = np.asarray(collection.get(ids=["id-0"], include=["embeddings"])["embeddings"])
+
+    with patch('services.retriever_provider.chromadb.PersistentClient', return_value=client), \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        mock_model_class.return_value.encode.return_value = query_embedding
+
+        from services.retriever_provider import RetrieverProvider
+
+        dense = RetrieverProvider(db_path=db_path, collection_name="docs", vector_store=vector_store)
+        hybrid = RetrieverProvider(
+            db_path=db_path, collection_name="docs", vector_store=vector_store, retrieval_mode="hybrid"
+        )
+        dense_chunks = dense.search("2111.01888v1", n_results=1)
+        hybrid_results = hybrid.search_many(["2111.01888v1"], n_results=2)[0]
+        hybrid_chunks = hybrid.search("2111.01888v1", n_results=2)
+
+        assert dense_chunks == [DOCUMENTS[0]]
+        assert DOCUMENTS[3] in hybrid_chunks and DOCUMENTS[0] in hybrid_chunks
+        by_id = {result["id"]: result for result in hybrid_results}
+        assert by_id["id-3"]["metadata"] == {"source_file": "doc3.pdf"}
+        assert by_id["id-0"]["distance"] == pytest.approx(0.0, abs=1e-4)
+        assert all(result["score"] > 0 for result in hybrid_results)
+        dense.close()
+        hybrid.close()
+        assert hybrid.lexical_index is None
+
+
+@pytest.mark.parametrize("vector_store", ["chroma", "flat"])
+def test_retriever_hybrid_where_restricts_both_rankings(tmp_path, vector_store):
+    client, collection = _collection(tmp_path)
+    db_path = str(tmp_path / "chroma")
+    build_bm25_index(collection, bm25_index_path(db_path, "docs"))
+    export_flat_index(collection, flat_index_path(db_path, "docs"))
+    query_embedding = np.asarray(collection.get(ids=["id-0"], include=["embeddings"])["embeddings"])
+
+    with patch('services.retriever_provider.chromadb.PersistentClient', return_value=client), \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        mock_model_class.return_value.encode.return_value = query_embedding
+
+        from services.retriever_provider import RetrieverProvider
+
+        hybrid = RetrieverProvider(
+            db_path=db_path, collection_name="docs", vector_store=vector_store, retrieval_mode="hybrid"
+        )
+        collection_spy = hybrid.collection = MagicMock(wraps=hybrid.collection)
+        where = {"source_file": {"$in": ["doc1.pdf", "doc5.pdf"]}}
+        results = hybrid.search_many(["2111.01888v1 art. 5º"], n_results=5, where=where)[0]
+        again = hybrid.search_many(["direitos sociais"], n_results=5, where=where)[0]
+        hybrid.close()
+
+    # id-3 matches the identifier and id-0 the embedding, but both are filtered out
+    assert [result["id"] for result in results] == ["id-1", "id-5"]
+    assert {result["id"] for result in again} <= {"id-1", "id-5"}
+    # The ids matching the filter are read once, then the cached mask is reused
+    assert sum("where" in call.kwargs for call in collection_spy.get.call_args_list) == 1
+
+
+def test_filter_mask_is_cached_per_filter(tmp_path):
+    _, collection = _collection(tmp_path)
+    path = bm25_index_path(str(tmp_path / "chroma"), "docs")
+    build_bm25_index(collection, path)
+    index = BM25Index(path)
+    index.MAX_CACHED_FILTERS = 2
+    reads = []
+
+    def mask(where):
+        return index.filter_mask(where, lambda: reads.append(where) or collection.get(where=where, include=[])["ids"])
+
+    first = mask({"$or": [{"source_file": "doc1.pdf"}, {"source_file": "doc3.pdf"}]})
+    # An equal filter (a new dict) is served from the cache
+    assert mask({"$or": [{"source_file": "doc1.pdf"}, {"source_file": "doc3.pdf"}]}) is first
+    assert first.tolist() == [False, True, False, True, False, False]
+    assert {chunk_id for chunk_id, _ in index.search("art. 5º 2111.01888v1", mask=first)} == {"id-1", "id-3"}
+
+    mask({"source_file": "doc0.pdf"})
+    mask({"source_file": "doc2.pdf"})
+    # Least recently used filter evicted past MAX_CACHED_FILTERS
+    mask({"$or": [{"source_file": "doc1.pdf"}, {"source_file": "doc3.pdf"}]})
+    assert len(reads) == 4
+    with pytest.raises(ValueError):
+        first[0] = True
+
+
+def test_retriever_sees_rebuilt_lexical_index(tmp_path):
+    client, collection = _collection(tmp_path)
+    db_path = str(tmp_path / "chroma")
+    path = bm25_index_path(db_path, "docs")
+    build_bm25_index(collection, path)
+    query_embedding = np.asarray(collection.get(ids=["id-0"], include=["embeddings"])["embeddings"])
+
+    with patch('services.retriever_provider.chromadb.PersistentClient', return_value=client), \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        mock_model_class.return_value.encode.return_value = query_embedding
+
+        from services.model_registry import client_registry
+        from services.retriever_provider import RetrieverProvider
+
+        def lexical_ids(query):
+            with RetrieverProvider(db_path=db_path, collection_name="docs", retrieval_mode="hybrid") as retriever:
+                return [chunk_id for chunk_id, _ in retriever.lexical_index.search(query)], retriever.lexical_index
+
+        before, old_index = lexical_ids("2111.01888v1")
+        collection.add(
+            ids=["id-new"],
+            embeddings=query_embedding.tolist(),
+            documents=["Errata de 2111.01888v1: 2111.01888v1 substitui a versão anterior."],
+            metadatas=[{"source_file": "errata.pdf"}],
+        )
+        build_bm25_index(collection, path)
+        after, new_index = lexical_ids("2111.01888v1")
+
+    assert before == ["id-3"]
+    assert new_index is not old_index and after[0] == "id-new"
+    # Chroma client and the current BM25 index only: the stale index was dropped
+    assert len(client_registry) == 2
+
+
+def test_retriever_hybrid_requires_lexical_index(tmp_path):
+    client, _ = _collection(tmp_path)
+
+    with patch('services.retriever_provider.chromadb.PersistentClient', return_value=client), \
+         patch('services.retriever_provider.SentenceTransformer'):
+        from services.retriever_provider import RetrieverProvider
+
+        with pytest.raises(Exception, match="não encontrada"):
+            RetrieverProvider(
+                db_path=str(tmp_path / "chroma"), collection_name="docs", retrieval_mode="hybrid"
+            )
+        with pytest.raises(ValueError):
+            RetrieverProvider(db_path=str(tmp_path), collection_name="docs", retrieval_mode="sparse")
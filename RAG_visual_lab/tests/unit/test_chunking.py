@@ -0,0 +1,207 @@
+"""
+Unit Tests: Streaming Chunker
+=============================
+
+Tests for utils.chunking.iter_chunks, the generator-based chunker behind
+chunk_text.
+
+Test Strategy:
+    - Every source type (str, pieces, text file, binary file, mmap) yields
+      the same chunks as chunk_text on the full string
+    - Offsets are exact: source[start:end] == chunk text
+    - Invalid settings raise ValueError
+    - Token mode never exceeds the token budget and reports truncation
+    - Chunks.for_model clamps chunk_size to the model limit and scales the
+      overlap with it
+"""
+
+import io
+import mmap
+import os
+import random
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+import utils.chunking as chunking
+from chunks import Chunks
+from utils.chunking import TextChunk, iter_chunks, iter_token_chunks, truncation_report
+from utils.text_processing import chunk_text
+
+
+def _sample_text(seed=7, words=3000):
+    rng = random.Random(seed)
+    vocabulary = ["direito", "ação", "lei.", "Art. 5º", "\n\n", "\n", "  ", "é", "constituição", "—"]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+def _pieces(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("chunk_size,overlap", [(50, 10), (200, 0), (120, 80), (1000, 300)])
+def test_pieces_match_full_string(chunk_size, overlap):
+    """Chunking a stream of small pieces must equal chunking the whole string."""
+    text = _sample_text()
+
+    expected = list(iter_chunks(text, chunk_size, overlap))
+    streamed = list(iter_chunks(_pieces(text, 7), chunk_size, overlap))
+
+    assert streamed == expected
+    assert [chunk.text for chunk in expected] == chunk_text(text, chunk_size, overlap)
+
+
+def test_offsets_are_exact():
+    """Each chunk is exactly the source slice given by its offsets."""
+    text = _sample_text(seed=3)
+
+    chunks = list(iter_chunks(text, 100, 20))
+
+    assert chunks
+    for chunk in chunks:
+        assert isinstance(chunk, TextChunk)
+        assert text[chunk.start:chunk.end] == chunk.text
+        assert chunk.text == chunk.text.strip()
+
+
+def test_text_and_binary_files(tmp_path, monkeypatch):
+    """Files are read in blocks; multibyte characters split across blocks survive."""
+    monkeypatch.setattr(chunking, "READ_BLOCK_SIZE", 5)
+    text = _sample_text(seed=11, words=500)
+    path = tmp_path / "export.md"
+    path.write_text(text, encoding="utf-8")
+    expected = list(iter_chunks(text, 80, 15))
+
+    with open(path, encoding="utf-8") as f:
+        assert list(iter_chunks(f, 80, 15)) == expected
+    with open(path, "rb") as f:
+        assert list(iter_chunks(f, 80, 15)) == expected
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        assert list(iter_chunks(mapped, 80, 15)) == expected
+
+
+def test_is_lazy():
+    """Only the pieces needed for the first chunk are consumed before it is yielded."""
+    consumed = []
+
+    def pieces():
+        for i in range(1000):
+            consumed.append(i)
+            yield "palavra " * 10
+
+    first = next(iter_chunks(pieces(), chunk_size=100, overlap=10))
+
+    assert first.start == 0
+    assert len(consumed) < 5
+
+
+def test_empty_sources():
+    assert list(iter_chunks("", 100, 10)) == []
+    assert list(iter_chunks(["", "   ", "\n"], 100, 10)) == []
+    assert list(iter_chunks(io.BytesIO(b""), 100, 10)) == []
+
+
+@pytest.mark.parametrize("chunk_size,overlap", [(10, 10), (10, 15), (0, 0), (10, -1)])
+def test_invalid_settings(chunk_size, overlap):
+    with pytest.raises(ValueError):
+        list(iter_chunks("texto", chunk_size, overlap))
+
+
+class WordTokenizer:
+    """Minimal fast-tokenizer stand-in: one token per word or punctuation mark."""
+
+    is_fast = True
+    _pattern = re.compile(r"\w+|[^\w\s]")
+
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=False, **kwargs):
+        texts = [text] if isinstance(text, str) else text
+        matches = [list(self._pattern.finditer(t)) for t in texts]
+        encoding = {"input_ids": [[0] * len(m) for m in matches]}
+        if return_offsets_mapping:
+            encoding["offset_mapping"] = [[m.span() for m in ms] for ms in matches]
+        if isinstance(text, str):
+            encoding = {key: value[0] for key, value in encoding.items()}
+        return encoding
+
+
+@pytest.mark.parametrize("max_tokens,overlap_tokens", [(16, 0), (32, 8), (64, 16)])
+def test_token_chunks_respect_budget(max_tokens, overlap_tokens):
+    """Every token chunk fits the budget and maps back to the source text."""
+    tokenizer = WordTokenizer()
+    text = _sample_text(seed=5, words=800)
+
+    chunks = list(iter_token_chunks(text, tokenizer, max_tokens, overlap_tokens))
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert text[chunk.start:chunk.end] == chunk.text
+        assert len(tokenizer(chunk.text)["input_ids"]) <= max_tokens
+    # Chunks cover the text from start to end
+    assert chunks[0].start == 0
+    assert chunks[-1].end == len(text.rstrip())
+
+
+def test_truncation_report_counts_tokens_past_limit():
+    tokenizer = WordTokenizer()
+
+    report = truncation_report(["um dois três", "um dois três quatro cinco"], tokenizer, max_tokens=4)
+
+    assert report["chunks"] == 2
+    assert report["chunks_truncados"] == 1
+    assert report["tokens_total"] == 8
+    assert report["tokens_truncados"] == 1
+    assert report["fracao_truncada"] == 0.125
+
+
+def test_token_chunks_reject_slow_tokenizer():
+    tokenizer = WordTokenizer()
+    tokenizer.is_fast = False
+
+    with pytest.raises(ValueError):
+        list(iter_token_chunks("texto", tokenizer, 8))
+
+
+class WordModel:
+    """SentenceTransformer stand-in: 128 positions, 2 of them special tokens."""
+
+    max_seq_length = 128
+    tokenizer = WordTokenizer()
+
+
+def test_for_model_scales_overlap_with_clamped_chunk_size():
+    # 2000/500 (the semantic_encoder defaults) keeps the 25% overlap at 126 tokens
+    chunker = Chunks.for_model(WordModel(), overlap_size=500, chunk_size=2000)
+
+    assert chunker.chunk_size == 126
+    assert chunker.overlap_size == 31
+    assert chunker.create_chunks(_sample_text(words=400))
+
+
+def test_for_model_keeps_sizes_within_limit():
+    chunker = Chunks.for_model(WordModel(), overlap_size=16, chunk_size=64)
+
+    assert (chunker.chunk_size, chunker.overlap_size) == (64, 16)
+
+
+def test_for_model_overlap_too_large_names_both_values():
+    with pytest.raises(ValueError, match=r"overlap_size \(200 tokens\).*chunk_size \(126 tokens"):
+        Chunks.for_model(WordModel(), overlap_size=200)
+
+
+def test_truncation_report_reuses_counted_lengths():
+    """Precomputed lengths (with special tokens) give the same report, without tokenizing."""
+    chunks = [" ".join(["palavra"] * n) for n in (10, 130, 200)]
+    expected = Chunks(2000, 500).truncation_report(chunks, WordModel())
+
+    class NoTokenizerCalls(WordModel):
+        tokenizer = None
+
+    lengths = [n + 2 for n in (10, 130, 200)]
+    report = Chunks(2000, 500).truncation_report(chunks, NoTokenizerCalls(), lengths=lengths)
+
+    assert report == expected
+    assert report["chunks_truncados"] == 2 and report["tokens_truncados"] == 4 + 74
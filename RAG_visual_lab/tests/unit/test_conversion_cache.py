@@ -0,0 +1,121 @@
+"""
+Unit Tests: Conversion Cache
+============================
+
+Tests for read_files.ConversionCache, the on-disk cache of converted
+markdown, and for how ReadFiles uses it.
+
+Test Strategy:
+    - Keys change with the file content hash and with the converter settings
+    - Over the byte cap, the least recently used entries (by mtime) are
+      evicted; a get refreshes an entry
+    - Hit/miss statistics count every lookup
+    - A cache hit returns the cached markdown without converting again and
+      does not rewrite an up-to-date markdown/<name>.md
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+# read_files creates the Gemini client at import time
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import read_files  # noqa: E402
+from read_files import ConversionCache, ReadFiles, hash_file  # noqa: E402
+
+
+def _set_mtime(cache, key, mtime):
+    os.utime(os.path.join(cache.cache_dir, key + ".md"), (mtime, mtime))
+
+
+def test_key_depends_on_content_and_settings(tmp_path):
+    first = tmp_path / "a.txt"
+    second = tmp_path / "b.txt"
+    first.write_text("conteúdo", encoding="utf-8")
+    second.write_text("conteúdo alterado", encoding="utf-8")
+    settings = read_files._converter_settings("txt")
+
+    key = ConversionCache.make_key(hash_file(first), settings)
+
+    assert key == ConversionCache.make_key(hash_file(first), settings)
+    assert key != ConversionCache.make_key(hash_file(second), settings)
+    assert key != ConversionCache.make_key(hash_file(first), read_files._converter_settings("png"))
+    assert key != ConversionCache.make_key(hash_file(first), settings + "|outro-modelo")
+
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    cache = ConversionCache(cache_dir=str(tmp_path / "cache"), max_bytes=250)
+    for i, key in enumerate(["a", "b"]):
+        cache.put(key, "x" * 100)
+        _set_mtime(cache, key, 1_000 + i)
+
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("a") == "x" * 100
+    cache.put("c", "y" * 100)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 100 and cache.get("c") == "y" * 100
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2 and stats["bytes"] == 200 <= stats["max_bytes"]
+    assert sorted(os.listdir(cache.cache_dir)) == ["a.md", "c.md"]
+
+
+def test_entry_larger_than_cap_is_kept(tmp_path):
+    cache = ConversionCache(cache_dir=str(tmp_path / "cache"), max_bytes=50)
+    cache.put("a", "x" * 10)
+
+    cache.put("grande", "y" * 100)
+
+    assert cache.get("grande") == "y" * 100
+    assert cache.get("a") is None
+
+
+def test_stats_count_hits_and_misses(tmp_path):
+    cache = ConversionCache(cache_dir=str(tmp_path / "cache"))
+    cache.put("a", "markdown")
+
+    assert cache.get("a") == "markdown"
+    assert cache.get("a") == "markdown"
+    assert cache.get("ausente") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_rate"] == pytest.approx(0.6667)
+    # Entries written by a previous process are found on startup
+    assert ConversionCache(cache_dir=str(tmp_path / "cache")).stats()["entries"] == 1
+
+
+def test_cache_hit_skips_conversion_and_markdown_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(read_files, "MARKDOWN_DIR", str(tmp_path / "markdown"))
+    source = tmp_path / "docs" / "relatorio.v2.txt"
+    source.parent.mkdir()
+    source.write_text("Relatório anual.", encoding="utf-8")
+    reader = ReadFiles(use_cache=False)
+    reader.cache = ConversionCache(cache_dir=str(tmp_path / "cache"))
+
+    [(name, first)] = list(reader.iter_markdown([str(source)]))
+    assert name == "relatorio.v2.txt" and "ARQUIVO: relatorio.v2.md" in first
+    md_path = tmp_path / "markdown" / "relatorio.v2.md"
+    os.utime(md_path, (1_000, 1_000))
+    converted = md_path.read_text(encoding="utf-8")
+
+    def fail(file_path):
+        raise AssertionError("cache hit must not convert again")
+
+    monkeypatch.setattr(reader, "_convert_document", fail)
+    [(name, markdown)] = list(reader.iter_markdown([str(source)]))
+
+    assert name == "relatorio.v2.txt" and markdown.endswith(converted)
+    assert os.path.getmtime(md_path) == 1_000
+    assert reader.cache_stats()["hits"] == 1
+
+    # A stale .md (edited or from an older conversion) is rewritten
+    md_path.write_text("desatualizado", encoding="utf-8")
+    assert reader.docs_to_markdown(str(source.parent)) == first
+    assert md_path.read_text(encoding="utf-8") == converted
@@ -0,0 +1,80 @@
+"""
+Unit Tests: Chunk Deduplication
+===============================
+
+Tests for utils.deduplication.ChunkDeduplicator.
+
+Test Strategy:
+    - Exact duplicates (ignoring case, punctuation and spacing) are dropped
+    - Near duplicates above the Jaccard threshold are dropped, distinct text is kept
+    - Counters add up and survive clear_index()
+"""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from utils.deduplication import ChunkDeduplicator
+
+
+def _paragraph(seed, words=120):
+    rng = random.Random(seed)
+    return " ".join(f"palavra{rng.randint(0, 5000)}" for _ in range(words))
+
+
+def test_exact_duplicates_are_normalized():
+    dedup = ChunkDeduplicator(threshold=1.0)
+
+    kept = dedup.filter(["Revista de Direito, v. 11", "revista  de direito v 11", "Outro texto"])
+
+    assert kept == ["Revista de Direito, v. 11", "Outro texto"]
+    assert dedup.stats() == {
+        "chunks_gerados": 3,
+        "duplicados_exatos": 1,
+        "quase_duplicados": 0,
+        "chunks_unicos": 2,
+    }
+
+
+def test_near_duplicates_above_threshold():
+    base = _paragraph(1)
+    # Troca apenas a última palavra: Jaccard dos shingles bem acima de 0.9
+    near = base.rsplit(" ", 1)[0] + " rodape"
+    distinct = _paragraph(2)
+
+    dedup = ChunkDeduplicator(threshold=0.9)
+    kept = dedup.filter([base, near, distinct])
+
+    assert kept == [base, distinct]
+    assert dedup.stats()["quase_duplicados"] == 1
+
+
+def test_overlapping_chunks_are_kept():
+    """Consecutive chunks sharing a 25% overlap are not near duplicates."""
+    words = _paragraph(3, words=400).split()
+    chunks = [" ".join(words[start:start + 100]) for start in range(0, 300, 75)]
+
+    dedup = ChunkDeduplicator(threshold=0.9)
+
+    assert dedup.filter(chunks) == chunks
+
+
+def test_clear_index_keeps_counters():
+    dedup = ChunkDeduplicator()
+    dedup.filter(["mesmo texto", "mesmo texto"])
+
+    dedup.clear_index()
+
+    assert dedup.filter(["mesmo texto"]) == ["mesmo texto"]
+    assert dedup.stats()["chunks_gerados"] == 3
+    assert dedup.stats()["duplicados_exatos"] == 1
+
+
+@pytest.mark.parametrize("threshold", [0, -0.5, 1.5])
+def test_invalid_threshold(threshold):
+    with pytest.raises(ValueError):
+        ChunkDeduplicator(threshold=threshold)
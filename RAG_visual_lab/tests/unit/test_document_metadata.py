@@ -0,0 +1,57 @@
+"""
+Unit Tests: Document Metadata
+=============================
+
+Tests for utils.document_metadata, the per-chunk metadata written by
+SemanticEncoder.build and the `where` filter evaluated by the flat index.
+
+Test Strategy:
+    - Titles come from the first markdown heading, falling back to the file name
+    - Page ranges are derived from form-feed page breaks and chunk offsets
+    - matches_where follows ChromaDB semantics for equality, comparison,
+      membership and logical operators
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from utils.document_metadata import document_title, matches_where, page_breaks, page_range
+
+
+def test_document_title_from_heading_or_file_name():
+    assert document_title("Intro\n\n## Direitos Fundamentais ##\n\n# Outro", "cf.pdf") == "Direitos Fundamentais"
+    assert document_title("Sem cabeçalho\n#hashtag", "dir/2111.01888v1.pdf") == "2111.01888v1"
+    assert document_title("", "notas.docx") == "notas"
+    assert len(document_title("# " + "x" * 500, "a.pdf")) == 200
+
+
+def test_page_range_from_page_breaks():
+    text = "página um\fpágina dois\fpágina três\f"
+    breaks = page_breaks(text)
+
+    assert page_range(breaks, 0, 9) == (1, 1)
+    assert page_range(breaks, 3, text.index("dois") + 4) == (1, 2)
+    assert page_range(breaks, text.index("três"), text.index("três") + 4) == (3, 3)
+    assert page_range(page_breaks("documento sem páginas"), 0, 10) is None
+
+
+def test_matches_where_follows_chroma_semantics():
+    metadata = {"source_file": "cf.pdf", "page_start": 12, "ingested_at": 1_700_000_000}
+
+    assert matches_where(metadata, None)
+    assert matches_where(metadata, {"source_file": "cf.pdf"})
+    assert not matches_where(metadata, {"source_file": {"$ne": "cf.pdf"}})
+    assert matches_where(metadata, {"page_start": {"$gte": 10, "$lt": 20}})
+    assert matches_where(metadata, {"source_file": {"$in": ["a.pdf", "cf.pdf"]}})
+    assert not matches_where(metadata, {"source_file": {"$nin": ["cf.pdf"]}})
+    assert matches_where(metadata, {"$or": [{"page_start": 1}, {"ingested_at": {"$gt": 0}}]})
+    assert not matches_where(metadata, {"$and": [{"page_start": 12}, {"source_file": "b.pdf"}]})
+    # Missing fields and incomparable types never match
+    assert not matches_where(metadata, {"title": {"$ne": "x"}})
+    assert not matches_where(metadata, {"source_file": {"$gt": 3}})
+    with pytest.raises(ValueError):
+        matches_where(metadata, {"page_start": {"$like": 1}})
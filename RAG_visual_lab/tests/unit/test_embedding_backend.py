@@ -0,0 +1,98 @@
+"""
+Unit Tests: Embedding Backend
+=============================
+
+Tests for services.embedding_backend and its use by RetrieverProvider.
+
+Test Strategy:
+    - Backend names are validated and become part of the registry/cache key
+    - The int8 ONNX model is exported once and then loaded from disk
+    - RetrieverProvider loads non-torch backends through the backend loader
+      and keeps them apart from the torch model in the registry and cache
+"""
+
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import services.embedding_backend as embedding_backend
+from services.embedding_backend import model_key, validate_backend
+
+
+def test_validate_backend():
+    assert validate_backend("onnx-int8") == "onnx-int8"
+    with pytest.raises(ValueError):
+        validate_backend("tensorrt")
+
+
+def test_model_key_keeps_torch_name_unchanged():
+    assert model_key("modelo") == "modelo"
+    assert model_key("modelo", "torch") == "modelo"
+    assert model_key("modelo", "onnx-int8") == "modelo@onnx-int8"
+
+
+def test_int8_model_is_exported_once(tmp_path, monkeypatch):
+    """The quantized file is exported on the first load and reused afterwards."""
+    monkeypatch.setattr(embedding_backend, "_require_onnx", lambda: None)
+    loaded = []
+
+    def fake_model(name, backend="torch", model_kwargs=None):
+        loaded.append((name, backend, model_kwargs))
+        return MagicMock()
+
+    def fake_export(model, config, path):
+        os.makedirs(os.path.join(path, "onnx"), exist_ok=True)
+        open(os.path.join(path, "onnx", f"model_qint8_{config}.onnx"), "w").close()
+
+    with patch("sentence_transformers.SentenceTransformer", side_effect=fake_model), \
+         patch("sentence_transformers.export_dynamic_quantized_onnx_model", side_effect=fake_export) as export:
+        for _ in range(2):
+            embedding_backend.load_onnx_model("org/modelo", models_dir=str(tmp_path), config="avx2")
+
+    local_dir = str(tmp_path / "org__modelo")
+    assert export.call_count == 1
+    assert loaded[0] == ("org/modelo", "onnx", None)
+    assert loaded[-1] == (local_dir, "onnx", {"file_name": "onnx/model_qint8_avx2.onnx"})
+
+
+def test_retriever_uses_backend_loader_and_keyed_cache():
+    """An onnx-int8 retriever loads through the backend and caches under its own key."""
+    with patch('services.retriever_provider.chromadb.PersistentClient') as mock_client_class, \
+         patch('services.retriever_provider.SentenceTransformer') as mock_torch_model, \
+         patch('services.retriever_provider.load_sentence_transformer') as mock_loader:
+        mock_collection = MagicMock()
+        mock_collection.count.return_value = 1
+        mock_collection.query.return_value = {'documents': [["chunk"]]}
+        mock_client_class.return_value.get_collection.return_value = mock_collection
+        mock_loader.return_value.encode.return_value = np.array([[0.1, 0.2, 0.3]])
+
+        from services.retriever_provider import RetrieverProvider
+        from services.embedding_cache import QueryEmbeddingCache
+
+        cache = QueryEmbeddingCache()
+        retriever = RetrieverProvider(
+            db_path="./test_db",
+            collection_name="test_collection",
+            model_name="modelo",
+            embedding_cache=cache,
+            backend="onnx-int8",
+        )
+        retriever.search("O que é RAG?")
+
+        mock_loader.assert_called_once_with("modelo", "onnx-int8")
+        mock_torch_model.assert_not_called()
+        assert retriever.model_key == "modelo@onnx-int8"
+        assert cache.get("modelo@onnx-int8", "O que é RAG?") is not None
+        assert cache.get("modelo", "O que é RAG?") is None
+
+
+def test_retriever_rejects_unknown_backend():
+    from services.retriever_provider import RetrieverProvider
+
+    with pytest.raises(ValueError):
+        RetrieverProvider(collection_name="test_collection", backend="tensorrt")
@@ -0,0 +1,113 @@
+"""
+Unit Tests: Length-Bucketed Encoding
+====================================
+
+Tests for services.embedding_batching, which groups texts by token length
+before calling model.encode.
+
+Test Strategy:
+    - Fake model encodes each text as [len(text)] and records each call
+    - Buckets go from longest to shortest and embeddings return in input order
+    - Token lengths come from the fast tokenizer, truncated at max_seq_length
+      by the tokenizer itself (no padding, no tensors)
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from services.embedding_batching import encode_bucketed, length_buckets, token_lengths
+
+
+class FakeTokenizer:
+    """One token per word plus two special tokens; records the call options."""
+
+    is_fast = True
+
+    def __init__(self):
+        self.kwargs = None
+
+    def __call__(self, texts, add_special_tokens=True, truncation=False, max_length=None, **kwargs):
+        self.kwargs = {"truncation": truncation, "max_length": max_length, **kwargs}
+        extra = 2 if add_special_tokens else 0
+        ids = [[0] * (len(text.split()) + extra) for text in texts]
+        return {"input_ids": [row[:max_length] if truncation else row for row in ids]}
+
+
+class FakeModel:
+    def __init__(self, tokenizer=None, max_seq_length=None):
+        self.calls = []
+        if tokenizer is not None:
+            self.tokenizer = tokenizer
+            self.max_seq_length = max_seq_length
+
+    def encode(self, texts, batch_size=32):
+        self.calls.append(list(texts))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_length_buckets_longest_first():
+    buckets = length_buckets([3, 9, 1, 7, 5], batch_size=2)
+
+    assert [b.tolist() for b in buckets] == [[1, 3], [4, 0], [2]]
+    with pytest.raises(ValueError):
+        length_buckets([1], batch_size=0)
+
+
+def test_token_lengths_use_tokenizer_and_clip():
+    model = FakeModel(FakeTokenizer(), max_seq_length=4)
+
+    lengths = token_lengths(model, ["a", "a b", "a b c d e f"])
+
+    assert lengths.tolist() == [3, 4, 4]
+    # Long texts are truncated by the tokenizer, with no padding or tensors
+    assert model.tokenizer.kwargs["truncation"] is True
+    assert model.tokenizer.kwargs["max_length"] == 4
+    assert model.tokenizer.kwargs["padding"] is False
+    assert "return_tensors" not in model.tokenizer.kwargs
+
+
+def test_token_lengths_without_max_seq_length_do_not_truncate():
+    model = FakeModel(FakeTokenizer(), max_seq_length=None)
+
+    assert token_lengths(model, ["a b c d e f"]).tolist() == [8]
+    assert model.tokenizer.kwargs["truncation"] is False
+
+
+def test_token_lengths_fall_back_to_characters():
+    assert token_lengths(FakeModel(), ["abc", "a"]).tolist() == [3, 1]
+
+
+def test_encode_bucketed_restores_order():
+    model = FakeModel(FakeTokenizer(), max_seq_length=128)
+    texts = [" ".join(["w"] * n) for n in (1, 8, 3, 6, 2, 7)]
+
+    embeddings = encode_bucketed(model, texts, batch_size=2)
+
+    assert embeddings[:, 0].tolist() == [len(text) for text in texts]
+    assert [[len(t.split()) for t in call] for call in model.calls] == [[8, 7], [6, 3], [2, 1]]
+
+
+def test_encode_bucketed_uses_precomputed_lengths():
+    model = FakeModel(FakeTokenizer(), max_seq_length=128)
+    texts = ["a", "b", "c", "d"]
+
+    embeddings = encode_bucketed(model, texts, batch_size=2, lengths=[1, 9, 3, 7])
+
+    assert model.tokenizer.kwargs is None
+    assert model.calls == [["b", "d"], ["c", "a"]]
+    assert embeddings[:, 0].tolist() == [1, 1, 1, 1]
+
+
+def test_encode_bucketed_single_batch_is_one_call():
+    model = FakeModel()
+
+    embeddings = encode_bucketed(model, ["b", "aaa"], batch_size=32)
+
+    assert model.calls == [["b", "aaa"]]
+    assert embeddings.shape == (2, 2)
+    assert encode_bucketed(model, [], batch_size=32).shape == (0, 0)
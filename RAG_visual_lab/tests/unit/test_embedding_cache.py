@@ -0,0 +1,100 @@
+"""
+Unit Tests: Query Embedding Cache
+=================================
+
+Tests for the LRU query embedding cache used by RetrieverProvider.
+
+Test Strategy:
+    - Use a fake model that records which texts were encoded
+    - Validate LRU eviction by entries and bytes, TTL expiry and counters
+"""
+
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from services.embedding_cache import QueryEmbeddingCache, encode_with_cache
+
+
+def _fake_model(dim=4):
+    model = MagicMock()
+    model.encode.side_effect = lambda texts: np.array(
+        [[float(len(t))] * dim for t in texts]
+    )
+    return model
+
+
+def test_encode_with_cache_only_encodes_misses():
+    """Cached queries are not re-encoded; the result keeps input order."""
+    cache = QueryEmbeddingCache()
+    model = _fake_model()
+
+    encode_with_cache(model, "m", ["a", "bb"], cache)
+    vectors = encode_with_cache(model, "m", ["ccc", "a", "bb"], cache)
+
+    assert model.encode.call_args_list[1].args[0] == ["ccc"]
+    assert vectors.shape == (3, 4)
+    assert list(vectors[:, 0]) == [3.0, 1.0, 2.0]
+    assert cache.stats()["hits"] == 2
+
+
+def test_duplicate_queries_in_batch_are_encoded_once():
+    """The same query twice in one batch costs a single forward pass."""
+    cache = QueryEmbeddingCache()
+    model = _fake_model()
+
+    vectors = encode_with_cache(model, "m", ["x", "x"], cache)
+
+    model.encode.assert_called_once_with(["x"])
+    assert vectors.shape == (2, 4)
+
+
+def test_keys_include_model_name():
+    """Embeddings from different models never collide."""
+    cache = QueryEmbeddingCache()
+    cache.put("model-a", "query", np.ones(4))
+
+    assert cache.get("model-b", "query") is None
+    assert cache.get("model-a", " query ") is not None
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    """Least recently used entries are evicted when limits are exceeded."""
+    cache = QueryEmbeddingCache(max_entries=2)
+    cache.put("m", "a", np.ones(4))
+    cache.put("m", "b", np.ones(4))
+    cache.get("m", "a")  # "b" becomes least recently used
+    cache.put("m", "c", np.ones(4))
+
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") is not None
+    assert cache.stats()["evictions"] == 1
+
+    small = QueryEmbeddingCache(max_bytes=40)  # room for two float32 vectors of dim 4
+    for text in ["a", "b", "c"]:
+        small.put("m", text, np.ones(4))
+    assert len(small) == 2
+    assert small.stats()["bytes"] <= 40
+
+
+def test_ttl_expires_entries():
+    """Entries older than ttl_seconds count as misses."""
+    cache = QueryEmbeddingCache(ttl_seconds=10)
+    cache.put("m", "a", np.ones(4))
+
+    with patch("services.embedding_cache.time.monotonic", return_value=10**9):
+        assert cache.get("m", "a") is None
+
+    assert len(cache) == 0
+    assert cache.stats()["misses"] == 1
+
+
+def test_invalid_limits_are_rejected():
+    """Non-positive limits are configuration errors."""
+    with pytest.raises(ValueError):
+        QueryEmbeddingCache(max_entries=0)
@@ -0,0 +1,134 @@
+"""
+Unit Tests: EncodePool
+======================
+
+Tests for services.embedding_pool.EncodePool, the multi-process encoder used
+by SemanticEncoder builds.
+
+Test Strategy:
+    - Fake model records what the process pool receives
+    - Inputs reach the pool sorted by length and come back in input order
+    - Several batch-aligned shards per worker: replaying the pool's task queue,
+      every worker gets a similar total token length
+    - The window the encoder sends per call splits into several shards per
+      worker, for the micro-batch sizes the encoder uses
+    - The pool starts lazily, once, and stops on close
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from services.embedding_pool import SHARDS_PER_WORKER, EncodePool, resolve_workers, shard_size, window_size
+
+
+class FakeModel:
+    """Encodes each text as [len(text)] and records pool calls."""
+
+    def __init__(self):
+        self.started = 0
+        self.stopped = 0
+        self.calls = []
+
+    def start_multi_process_pool(self, target_devices):
+        self.started += 1
+        self.devices = target_devices
+        return {"processes": target_devices}
+
+    def stop_multi_process_pool(self, pool):
+        self.stopped += 1
+
+    def encode(self, texts, batch_size=32, pool=None, chunk_size=None):
+        self.calls.append({"texts": texts, "pool": pool, "chunk_size": chunk_size})
+        return np.array([[len(text)] for text in texts], dtype=np.float32)
+
+
+def test_encode_sorts_by_length_and_restores_order():
+    model = FakeModel()
+    texts = ["aa", "aaaaa", "a", "aaaa", "aaa"]
+
+    with EncodePool(model, workers=2) as pool:
+        embeddings = pool.encode(texts, batch_size=2)
+
+    assert embeddings[:, 0].tolist() == [2, 5, 1, 4, 3]
+    call = model.calls[0]
+    assert call["texts"] == ["aaaaa", "aaaa", "aaa", "aa", "a"]
+    assert call["pool"] is not None
+    assert call["chunk_size"] == 2
+
+
+def _replay_task_queue(texts, chunk_size, workers):
+    """Tokens per worker when each shard goes to the first worker to become free."""
+    shards = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    loads = [0] * workers
+    for shard in shards:
+        loads[loads.index(min(loads))] += sum(len(text) for text in shard)
+    return shards, loads
+
+
+def test_shards_balance_token_length_across_workers():
+    model = FakeModel()
+    rng = np.random.RandomState(0)
+    texts = ["a" * int(length) for length in rng.randint(10, 500, size=1000)]
+    workers, batch_size = 4, 32
+
+    with EncodePool(model, workers=workers) as pool:
+        pool.encode(texts, batch_size=batch_size)
+
+    call = model.calls[0]
+    shards, loads = _replay_task_queue(call["texts"], call["chunk_size"], workers)
+
+    assert call["chunk_size"] == shard_size(len(texts), workers, batch_size) == 64
+    assert all(len(shard) % batch_size == 0 for shard in shards[:-1])
+    assert len(shards) >= workers * SHARDS_PER_WORKER - 1
+    assert max(loads) <= 1.15 * min(loads)
+    # One contiguous shard per worker: the first gets all the longest texts
+    _, contiguous = _replay_task_queue(call["texts"], len(texts) // workers, workers)
+    assert max(contiguous) > 2 * min(contiguous)
+
+
+def test_shard_size_is_batch_aligned():
+    assert shard_size(5, workers=2, batch_size=32) == 32
+    assert shard_size(1000, workers=4, batch_size=32) == 64
+    assert shard_size(10_000, workers=8, batch_size=64) == 320
+
+
+@pytest.mark.parametrize("workers", [1, 2, 4, 8, 16, 32])
+@pytest.mark.parametrize("micro_batch", [64, 256, 5461])
+def test_encoder_window_gives_several_shards_per_worker(workers, micro_batch):
+    batch_size = EncodePool.DEFAULT_BATCH_SIZE
+    window = window_size(workers, batch_size, micro_batch)
+
+    size = shard_size(window, workers, batch_size)
+    n_shards = -(-window // size)
+
+    assert window >= micro_batch and window % batch_size == 0
+    assert n_shards == workers * SHARDS_PER_WORKER > workers
+    # A single 256-chunk micro-batch leaves 8 workers one shard each
+    assert -(-256 // shard_size(256, 8, batch_size)) == 8
+
+
+def test_pool_starts_lazily_once_and_closes():
+    model = FakeModel()
+    pool = EncodePool(model, workers=3)
+    assert model.started == 0
+
+    pool.encode(["um"])
+    pool.encode(["dois"])
+    pool.close()
+    pool.close()
+
+    assert model.started == 1
+    assert model.devices == ["cpu"] * 3
+    assert model.stopped == 1
+
+
+def test_resolve_workers():
+    assert resolve_workers(None) == (os.cpu_count() or 1)
+    assert resolve_workers(2) == 2
+    with pytest.raises(ValueError):
+        resolve_workers(0)
@@ -0,0 +1,241 @@
+"""
+Unit Tests: Flat Index
+======================
+
+Tests for services.flat_index, the memory-mapped exact index exported from a
+ChromaDB collection, and for RetrieverProvider(vector_store="flat").
+
+Test Strategy:
+    - Export a real (temporary) ChromaDB collection and compare FlatIndex
+      results with collection.query for each distance metric
+    - float16 export keeps the ranking and halves the matrix size
+    - Batched top-k matches the single-query helper
+    - A re-export replaces the registry-cached index of RetrieverProvider
+"""
+
+import os
+import sys
+from unittest.mock import patch
+
+import chromadb
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from services.flat_index import FlatIndex, export_flat_index, flat_index_path
+from utils.vector_search import top_k_indices, top_k_indices_batch
+
+
+def _collection(tmp_path, metric=None, n=60, dim=8, seed=0):
+    rng = np.random.RandomState(seed)
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    metadata = {"description": "teste"}
+    if metric:
+        metadata["hnsw:space"] = metric
+    collection = client.create_collection(name="docs", metadata=metadata)
+    collection.add(
+        ids=[f"id-{i}" for i in range(n)],
+        embeddings=rng.randn(n, dim).tolist(),
+        documents=[f"chunk {i} — ação nº {i}" for i in range(n)],
+        metadatas=[{"source_file": f"doc{i % 3}.pdf", "chunk_id": i} for i in range(n)],
+    )
+    return collection, rng.randn(3, dim)
+
+
+@pytest.mark.parametrize("metric", [None, "cosine", "ip"])
+def test_flat_index_matches_chroma(tmp_path, metric):
+    collection, queries = _collection(tmp_path, metric)
+    path = flat_index_path(str(tmp_path / "chroma"), "docs")
+
+    stats = export_flat_index(collection, path, batch_size=25)
+    index = FlatIndex(path)
+
+    assert stats["chunks"] == index.count() == 60
+    assert index.name == "docs" and index.metric == (metric or "l2")
+    expected = collection.query(query_embeddings=queries.tolist(), n_results=5)
+    results = index.query(query_embeddings=queries.tolist(), n_results=5)
+
+    assert results["ids"] == expected["ids"]
+    assert results["documents"] == expected["documents"]
+    assert results["metadatas"] == expected["metadatas"]
+    np.testing.assert_allclose(results["distances"], expected["distances"], rtol=1e-4, atol=1e-4)
+
+
+def test_float16_export_keeps_ranking(tmp_path):
+    collection, queries = _collection(tmp_path)
+    export_flat_index(collection, flat_index_path(str(tmp_path), "f32"))
+    full = FlatIndex(flat_index_path(str(tmp_path), "f32"))
+    export_flat_index(collection, flat_index_path(str(tmp_path), "f16"), dtype="float16")
+    half = FlatIndex(flat_index_path(str(tmp_path), "f16"))
+
+    assert half.embeddings.dtype == np.float16
+    assert half.embeddings.nbytes * 2 == full.embeddings.nbytes
+    assert half.query(queries, n_results=3)["ids"] == full.query(queries, n_results=3)["ids"]
+
+
+@pytest.mark.parametrize("metric", [None, "cosine"])
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_compressed_export_rescores_to_exact_results(tmp_path, metric, dtype):
+    """Compressed scan plus full-precision rescoring gives the float32 results."""
+    collection, queries = _collection(tmp_path, metric, n=200, dim=16)
+    export_flat_index(collection, flat_index_path(str(tmp_path), "f32"))
+    export_flat_index(collection, flat_index_path(str(tmp_path), dtype), dtype=dtype)
+    full = FlatIndex(flat_index_path(str(tmp_path), "f32"))
+    compressed = FlatIndex(flat_index_path(str(tmp_path), dtype))
+
+    expected = full.query(queries, n_results=10)
+    results = compressed.query(queries, n_results=10)
+
+    assert compressed.embeddings.dtype == np.dtype(dtype)
+    assert compressed.full_precision is not None
+    assert results["ids"] == expected["ids"]
+    np.testing.assert_allclose(results["distances"], expected["distances"], rtol=1e-5, atol=1e-6)
+
+
+def test_int8_without_rescoring_is_approximate(tmp_path):
+    collection, queries = _collection(tmp_path, "cosine", n=200, dim=16)
+    path = flat_index_path(str(tmp_path), "int8")
+    export_flat_index(collection, path, dtype="int8", rescore=False)
+    index = FlatIndex(path)
+
+    results = index.query(queries, n_results=10)
+    expected = collection.query(query_embeddings=queries.tolist(), n_results=10)
+
+    assert index.full_precision is None and index.scales is not None
+    assert index.embeddings.nbytes * 4 == 200 * 16 * 4
+    overlap = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(results["ids"], expected["ids"])])
+    assert overlap >= 0.8
+    np.testing.assert_allclose(results["distances"][0][0], expected["distances"][0][0], atol=0.02)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+@pytest.mark.parametrize("where", [
+    {"source_file": "doc1.pdf"},
+    {"$and": [{"source_file": {"$in": ["doc0.pdf", "doc2.pdf"]}}, {"chunk_id": {"$gte": 30}}]},
+    {"$or": [{"chunk_id": {"$lt": 3}}, {"source_file": {"$eq": "doc2.pdf"}}]},
+])
+def test_flat_index_where_matches_chroma(tmp_path, dtype, where):
+    collection, queries = _collection(tmp_path)
+    path = flat_index_path(str(tmp_path), "docs")
+    export_flat_index(collection, path, dtype=dtype)
+    index = FlatIndex(path)
+
+    results = index.query(queries, n_results=5, where=where)
+    expected = collection.query(query_embeddings=queries.tolist(), n_results=5, where=where)
+
+    assert results["ids"] == expected["ids"]
+    np.testing.assert_allclose(results["distances"], expected["distances"], rtol=1e-4, atol=1e-4)
+    assert sorted(index.get(where=where, include=[])["ids"]) == sorted(
+        collection.get(where=where, include=[])["ids"]
+    )
+
+
+def test_flat_index_where_without_matches(tmp_path):
+    collection, queries = _collection(tmp_path, n=10)
+    path = flat_index_path(str(tmp_path), "docs")
+    export_flat_index(collection, path)
+
+    results = FlatIndex(path).query(queries, n_results=5, where={"source_file": "outro.pdf"})
+
+    assert results["ids"] == [[], [], []]
+
+
+def test_export_replaces_previous_index(tmp_path):
+    collection, _ = _collection(tmp_path, n=10)
+    path = flat_index_path(str(tmp_path), "docs")
+    export_flat_index(collection, path)
+    collection.delete(ids=["id-0"])
+
+    export_flat_index(collection, path)
+
+    assert FlatIndex(path).count() == 9
+    assert sorted(os.listdir(os.path.dirname(path))) == ["docs"]
+
+
+def test_top_k_indices_batch_matches_single_query():
+    scores = np.random.RandomState(3).rand(4, 50)
+
+    batched = top_k_indices_batch(scores, 7)
+
+    assert batched.shape == (4, 7)
+    for row, indices in zip(scores, batched):
+        assert indices.tolist() == top_k_indices(row, 7).tolist()
+    assert top_k_indices_batch(scores, 100).shape == (4, 50)
+
+
+def test_retriever_searches_flat_index(tmp_path):
+    collection, queries = _collection(tmp_path)
+    db_path = str(tmp_path / "chroma")
+    export_flat_index(collection, flat_index_path(db_path, "docs"))
+
+    with patch('services.retriever_provider.chromadb.PersistentClient') as mock_client_class, \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        mock_model_class.return_value.encode.return_value = queries[:1]
+
+        from services.retriever_provider import RetrieverProvider
+
+        retriever = RetrieverProvider(db_path=db_path, collection_name="docs", vector_store="flat")
+        chunks = retriever.search("ação", n_results=4)
+
+        mock_client_class.assert_not_called()
+        assert chunks == collection.query(query_embeddings=queries[:1].tolist(), n_results=4)["documents"][0]
+        assert retriever.get_collection_info()["count"] == 60
+        retriever.close()
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_flat_index_returns_embeddings_like_chroma(tmp_path, dtype):
+    collection, queries = _collection(tmp_path)
+    path = flat_index_path(str(tmp_path), dtype)
+    export_flat_index(collection, path, dtype=dtype)
+    index = FlatIndex(path)
+
+    expected = collection.query(query_embeddings=queries.tolist(), n_results=3, include=["embeddings"])
+    results = index.query(queries, n_results=3, include=["embeddings"])
+    by_id = index.get(["id-7", "missing", "id-2"], include=["embeddings", "documents"])
+
+    np.testing.assert_allclose(results["embeddings"], expected["embeddings"], rtol=1e-5, atol=1e-6)
+    assert by_id["ids"] == ["id-7", "id-2"]
+    assert by_id["documents"] == ["chunk 7 — ação nº 7", "chunk 2 — ação nº 2"]
+    stored = collection.get(ids=["id-7", "id-2"], include=["embeddings"])
+    stored = dict(zip(stored["ids"], stored["embeddings"]))
+    np.testing.assert_allclose(by_id["embeddings"], [stored["id-7"], stored["id-2"]], rtol=1e-5)
+
+
+def test_retriever_sees_reexported_flat_index(tmp_path):
+    collection, queries = _collection(tmp_path, n=10)
+    db_path = str(tmp_path / "chroma")
+    path = flat_index_path(db_path, "docs")
+    export_flat_index(collection, path)
+
+    with patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        mock_model_class.return_value.encode.return_value = queries[:1]
+
+        from services.model_registry import client_registry
+        from services.retriever_provider import RetrieverProvider
+
+        with RetrieverProvider(db_path=db_path, collection_name="docs", vector_store="flat") as retriever:
+            assert retriever.get_collection_info()["count"] == 10
+            old_index = retriever.collection
+
+        collection.delete(ids=["id-0", "id-1"])
+        export_flat_index(collection, path)
+
+        with RetrieverProvider(db_path=db_path, collection_name="docs", vector_store="flat") as retriever:
+            assert retriever.collection is not old_index
+            assert retriever.get_collection_info()["count"] == 8
+            assert "chunk 0 — ação nº 0" not in retriever.search("ação", n_results=10)
+
+    # The stale index is not kept in the registry
+    assert len(client_registry) == 1
+
+
+def test_retriever_flat_index_missing(tmp_path):
+    with patch('services.retriever_provider.SentenceTransformer'):
+        from services.retriever_provider import RetrieverProvider
+
+        with pytest.raises(Exception, match="não encontrada"):
+            RetrieverProvider(db_path=str(tmp_path), collection_name="docs", vector_store="flat")
+        with pytest.raises(ValueError):
+            RetrieverProvider(db_path=str(tmp_path), collection_name="docs", vector_store="faiss")
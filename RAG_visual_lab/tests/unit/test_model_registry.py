@@ -0,0 +1,190 @@
+"""
+Unit Tests: Model Registry
+==========================
+
+Tests for the process-wide registry that shares SentenceTransformer models and
+ChromaDB clients between RetrieverProvider instances.
+
+Test Strategy:
+    - Use plain factories (no real models) to count how often resources are built
+    - Validate reference counting, idle eviction and path normalization
+    - A slow factory blocks only the callers of its own key: concurrent
+      acquires of that key build it once, other keys are served meanwhile,
+      and a failed build lets the next caller retry
+    - A new version of an on-disk index opens a new instance and discards the
+      unreferenced old ones
+    - Verify RetrieverProvider reuses the registered model across instances
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from services.model_registry import (
+    ResourceRegistry,
+    acquire_client,
+    client_registry,
+    file_version,
+    release_client,
+)
+
+
+def test_acquire_builds_resource_once():
+    """The factory runs only for the first acquire of a key."""
+    registry = ResourceRegistry()
+    factory = MagicMock(side_effect=lambda: object())
+
+    first = registry.acquire("minilm", factory)
+    second = registry.acquire("minilm", factory)
+
+    assert first is second
+    assert factory.call_count == 1
+    assert registry.stats()["minilm"]["refcount"] == 2
+
+
+def test_release_keeps_resource_until_idle_timeout():
+    """Released resources survive until they exceed the idle timeout."""
+    registry = ResourceRegistry(idle_timeout_seconds=60)
+    registry.acquire("minilm", object)
+    registry.release("minilm")
+
+    assert "minilm" in registry
+    assert registry.evict_idle() == 0
+
+    with patch("services.model_registry.time.monotonic", return_value=10**9):
+        assert registry.evict_idle() == 1
+
+    assert "minilm" not in registry
+
+
+def test_idle_eviction_skips_referenced_resources():
+    """Resources still held by a consumer are never evicted."""
+    registry = ResourceRegistry(idle_timeout_seconds=0)
+    registry.acquire("held", object)
+    registry.acquire("released", object)
+    registry.release("released")
+
+    with patch("services.model_registry.time.monotonic", return_value=10**9):
+        registry.evict_idle()
+
+    assert "held" in registry
+    assert "released" not in registry
+
+
+def test_release_unknown_key_is_noop():
+    """Releasing a key that was never acquired does not raise."""
+    registry = ResourceRegistry()
+    registry.release("missing")
+    assert len(registry) == 0
+
+
+def test_slow_factory_blocks_only_its_own_key():
+    """Loading one key does not hold up acquire/release of other keys."""
+    registry = ResourceRegistry()
+    started = threading.Event()
+    finish = threading.Event()
+
+    def load():
+        started.set()
+        finish.wait(5)
+        return object()
+
+    slow_factory = MagicMock(side_effect=load)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        first = pool.submit(registry.acquire, "cross-encoder", slow_factory)
+        assert started.wait(5)
+        second = pool.submit(registry.acquire, "cross-encoder", slow_factory)
+
+        # Served while the cross-encoder is still loading
+        other = pool.submit(registry.acquire, "minilm", object).result(timeout=5)
+        registry.release("minilm")
+        assert other is not None and not first.done() and not second.done()
+
+        finish.set()
+        assert first.result(timeout=5) is second.result(timeout=5)
+
+    assert slow_factory.call_count == 1
+    assert registry.stats()["cross-encoder"]["refcount"] == 2
+
+
+def test_failed_factory_lets_next_caller_retry():
+    """A factory error reaches its caller and leaves the key loadable again."""
+    registry = ResourceRegistry()
+
+    with pytest.raises(OSError):
+        registry.acquire("minilm", MagicMock(side_effect=OSError("download falhou")))
+
+    assert "minilm" not in registry
+    resource = registry.acquire("minilm", object)
+    assert registry.acquire("minilm", object) is resource
+
+
+def test_client_paths_are_normalized():
+    """Relative and absolute forms of the same path share one client."""
+    factory = MagicMock(side_effect=lambda: object())
+
+    relative = acquire_client("./chroma_db", factory)
+    absolute = acquire_client(os.path.abspath("chroma_db"), factory)
+
+    assert relative is absolute
+    assert factory.call_count == 1
+
+    release_client("./chroma_db")
+    release_client("./chroma_db")
+    assert list(client_registry.stats().values())[0]["refcount"] == 0
+
+
+def test_new_client_version_replaces_unreferenced_old_version(tmp_path):
+    """A rewritten index file gets a new instance; idle old versions are dropped."""
+    index_file = tmp_path / "index.json"
+    index_file.write_text("v1")
+    factory = MagicMock(side_effect=lambda: object())
+
+    v1 = file_version(str(index_file))
+    old = acquire_client(str(tmp_path), factory, version=v1)
+    index_file.write_text("v2 maior")
+    v2 = file_version(str(index_file))
+    new = acquire_client(str(tmp_path), factory, version=v2)
+
+    assert v1 != v2 and old is not new
+    # The old version is still referenced: it stays until released
+    assert len(client_registry) == 2
+    release_client(str(tmp_path), v1)
+    assert acquire_client(str(tmp_path), factory, version=v2) is new
+    assert len(client_registry) == 1
+    assert factory.call_count == 2
+    assert file_version(str(tmp_path / "missing.json")) is None
+
+
+def test_retriever_providers_share_model_and_client():
+    """Two RetrieverProvider instances load the model and open the client once."""
+    with patch('services.retriever_provider.chromadb.PersistentClient') as mock_client_class, \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+
+        mock_client = MagicMock()
+        mock_client.get_collection.return_value = MagicMock()
+        mock_client_class.return_value = mock_client
+
+        from services.retriever_provider import RetrieverProvider
+
+        first = RetrieverProvider(db_path="./test_db", collection_name="a")
+        second = RetrieverProvider(db_path="./test_db", collection_name="b")
+
+        assert first.modelo is second.modelo
+        assert first.client is second.client
+        mock_model_class.assert_called_once()
+        mock_client_class.assert_called_once()
+
+        first.close()
+        second.close()
+        second.close()  # idempotent
+
+        assert second.modelo is None
+        assert all(entry["refcount"] == 0 for entry in client_registry.stats().values())
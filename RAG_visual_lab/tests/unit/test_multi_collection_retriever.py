@@ -0,0 +1,204 @@
+"""
+Unit Tests: MultiCollectionRetriever
+====================================
+
+Tests for services.multi_collection_retriever, which searches several
+ChromaDB collections with one query embedding and merges the results.
+
+Test Strategy:
+    - Two real (temporary) ChromaDB collections with different distance
+      metrics, so raw distances are not comparable across them
+    - The query is encoded once, and the merged ranking equals the global
+      cosine-similarity ranking over both collections
+    - A failing collection is skipped; a missing one fails at construction
+      and releases the shared model and client
+    - The reranker scores the merged candidates in a single call
+    - In hybrid mode the merge follows the fusion score, so a chunk found only
+      by BM25 keeps its place ahead of closer dense matches
+"""
+
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import chromadb
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from services.bm25_index import bm25_index_path, build_bm25_index
+from services.model_registry import client_registry, model_registry
+from utils.vector_search import normalize_rows
+
+DIM = 8
+
+
+def _client(tmp_path, n=20, seed=0):
+    rng = np.random.RandomState(seed)
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    vectors = {}
+    for name, metric in [("papers", "l2"), ("direito", "cosine")]:
+        collection = client.create_collection(name=name, metadata={"hnsw:space": metric})
+        # Unit-norm rows (as in a normalized embedding model), scaled per
+        # collection: raw l2 distances of "papers" are much larger
+        embeddings = normalize_rows(rng.randn(n, DIM)) * (5.0 if name == "papers" else 1.0)
+        collection.add(
+            ids=[f"{name}-{i}" for i in range(n)],
+            embeddings=embeddings.tolist(),
+            documents=[f"{name} chunk {i}" for i in range(n)],
+            metadatas=[{"source_file": f"{name}{i % 2}.pdf"} for i in range(n)],
+        )
+        vectors.update({f"{name}-{i}": embedding for i, embedding in enumerate(embeddings)})
+    return client, vectors, rng.randn(1, DIM)
+
+
+def _expected_ranking(vectors, query_embedding, n_results):
+    ids = list(vectors)
+    similarities = normalize_rows(np.array([vectors[i] for i in ids])) @ normalize_rows(query_embedding[0])
+    return [ids[i] for i in np.argsort(-similarities, kind="stable")[:n_results]]
+
+
+def test_multi_collection_merges_by_cosine_similarity(tmp_path):
+    client, vectors, query_embedding = _client(tmp_path)
+
+    with patch('services.retriever_provider.chromadb.PersistentClient', return_value=client), \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        mock_model_class.return_value.encode.return_value = query_embedding
+
+        from services.multi_collection_retriever import MultiCollectionRetriever
+
+        with MultiCollectionRetriever(db_path=str(tmp_path), collection_names=["papers", "direito"]) as retriever:
+            results = retriever.search_results("dados sintéticos e direito", n_results=6)
+            chunks = retriever.search("dados sintéticos e direito", n_results=6)
+            assert retriever.get_collection_info()["count"] == 40
+
+        # One forward pass for both collections (the second search hits the cache)
+        mock_model_class.return_value.encode.assert_called_once()
+
+    assert [r.id for r in results] == _expected_ranking(vectors, query_embedding, 6)
+    assert chunks == [r.text for r in results]
+    assert {r.collection for r in results} == {"papers", "direito"}
+    assert all(r.collection == r.id.split("-")[0] for r in results)
+    similarities = [r.similarity for r in results]
+    assert similarities == sorted(similarities, reverse=True)
+    assert len(model_registry) == len(client_registry) == 1
+    assert all(entry["refcount"] == 0 for entry in model_registry.stats().values())
+
+
+def test_multi_collection_where_and_min_similarity(tmp_path):
+    client, _, query_embedding = _client(tmp_path)
+
+    with patch('services.retriever_provider.chromadb.PersistentClient', return_value=client), \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        mock_model_class.return_value.encode.return_value = query_embedding
+
+        from services.multi_collection_retriever import MultiCollectionRetriever
+
+        with MultiCollectionRetriever(db_path=str(tmp_path), collection_names=["papers", "direito"]) as retriever:
+            where = {"source_file": {"$in": ["papers1.pdf", "direito1.pdf"]}}
+            filtered = retriever.search_results("query", n_results=10, where=where)
+            thresholded = retriever.search_results("query", n_results=40, min_similarity=0.3)
+
+    assert len(filtered) == 10
+    assert all(r.source in ("papers1.pdf", "direito1.pdf") for r in filtered)
+    assert thresholded and all(r.similarity >= 0.3 for r in thresholded)
+    assert retriever.last_below_threshold == 40 - len(thresholded)
+
+
+def test_multi_collection_skips_failing_collection(tmp_path):
+    client, vectors, query_embedding = _client(tmp_path)
+
+    with patch('services.retriever_provider.chromadb.PersistentClient', return_value=client), \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        mock_model_class.return_value.encode.return_value = query_embedding
+
+        from services.multi_collection_retriever import MultiCollectionRetriever
+
+        retriever = MultiCollectionRetriever(db_path=str(tmp_path), collection_names=["papers", "direito"])
+        retriever.retrievers[0].collection = MagicMock()
+        retriever.retrievers[0].collection.query.side_effect = RuntimeError("HNSW corrompido")
+        results = retriever.search_results("query", n_results=3)
+        retriever.close()
+
+    direito = {key: value for key, value in vectors.items() if key.startswith("direito")}
+    assert [r.id for r in results] == _expected_ranking(direito, query_embedding, 3)
+
+
+def test_multi_collection_missing_collection_releases_resources(tmp_path):
+    client, _, _ = _client(tmp_path)
+
+    with patch('services.retriever_provider.chromadb.PersistentClient', return_value=client), \
+         patch('services.retriever_provider.SentenceTransformer'):
+        from services.multi_collection_retriever import MultiCollectionRetriever
+
+        with pytest.raises(Exception, match="does not exist"):
+            MultiCollectionRetriever(db_path=str(tmp_path), collection_names=["papers", "inexistente"])
+        with pytest.raises(ValueError):
+            MultiCollectionRetriever(db_path=str(tmp_path), collection_names=[])
+
+    assert all(entry["refcount"] == 0 for entry in model_registry.stats().values())
+    assert all(entry["refcount"] == 0 for entry in client_registry.stats().values())
+
+
+def test_multi_collection_reranks_merged_candidates(tmp_path):
+    client, _, query_embedding = _client(tmp_path)
+    reranker = MagicMock()
+    # Reverses the candidate order: the least similar candidate wins
+    reranker.rerank.side_effect = lambda query, documents: [
+        (i, float(i)) for i in reversed(range(len(documents)))
+    ]
+
+    with patch('services.retriever_provider.chromadb.PersistentClient', return_value=client), \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        mock_model_class.return_value.encode.return_value = query_embedding
+
+        from services.multi_collection_retriever import MultiCollectionRetriever
+
+        retriever = MultiCollectionRetriever(
+            db_path=str(tmp_path), collection_names=["papers", "direito"], reranker=reranker, rerank_factor=2
+        )
+        results = retriever.search_results("query", n_results=2)
+        retriever.close()
+
+    # 2 results * rerank_factor 2 from each collection, scored in one call
+    reranker.rerank.assert_called_once()
+    candidates = reranker.rerank.call_args.args[1]
+    assert len(candidates) == 8
+    assert [r.text for r in results] == [candidates[7], candidates[6]]
+    assert results[0].score == 7.0
+    reranker.close.assert_called_once()
+
+
+def test_multi_collection_hybrid_keeps_bm25_only_hit(tmp_path):
+    client, vectors, _ = _client(tmp_path)
+    papers = client.get_collection("papers")
+    # The identifier chunk points away from the query: last by cosine
+    query_embedding = normalize_rows(vectors["direito-0"][None, :])
+    papers.update(
+        ids=["papers-3"],
+        embeddings=(-query_embedding * 5.0).tolist(),
+        documents=["See arXiv 2111.01888v1 for the synthetic dataset of papers."],
+    )
+    db_path = str(tmp_path / "chroma")
+    for name in ("papers", "direito"):
+        build_bm25_index(client.get_collection(name), bm25_index_path(db_path, name))
+
+    with patch('services.retriever_provider.chromadb.PersistentClient', return_value=client), \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        mock_model_class.return_value.encode.return_value = query_embedding
+
+        from services.multi_collection_retriever import MultiCollectionRetriever
+
+        with MultiCollectionRetriever(
+            db_path=db_path, collection_names=["papers", "direito"], retrieval_mode="hybrid"
+        ) as retriever:
+            results = retriever.search_results("2111.01888v1", n_results=3)
+
+    # Dense and lexical ranks both count: papers-3 leads despite the lowest similarity
+    assert results[0].id == "papers-3"
+    assert results[0].similarity == pytest.approx(-1.0, abs=1e-4)
+    # The dense leaders of each collection tie on the fused score
+    assert "direito-0" in [r.id for r in results[1:]]
+    scores = [r.score for r in results]
+    assert scores == sorted(scores, reverse=True)
@@ -0,0 +1,137 @@
+"""
+Unit Tests: Parallel Conversion
+===============================
+
+Tests for how read_files.ReadFiles spreads the conversion of a directory
+over its pools.
+
+Test Strategy:
+    - Stub converters replace MarkItDown; they finish in reverse order, so the
+      output order is the input order only if ReadFiles restores it
+    - The pools are replaced by recording thread pools: PDF/Office files must
+      go to the process pool and images to the thread pool bounded by
+      image_workers
+    - With max_workers=1 no process pool is created and documents are
+      converted serially in the calling thread
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+# read_files creates the Gemini client at import time
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import read_files  # noqa: E402
+from read_files import ReadFiles  # noqa: E402
+
+FILES = ["a.pdf", "b.png", "c.docx", "d.txt", "e.jpg", "f.xlsx"]
+
+
+class RecordingPool(ThreadPoolExecutor):
+    """Thread pool that records the pool kind and worker count of each submit."""
+
+    def __init__(self, kind, log, max_workers=None):
+        super().__init__(max_workers=max_workers)
+        self.kind = kind
+        self.log = log
+        self.log.append((kind, "created", max_workers))
+
+    def submit(self, fn, *args, **kwargs):
+        self.log.append((self.kind, os.path.basename(args[0])))
+        return super().submit(fn, *args, **kwargs)
+
+
+def _stub_convert(prefix):
+    def convert(file_path):
+        name = os.path.basename(file_path)
+        # Later files finish first
+        time.sleep(0.01 * (len(FILES) - FILES.index(name)))
+        return f"{prefix}:{name}"
+    return convert
+
+
+@pytest.fixture
+def docs(tmp_path, monkeypatch):
+    monkeypatch.setattr(read_files, "MARKDOWN_DIR", str(tmp_path / "markdown"))
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    for name in FILES + ["notas.unknown"]:
+        (docs_dir / name).write_text(name, encoding="utf-8")
+    return [str(docs_dir / name) for name in FILES + ["notas.unknown"]]
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    log = []
+    monkeypatch.setattr(
+        read_files, "ProcessPoolExecutor",
+        lambda max_workers=None, initializer=None: RecordingPool("process", log, max_workers),
+    )
+    monkeypatch.setattr(
+        read_files, "ThreadPoolExecutor",
+        lambda max_workers=None: RecordingPool("thread", log, max_workers),
+    )
+    monkeypatch.setattr(read_files, "_convert_document_in_worker", _stub_convert("doc"))
+    return log
+
+
+def _reader(max_workers, image_workers=2):
+    reader = ReadFiles(max_workers=max_workers, image_workers=image_workers, use_cache=False)
+    reader._convert_image = _stub_convert("img")
+    callers = []
+
+    def convert_document(file_path):
+        callers.append(threading.current_thread())
+        return _stub_convert("doc")(file_path)
+
+    reader._convert_document = convert_document
+    return reader, callers
+
+
+def test_parallel_conversion_keeps_input_order(docs, pools):
+    reader, callers = _reader(max_workers=3, image_workers=2)
+
+    results = list(reader.iter_markdown(docs))
+
+    # Unsupported files are skipped; the rest come back in input order
+    assert [name for name, _ in results] == FILES
+    for name, markdown in results:
+        kind = "img" if name.endswith((".png", ".jpg")) else "doc"
+        assert markdown.endswith(f"{kind}:{name}")
+        assert f"ARQUIVO: {os.path.splitext(name)[0]}.md" in markdown
+    assert callers == []
+
+
+def test_documents_go_to_process_pool_and_images_to_thread_pool(docs, pools):
+    reader, _ = _reader(max_workers=8, image_workers=2)
+
+    list(reader.iter_markdown(docs))
+
+    # One process per document at most, image threads bounded by image_workers
+    assert ("process", "created", 4) in pools
+    assert ("thread", "created", 2) in pools
+    routed = {name: kind for kind, name, *_ in pools if name != "created"}
+    assert routed == {
+        "a.pdf": "process", "c.docx": "process", "d.txt": "process", "f.xlsx": "process",
+        "b.png": "thread", "e.jpg": "thread",
+    }
+
+
+def test_single_worker_converts_documents_serially(docs, pools):
+    reader, callers = _reader(max_workers=1, image_workers=4)
+
+    results = list(reader.iter_markdown(docs))
+
+    assert [name for name, _ in results] == FILES
+    assert not any(entry[0] == "process" for entry in pools)
+    # Images still use a pool, but with a single thread
+    assert ("thread", "created", 1) in pools
+    assert len(callers) == 4 and set(callers) == {threading.current_thread()}
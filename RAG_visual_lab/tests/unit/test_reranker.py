@@ -0,0 +1,199 @@
+"""
+Unit Tests: Cross-Encoder Reranker
+==================================
+
+Tests for services.reranker and for RetrieverProvider(reranker=...).
+
+Test Strategy:
+    - Replace sentence_transformers.CrossEncoder with a fake that scores a pair
+      by how often the query words occur in the chunk
+    - Pairs are scored in batches and cached across calls
+    - A latency budget that cannot fit the remaining batches falls back to the
+      dense order, keeping the partial scores in the cache; with a configured
+      or previously measured per-pair cost, even the first batch is checked
+    - rerank_hits (shared by both retrievers) keeps the best n_results with
+      their rerank_score and falls back to the received order
+    - RetrieverProvider over-fetches, keeps the best n_results and falls back
+      on reranker errors
+"""
+
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from services.reranker import CrossEncoderReranker, PairScoreCache, rerank_hits
+
+
+class FakeCrossEncoder:
+    def __init__(self, model_name, max_length=None, device=None, delay=0.0):
+        self.calls = []
+        self.delay = delay
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.calls.append(len(pairs))
+        time.sleep(self.delay)
+        return np.array(
+            [sum(document.lower().count(word) for word in query.lower().split()) for query, document in pairs],
+            dtype=np.float32,
+        )
+
+
+DOCUMENTS = ["redis guarda o histórico", "rag combina busca e geração", "rag rag rag", "sem relação"]
+
+
+def _reranker(delay=0.0, **kwargs):
+    model = FakeCrossEncoder("fake", delay=delay)
+    reranker = CrossEncoderReranker(model_name="fake", cache=PairScoreCache(), **kwargs)
+    return reranker, model
+
+
+def test_rerank_orders_by_score_in_batches():
+    reranker, model = _reranker(batch_size=3)
+
+    with patch("sentence_transformers.CrossEncoder", return_value=model):
+        ranking = reranker.rerank("RAG", DOCUMENTS)
+
+    assert [i for i, _ in ranking] == [2, 1, 0, 3]
+    assert ranking[0][1] == 3.0
+    assert model.calls == [3, 1]
+    reranker.close()
+    assert reranker.model is None
+
+
+def test_rerank_reuses_cached_pair_scores():
+    reranker, model = _reranker()
+
+    with patch("sentence_transformers.CrossEncoder", return_value=model):
+        first = reranker.rerank("RAG", DOCUMENTS)
+        second = reranker.rerank("  RAG ", DOCUMENTS + ["rag novo"])
+
+    assert model.calls == [4, 1]
+    assert [i for i, _ in second][:2] == [i for i, _ in first][:2]
+    stats = reranker.stats()
+    assert stats["cache"]["hits"] == 4 and stats["pairs_scored"] == 5
+    assert stats["reranked"] == 2 and stats["fallbacks"] == 0
+
+
+def test_rerank_falls_back_when_budget_exceeded():
+    reranker, model = _reranker(delay=0.03, batch_size=1, latency_budget_ms=50)
+
+    with patch("sentence_transformers.CrossEncoder", return_value=model):
+        assert reranker.rerank("RAG", DOCUMENTS) is None
+
+    assert 1 <= len(model.calls) < len(DOCUMENTS)
+    assert reranker.stats()["fallbacks"] == 1
+    assert reranker.cache.stats()["entries"] == len(model.calls)
+
+
+def test_rerank_checks_first_batch_against_configured_pair_cost():
+    reranker, model = _reranker(batch_size=4, latency_budget_ms=20, pair_cost_ms=10)
+
+    with patch("sentence_transformers.CrossEncoder", return_value=model):
+        assert reranker.rerank("RAG", DOCUMENTS) is None
+
+    # 4 pairs x 10 ms do not fit in 20 ms: the model is never called
+    assert model.calls == []
+    assert reranker.stats()["fallbacks"] == 1
+
+
+def test_rerank_checks_first_batch_against_measured_pair_cost():
+    reranker, model = _reranker(delay=0.05, batch_size=4, latency_budget_ms=20)
+
+    with patch("sentence_transformers.CrossEncoder", return_value=model):
+        # Nothing measured yet: the first batch runs and sets the per-pair cost
+        assert reranker.rerank("RAG", DOCUMENTS) is not None
+        assert reranker.stats()["pair_cost_ms"] >= 10
+        # The measurement is shared by the process: a new reranker (one per
+        # question in the pages) checks its first batch against it
+        next_reranker = CrossEncoderReranker(model_name="fake", cache=reranker.cache, latency_budget_ms=20)
+        assert next_reranker.rerank("geração", DOCUMENTS) is None
+
+    assert model.calls == [4]
+    assert next_reranker.stats()["fallbacks"] == 1
+
+
+def test_pair_score_cache_evicts_least_recently_used():
+    cache = PairScoreCache(max_entries=2)
+    cache.put_many("m", "q", ["a", "b"], [1.0, 2.0])
+    cache.get_many("m", "q", ["a"])
+    cache.put_many("m", "q", ["c"], [3.0])
+
+    assert cache.get_many("m", "q", ["a", "b", "c"]) == [1.0, None, 3.0]
+    with pytest.raises(ValueError):
+        PairScoreCache(max_entries=0)
+
+
+def test_rerank_hits_keeps_best_or_received_order():
+    hits = [{"id": f"id-{i}", "document": document} for i, document in enumerate(DOCUMENTS)]
+    reranker, model = _reranker()
+
+    with patch("sentence_transformers.CrossEncoder", return_value=model):
+        reranked = rerank_hits(reranker, "RAG", hits, 2)
+
+    assert [(hit["id"], hit["rerank_score"]) for hit in reranked] == [("id-2", 3.0), ("id-1", 1.0)]
+    failing = MagicMock()
+    failing.rerank.side_effect = RuntimeError("modelo indisponível")
+    assert rerank_hits(failing, "RAG", hits, 2) == hits[:2]
+    # A single candidate never reaches the cross-encoder
+    assert rerank_hits(failing, "RAG", hits[:1], 2) == hits[:1]
+    assert failing.rerank.call_count == 1
+
+
+def _retriever(reranker, documents):
+    with patch('services.retriever_provider.chromadb.PersistentClient') as mock_client_class, \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        mock_collection = MagicMock()
+        mock_collection.count.return_value = len(documents)
+        mock_collection.query.return_value = {
+            'ids': [[f"id-{i}" for i in range(len(documents))]],
+            'documents': [documents],
+            'distances': [[0.1 * i for i in range(len(documents))]],
+            'metadatas': [[{} for _ in documents]],
+        }
+        mock_client_class.return_value.get_collection.return_value = mock_collection
+        mock_model_class.return_value.encode.return_value = np.array([[0.1, 0.2]])
+
+        from services.retriever_provider import RetrieverProvider
+
+        retriever = RetrieverProvider(collection_name="test", reranker=reranker, rerank_factor=2)
+        return retriever, mock_collection
+
+
+def test_retriever_reranks_over_fetched_candidates():
+    reranker, model = _reranker()
+    retriever, collection = _retriever(reranker, DOCUMENTS)
+
+    with patch("sentence_transformers.CrossEncoder", return_value=model):
+        chunks = retriever.search("RAG", n_results=2)
+        results = retriever.search_many(["RAG"], n_results=2)[0]
+
+    assert collection.query.call_args.kwargs["n_results"] == 4
+    assert chunks == ["rag rag rag", "rag combina busca e geração"]
+    assert [r["id"] for r in results] == ["id-2", "id-1"]
+    assert results[0]["rerank_score"] == 3.0 and results[0]["distance"] == pytest.approx(0.2)
+    retriever.close()
+    assert reranker.model is None
+
+
+def test_retriever_keeps_dense_order_when_reranker_fails():
+    reranker = MagicMock()
+    reranker.rerank.side_effect = RuntimeError("modelo indisponível")
+    retriever, _ = _retriever(reranker, DOCUMENTS)
+
+    assert retriever.search("RAG", n_results=2) == DOCUMENTS[:2]
+    reranker.rerank.side_effect = None
+    reranker.rerank.return_value = None  # orçamento excedido
+    assert retriever.search("RAG", n_results=2) == DOCUMENTS[:2]
+
+
+def test_retriever_rejects_invalid_rerank_factor():
+    from services.retriever_provider import RetrieverProvider
+
+    with pytest.raises(ValueError):
+        RetrieverProvider(collection_name="test", rerank_factor=0)
@@ -19,6 +19,7 @@ Task: Task 3.3 - ChromaDB Integration
 import pytest
 import sys
 import os
+import numpy as np
 from unittest.mock import patch, MagicMock, Mock
 
 # Add parent directory to path for imports
@@ -136,8 +137,7 @@ def test_retriever_search_returns_chunks():
         
         # Setup SentenceTransformer mock
         mock_model = MagicMock()
-        mock_embedding = MagicMock()
-        mock_embedding.tolist.return_value = [[0.1, 0.2, 0.3]]
+        mock_embedding = np.array([[0.1, 0.2, 0.3]])
         mock_model.encode.return_value = mock_embedding
         mock_model_class.return_value = mock_model
         
@@ -188,8 +188,7 @@ def test_retriever_search_with_custom_n_results():
         mock_client_class.return_value = mock_client
         
         mock_model = MagicMock()
-        mock_embedding = MagicMock()
-        mock_embedding.tolist.return_value = [[0.1, 0.2]]
+        mock_embedding = np.array([[0.1, 0.2]])
         mock_model.encode.return_value = mock_embedding
         mock_model_class.return_value = mock_model
         
@@ -229,8 +228,7 @@ def test_retriever_search_handles_empty_results():
         mock_client_class.return_value = mock_client
         
         mock_model = MagicMock()
-        mock_embedding = MagicMock()
-        mock_embedding.tolist.return_value = [[0.1, 0.2]]
+        mock_embedding = np.array([[0.1, 0.2]])
         mock_model.encode.return_value = mock_embedding
         mock_model_class.return_value = mock_model
         
@@ -262,8 +260,7 @@ def test_retriever_search_handles_query_error():
         mock_client_class.return_value = mock_client
         
         mock_model = MagicMock()
-        mock_embedding = MagicMock()
-        mock_embedding.tolist.return_value = [[0.1, 0.2]]
+        mock_embedding = np.array([[0.1, 0.2]])
         mock_model.encode.return_value = mock_embedding
         mock_model_class.return_value = mock_model
         
@@ -335,3 +332,226 @@ def test_retriever_uses_custom_model():
         # Verify custom model was loaded
         mock_model_class.assert_called_once_with("custom-model-name")
         assert retriever.model_name == "custom-model-name"
+
+
+def test_retriever_search_many_batches_encode_and_query():
+    """
+    Tests that search_many() encodes all queries in one batch and issues a
+    single ChromaDB query, returning per-query results with scores.
+    """
+    with patch('services.retriever_provider.chromadb.PersistentClient') as mock_client_class, \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        
+        mock_client = MagicMock()
+        mock_collection = MagicMock()
+        mock_collection.query.return_value = {
+            'ids': [['a1', 'a2'], ['b1']],
+            'documents': [['chunk a1', 'chunk a2'], ['chunk b1']],
+            'distances': [[0.1, 0.4], [0.2]],
+            'metadatas': [[{'chunk_id': 0}, {'chunk_id': 1}], [None]]
+        }
+        mock_client.get_collection.return_value = mock_collection
+        mock_client_class.return_value = mock_client
+        
+        mock_model = MagicMock()
+        mock_embedding = np.array([[0.1, 0.2], [0.3, 0.4]])
+        mock_model.encode.return_value = mock_embedding
+        mock_model_class.return_value = mock_model
+        
+        from services.retriever_provider import RetrieverProvider
+        
+        retriever = RetrieverProvider(collection_name="test")
+        results = retriever.search_many(["query a", "query b"], n_results=2)
+        
+        mock_model.encode.assert_called_once_with(["query a", "query b"])
+        mock_collection.query.assert_called_once()
+        np.testing.assert_allclose(
+            mock_collection.query.call_args.kwargs['query_embeddings'], [[0.1, 0.2], [0.3, 0.4]]
+        )
+        
+        assert len(results) == 2
+        assert [r['document'] for r in results[0]] == ['chunk a1', 'chunk a2']
+        assert results[0][1]['distance'] == 0.4
+        assert results[0][0]['metadata'] == {'chunk_id': 0}
+        assert results[1] == [{'id': 'b1', 'document': 'chunk b1', 'distance': 0.2, 'metadata': {}}]
+
+
+def test_retriever_search_many_handles_empty_and_errors():
+    """
+    Tests that search_many() returns [] for no queries and one empty list per
+    query when ChromaDB fails.
+    """
+    with patch('services.retriever_provider.chromadb.PersistentClient') as mock_client_class, \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        
+        mock_client = MagicMock()
+        mock_collection = MagicMock()
+        mock_collection.query.side_effect = Exception("ChromaDB connection error")
+        mock_client.get_collection.return_value = mock_collection
+        mock_client_class.return_value = mock_client
+        mock_model_class.return_value = MagicMock()
+        
+        from services.retriever_provider import RetrieverProvider
+        
+        retriever = RetrieverProvider(collection_name="test")
+        
+        assert retriever.search_many([]) == []
+        assert retriever.search_many(["a", "b", "c"]) == [[], [], []]
+
+
+def test_retriever_search_reuses_cached_query_embedding():
+    """
+    Tests that repeated (whitespace-variant) queries skip the model forward pass
+    and that cache statistics are exposed.
+    """
+    with patch('services.retriever_provider.chromadb.PersistentClient') as mock_client_class, \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        
+        mock_client = MagicMock()
+        mock_collection = MagicMock()
+        mock_collection.query.return_value = {
+            'documents': [['chunk1']],
+            'distances': [[0.1]],
+            'metadatas': [[{}]]
+        }
+        mock_client.get_collection.return_value = mock_collection
+        mock_client_class.return_value = mock_client
+        
+        mock_model = MagicMock()
+        mock_model.encode.return_value = np.array([[0.1, 0.2]])
+        mock_model_class.return_value = mock_model
+        
+        from services.retriever_provider import RetrieverProvider
+        
+        retriever = RetrieverProvider(collection_name="test")
+        retriever.search("What is RAG?")
+        retriever.search("  What is   RAG? ")
+        
+        mock_model.encode.assert_called_once_with(["What is RAG?"])
+        assert mock_collection.query.call_count == 2
+        
+        stats = retriever.get_cache_stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert retriever.get_collection_info()['query_cache']['entries'] == 1
+
+
+def test_retriever_mmr_selection_skips_overlapping_chunks():
+    """
+    Tests that selection="mmr" over-fetches with embeddings and returns a
+    diverse top-k without the embeddings in the results.
+    """
+    with patch('services.retriever_provider.chromadb.PersistentClient') as mock_client_class, \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        
+        mock_collection = MagicMock()
+        mock_collection.query.return_value = {
+            'ids': [['a', 'a-overlap', 'b', 'c']],
+            'documents': [['chunk a', 'chunk a (overlap)', 'chunk b', 'chunk c']],
+            'distances': [[0.1, 0.11, 0.3, 0.9]],
+            'metadatas': [[{}, {}, {}, {}]],
+            'embeddings': [np.array([[1.0, 0.1, 0.0], [1.0, 0.11, 0.0], [0.8, 0.0, 0.6], [0.0, 1.0, 0.0]])],
+        }
+        mock_client_class.return_value.get_collection.return_value = mock_collection
+        mock_model_class.return_value.encode.return_value = np.array([[1.0, 0.0, 0.0]])
+        
+        from services.retriever_provider import RetrieverProvider
+        
+        retriever = RetrieverProvider(collection_name="test", selection="mmr", mmr_fetch_factor=2)
+        chunks = retriever.search("query", n_results=2)
+        results = retriever.search_many(["query"], n_results=2)[0]
+        
+        call = mock_collection.query.call_args.kwargs
+        assert call['n_results'] == 4
+        assert 'embeddings' in call['include']
+        assert chunks == ['chunk a', 'chunk b']
+        assert [r['id'] for r in results] == ['a', 'b']
+        assert all('embedding' not in r for r in results)
+        
+        with pytest.raises(ValueError):
+            RetrieverProvider(collection_name="test", selection="diverse")
+        with pytest.raises(ValueError):
+            RetrieverProvider(collection_name="test", selection="mmr", mmr_lambda=2.0)
+
+
+def test_retriever_search_results_returns_structured_results():
+    """
+    Tests that search_results() returns compact RetrievalResult objects with
+    cosine similarity, and that min_similarity filters them. Only chunks
+    dropped by the threshold count in last_below_threshold, not errors.
+    """
+    with patch('services.retriever_provider.chromadb.PersistentClient') as mock_client_class, \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        
+        mock_collection = MagicMock()
+        mock_collection.query.return_value = {
+            'ids': [['a', 'b']],
+            'documents': [['chunk a', 'chunk b']],
+            'distances': [[0.02, 1.3]],
+            'metadatas': [[{'source_file': 'lei.pdf'}, None]],
+            'embeddings': [np.array([[2.0, 0.0], [0.6, 0.8]])],
+        }
+        mock_client_class.return_value.get_collection.return_value = mock_collection
+        mock_model_class.return_value.encode.return_value = np.array([[1.0, 0.0]])
+        
+        from services.retriever_provider import RetrievalResult, RetrieverProvider
+        
+        retriever = RetrieverProvider(collection_name="test")
+        results = retriever.search_results("query", n_results=2)
+        
+        assert 'embeddings' in mock_collection.query.call_args.kwargs['include']
+        assert all(isinstance(r, RetrievalResult) for r in results)
+        assert not hasattr(results[0], '__dict__')
+        assert [r.id for r in results] == ['a', 'b']
+        assert results[0].text == 'chunk a' and results[0].source == 'lei.pdf'
+        assert results[0].distance == 0.02 and results[0].score is None
+        assert results[0].similarity == pytest.approx(1.0)
+        assert results[1].similarity == pytest.approx(0.6)
+        assert results[1].metadata == {}
+        
+        assert retriever.last_below_threshold == 0
+        assert [r.id for r in retriever.search_results("query", min_similarity=0.8)] == ['a']
+        assert retriever.last_below_threshold == 1
+        assert retriever.search_results("query", min_similarity=1.01) == []
+        assert retriever.last_below_threshold == 2
+        
+        mock_collection.query.side_effect = Exception("ChromaDB connection error")
+        assert retriever.search_results("query") == []
+        assert retriever.search_results("query", min_similarity=0.5) == []
+        assert retriever.last_below_threshold == 0
+
+
+def test_retriever_where_filter_is_pushed_down():
+    """
+    Tests that the `where` metadata filter of search(), search_results() and
+    search_many() is passed to collection.query.
+    """
+    with patch('services.retriever_provider.chromadb.PersistentClient') as mock_client_class, \
+         patch('services.retriever_provider.SentenceTransformer') as mock_model_class:
+        
+        mock_collection = MagicMock()
+        mock_collection.query.return_value = {
+            'ids': [['a']],
+            'documents': [['chunk a']],
+            'distances': [[0.1]],
+            'metadatas': [[{'source_file': 'lei.pdf', 'page_start': 3, 'page_end': 4}]],
+        }
+        mock_client_class.return_value.get_collection.return_value = mock_collection
+        mock_model_class.return_value.encode.return_value = np.array([[1.0, 0.0]])
+        
+        from services.retriever_provider import RetrieverProvider
+        
+        retriever = RetrieverProvider(collection_name="test")
+        where = {"source_file": "lei.pdf"}
+        
+        assert retriever.search("query", n_results=1, where=where) == ['chunk a']
+        assert mock_collection.query.call_args.kwargs['where'] == where
+        
+        retriever.search_many(["query"], n_results=1, where=where)
+        assert mock_collection.query.call_args.kwargs['where'] == where
+        
+        retriever.search_results("query", n_results=1, where=where)
+        assert mock_collection.query.call_args.kwargs['where'] == where
+        
+        retriever.search("query", n_results=1)
+        assert mock_collection.query.call_args.kwargs['where'] is None
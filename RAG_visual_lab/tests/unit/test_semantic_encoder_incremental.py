@@ -0,0 +1,499 @@
+"""
+Unit Tests: SemanticEncoder Incremental Build
+=============================================
+
+Tests for SemanticEncoder.build(incremental=True) and its manifest
+(<db_path>/manifests/<collection>.json), in the root semantic_encoder module,
+and for the micro-batched, per-document pipeline shared by every build.
+
+Test Strategy:
+    - Real (temporary) ChromaDB directory and plain-text documents, with a
+      fake embedding model (deterministic vectors, no download)
+    - The conversion cache is disabled and the markdown output goes to the
+      temporary directory, so the tests do not touch the repository
+    - Each case checks both the build statistics and the stored chunk ids
+      against the manifest: unchanged files are skipped, shrinking or removed
+      files leave no orphan chunks, a settings change rebuilds everything and
+      an interrupted build resumes from the last saved file
+    - A full build writes the manifest too, so an incremental run right after
+      it embeds nothing
+    - Chunk ids come from the content, so editing one chunk of a file embeds
+      only that chunk again
+    - A fake client with a small get_max_batch_size() clamps batch_size: the
+      upserts and the progress callback follow the micro-batches, the next
+      batch is encoded while the previous upsert runs, and an upsert error in
+      the writer thread reaches build()
+    - Documents stream through the build: chunks of a document are upserted
+      before the next documents are converted
+    - With the encode pool, several documents go to the pool in one call and
+      the embeddings are split back per file for the upserts
+    - If opening the client fails in __init__, the model reference taken
+      from the registry is released before the error propagates
+    - In chars mode each embedded chunk is tokenized once outside the model,
+      for both the truncation report and the length buckets
+"""
+
+import functools
+import hashlib
+import os
+import sys
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+# read_files creates the Gemini client at import time
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import read_files  # noqa: E402
+import semantic_encoder  # noqa: E402
+from semantic_encoder import SemanticEncoder  # noqa: E402
+from services.model_registry import model_registry  # noqa: E402
+
+DIM = 8
+COLLECTION = "docs"
+
+
+class FakeModel:
+    """Deterministic embeddings derived from the text hash."""
+
+    def __init__(self, *args, **kwargs):
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return np.array([
+            np.random.RandomState(int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)).randn(DIM)
+            for text in texts
+        ])
+
+
+@pytest.fixture
+def docs_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(read_files, "MARKDOWN_DIR", str(tmp_path / "markdown"))
+    monkeypatch.setattr(semantic_encoder, "ReadFiles", functools.partial(read_files.ReadFiles, use_cache=False))
+    monkeypatch.setattr(semantic_encoder, "SentenceTransformer", FakeModel)
+    path = tmp_path / "docs"
+    path.mkdir()
+    return path
+
+
+def _write(docs_dir, name, paragraphs):
+    text = "\n\n".join(f"Parágrafo {i} do arquivo {name}: " + "texto " * 8 for i in range(paragraphs))
+    (docs_dir / name).write_text(text, encoding="utf-8")
+
+
+def _encoder(docs_dir, chunk_size=80, overlap_size=10, **kwargs):
+    return SemanticEncoder(
+        docs_dir=str(docs_dir),
+        chunk_size=chunk_size,
+        overlap_size=overlap_size,
+        db_path=str(docs_dir.parent / "chroma"),
+        collection_name=COLLECTION,
+        dedup_threshold=None,
+        lexical_index=False,
+        **kwargs,
+    )
+
+
+def _build(docs_dir, **kwargs):
+    encoder = _encoder(docs_dir, **kwargs)
+    # The registry shares one FakeModel across encoders: count this build only
+    already_encoded = len(encoder.modelo.encoded)
+    try:
+        stats = encoder.build(incremental=True)
+        stored = encoder.collection.get(include=["metadatas"])
+        manifest = encoder._load_manifest(encoder._manifest_path(COLLECTION))
+        encoded = encoder.modelo.encoded[already_encoded:]
+    finally:
+        encoder.close()
+    chunk_ids = {}
+    for metadata in stored["metadatas"]:
+        chunk_ids.setdefault(metadata["source_file"], []).append(metadata["chunk_id"])
+    return stats, {file: sorted(ids) for file, ids in chunk_ids.items()}, manifest, encoded
+
+
+def _assert_matches_manifest(chunk_ids, manifest):
+    """Every file has exactly chunks 0..n-1 of its manifest entry: no orphans."""
+    assert chunk_ids == {
+        file: list(range(entry["chunks"])) for file, entry in manifest["files"].items()
+    }
+
+
+def test_unchanged_files_are_skipped(docs_dir):
+    _write(docs_dir, "a.txt", 4)
+    _write(docs_dir, "b.txt", 3)
+
+    first, _, _, _ = _build(docs_dir)
+    second, chunk_ids, manifest, encoded = _build(docs_dir)
+
+    assert first["arquivos_processados"] == ["a.txt", "b.txt"]
+    assert second["arquivos_processados"] == [] and second["arquivos_removidos"] == []
+    assert second["arquivos_inalterados"] == 2
+    assert second["chunks_salvos"] == 0 and encoded == []
+    assert second["total_documentos"] == first["total_documentos"]
+    _assert_matches_manifest(chunk_ids, manifest)
+
+
+def test_full_build_writes_manifest_for_incremental_runs(docs_dir):
+    _write(docs_dir, "a.txt", 4)
+    _write(docs_dir, "b.txt", 3)
+
+    encoder = _encoder(docs_dir)
+    try:
+        full = encoder.build()
+    finally:
+        encoder.close()
+    stats, chunk_ids, manifest, encoded = _build(docs_dir)
+
+    assert full["chunks_salvos"] == stats["total_documentos"]
+    assert stats["arquivos_processados"] == [] and stats["arquivos_inalterados"] == 2
+    assert stats["chunks_salvos"] == 0 and encoded == []
+    _assert_matches_manifest(chunk_ids, manifest)
+
+    # Removing a file after a full build deletes its chunks
+    os.remove(docs_dir / "b.txt")
+    stats, chunk_ids, manifest, _ = _build(docs_dir)
+    assert stats["arquivos_removidos"] == ["b.txt"]
+    _assert_matches_manifest(chunk_ids, manifest)
+
+
+def test_shrinking_file_leaves_no_orphan_chunks(docs_dir):
+    _write(docs_dir, "a.txt", 8)
+    _write(docs_dir, "b.txt", 3)
+    _, before, _, _ = _build(docs_dir)
+
+    _write(docs_dir, "a.txt", 2)
+    stats, chunk_ids, manifest, _ = _build(docs_dir)
+
+    assert stats["arquivos_processados"] == ["a.txt"]
+    assert len(chunk_ids["a.txt"]) < len(before["a.txt"])
+    assert chunk_ids["b.txt"] == before["b.txt"]
+    assert stats["total_documentos"] == sum(entry["chunks"] for entry in manifest["files"].values())
+    _assert_matches_manifest(chunk_ids, manifest)
+
+
+def test_removed_file_chunks_are_deleted(docs_dir):
+    _write(docs_dir, "a.txt", 4)
+    _write(docs_dir, "b.txt", 3)
+    _build(docs_dir)
+
+    os.remove(docs_dir / "b.txt")
+    stats, chunk_ids, manifest, _ = _build(docs_dir)
+
+    assert stats["arquivos_removidos"] == ["b.txt"]
+    assert stats["arquivos_processados"] == []
+    assert "b.txt" not in chunk_ids and "b.txt" not in manifest["files"]
+    _assert_matches_manifest(chunk_ids, manifest)
+
+
+def test_editing_one_chunk_embeds_only_that_chunk(docs_dir):
+    _write(docs_dir, "a.txt", 6)
+    _write(docs_dir, "b.txt", 3)
+    first, before, _, _ = _build(docs_dir)
+
+    # Same length, inside a single chunk (outside the overlaps)
+    path = docs_dir / "a.txt"
+    path.write_text(path.read_text(encoding="utf-8").replace("Parágrafo 3", "Parágrafo X"), encoding="utf-8")
+    stats, chunk_ids, manifest, encoded = _build(docs_dir)
+
+    assert stats["arquivos_processados"] == ["a.txt"]
+    assert len(encoded) == 1 and "Parágrafo X" in encoded[0]
+    assert stats["chunks_salvos"] == 1
+    assert stats["chunks_reaproveitados"] == len(before["a.txt"]) - 1
+    assert stats["total_documentos"] == first["total_documentos"]
+    _assert_matches_manifest(chunk_ids, manifest)
+
+
+def test_settings_change_forces_full_rebuild(docs_dir):
+    _write(docs_dir, "a.txt", 4)
+    _write(docs_dir, "b.txt", 3)
+    _, before, _, _ = _build(docs_dir, chunk_size=80)
+
+    stats, chunk_ids, manifest, _ = _build(docs_dir, chunk_size=120)
+
+    assert stats["arquivos_processados"] == ["a.txt", "b.txt"]
+    assert stats["arquivos_inalterados"] == 0
+    assert manifest["settings"]["chunk_size"] == 120
+    assert len(chunk_ids["a.txt"]) < len(before["a.txt"])
+    _assert_matches_manifest(chunk_ids, manifest)
+
+
+def test_interrupted_build_resumes_from_manifest(docs_dir):
+    for name in ("a.txt", "b.txt", "c.txt"):
+        _write(docs_dir, name, 3)
+
+    encoder = _encoder(docs_dir)
+    upsert_chunks = encoder._upsert_chunks
+
+    def fail_on_second_file(writer, collection, file, *args, **kwargs):
+        if file == "b.txt":
+            raise KeyboardInterrupt
+        return upsert_chunks(writer, collection, file, *args, **kwargs)
+
+    try:
+        with patch.object(encoder, "_upsert_chunks", side_effect=fail_on_second_file):
+            with pytest.raises(KeyboardInterrupt):
+                encoder.build(incremental=True)
+        interrupted = encoder._load_manifest(encoder._manifest_path(COLLECTION))
+    finally:
+        encoder.close()
+
+    assert list(interrupted["files"]) == ["a.txt"]
+
+    stats, chunk_ids, manifest, _ = _build(docs_dir)
+
+    assert stats["arquivos_processados"] == ["b.txt", "c.txt"]
+    assert stats["arquivos_inalterados"] == 1
+    assert sorted(manifest["files"]) == ["a.txt", "b.txt", "c.txt"]
+    _assert_matches_manifest(chunk_ids, manifest)
+
+
+class FakeCollection:
+    """Records each upsert (batch size and source files); optionally fails or blocks."""
+
+    def __init__(self):
+        self.upserts = []
+        self.documents = []
+        self.embeddings = {}
+        self.fail_on_call = None
+        self.block_first_upsert = None
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        if len(self.upserts) + 1 == self.fail_on_call:
+            raise RuntimeError("disco cheio")
+        if not self.upserts and self.block_first_upsert is not None:
+            # Released only if the next batch is encoded while this upsert runs
+            self.overlapped = self.block_first_upsert.wait(timeout=5)
+        assert len(ids) == len(embeddings) == len(documents) == len(metadatas)
+        self.documents.extend(documents)
+        self.embeddings.update(zip(documents, embeddings))
+        self.upserts.append([metadata["source_file"] for metadata in metadatas])
+
+    def count(self):
+        return sum(len(files) for files in self.upserts)
+
+
+class FakeClient:
+    def __init__(self, max_batch_size):
+        self.max_batch_size = max_batch_size
+        self.collection = FakeCollection()
+
+    def get_max_batch_size(self):
+        return self.max_batch_size
+
+    def delete_collection(self, name):
+        pass
+
+    def get_or_create_collection(self, name, metadata=None):
+        return self.collection
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = FakeClient(max_batch_size=4)
+    monkeypatch.setattr(semantic_encoder, "chromadb", SimpleNamespace(PersistentClient=lambda path: client))
+    return client
+
+
+def test_failed_init_releases_the_model(docs_dir, monkeypatch):
+    def broken_client(path):
+        raise RuntimeError("banco indisponível")
+
+    monkeypatch.setattr(semantic_encoder, "chromadb", SimpleNamespace(PersistentClient=broken_client))
+
+    with pytest.raises(RuntimeError, match="banco indisponível"):
+        _encoder(docs_dir, model_name="fake-broken-client")
+
+    key = semantic_encoder.model_key("fake-broken-client", semantic_encoder.DEFAULT_BACKEND)
+    assert model_registry.stats()[key]["refcount"] == 0
+
+
+def test_batches_are_clamped_to_client_max_batch_size(docs_dir, fake_client):
+    _write(docs_dir, "a.txt", 8)
+    _write(docs_dir, "b.txt", 3)
+    progress = []
+
+    encoder = _encoder(docs_dir, batch_size=256, progress_callback=progress.append)
+    try:
+        assert encoder.batch_size == 4
+        stats = encoder.build()
+    finally:
+        encoder.close()
+
+    upserts = fake_client.collection.upserts
+    per_file = {name: sum(files.count(name) for files in upserts) for name in ("a.txt", "b.txt")}
+    assert per_file["a.txt"] > 4
+    assert stats["chunks_salvos"] == sum(per_file.values())
+    # Full micro-batches per file, then the remainder; a batch never mixes files
+    for name, total in per_file.items():
+        sizes = [len(files) for files in upserts if files[0] == name]
+        assert all(set(files) == {name} for files in upserts if files[0] == name)
+        assert sizes == [4] * (total // 4) + ([total % 4] if total % 4 else [])
+
+    # One callback per micro-batch, with per-file and build-wide counts
+    assert len(progress) == len(upserts)
+    saved = 0
+    for event, files in zip(progress, upserts):
+        saved += len(files)
+        assert event["arquivo"] == files[0]
+        assert event["total_arquivo"] == per_file[files[0]]
+        assert event["chunks_salvos"] == saved
+    assert [event["chunks_arquivo"] for event in progress if event["arquivo"] == "a.txt"][-1] == per_file["a.txt"]
+
+
+def test_next_batch_is_encoded_during_upsert(docs_dir, fake_client):
+    _write(docs_dir, "a.txt", 8)
+    second_encode = threading.Event()
+    fake_client.collection.block_first_upsert = second_encode
+
+    encoder = _encoder(docs_dir)
+    encode = encoder._encode
+    calls = []
+
+    def encode_and_signal(batch):
+        calls.append(len(batch))
+        if len(calls) == 2:
+            second_encode.set()
+        return encode(batch)
+
+    try:
+        with patch.object(encoder, "_encode", side_effect=encode_and_signal):
+            encoder.build()
+    finally:
+        encoder.close()
+
+    assert len(calls) >= 2
+    assert fake_client.collection.overlapped
+
+
+def test_upsert_error_in_writer_reaches_build(docs_dir, fake_client):
+    _write(docs_dir, "a.txt", 8)
+    fake_client.collection.fail_on_call = 2
+
+    encoder = _encoder(docs_dir)
+    try:
+        with pytest.raises(RuntimeError, match="disco cheio"):
+            encoder.build()
+    finally:
+        encoder.close()
+
+    assert len(fake_client.collection.upserts) == 1
+
+
+def test_documents_are_upserted_as_they_are_converted(docs_dir, fake_client):
+    for name in ("a.txt", "b.txt", "c.txt"):
+        _write(docs_dir, name, 8)
+
+    encoder = _encoder(docs_dir)
+    iter_markdown = encoder.rf.iter_markdown
+    indexed_before = []
+
+    def streamed(paths):
+        # Files already upserted each time the build asks for the next document
+        for name, markdown in iter_markdown(paths):
+            indexed_before.append({file for files in fake_client.collection.upserts for file in files})
+            yield name, markdown
+
+    try:
+        with patch.object(encoder.rf, "iter_markdown", side_effect=streamed):
+            encoder.build()
+    finally:
+        encoder.close()
+
+    assert indexed_before[0] == set()
+    assert "a.txt" in indexed_before[1]
+    assert {"a.txt", "b.txt"} <= indexed_before[2]
+
+
+class FakeEncodePool:
+    """Stands in for EncodePool: encodes in-process and records each call."""
+
+    DEFAULT_BATCH_SIZE = 32
+    instances = []
+
+    def __init__(self, model, workers):
+        self.model = model
+        self.workers = workers
+        self.calls = []
+        FakeEncodePool.instances.append(self)
+
+    def encode(self, texts, lengths=None):
+        self.calls.append(list(texts))
+        return self.model.encode(texts)
+
+    def close(self):
+        pass
+
+
+def test_encode_pool_receives_several_documents_per_call(docs_dir, fake_client, monkeypatch):
+    for name in ("a.txt", "b.txt", "c.txt"):
+        _write(docs_dir, name, 5)
+    monkeypatch.setattr(semantic_encoder, "EncodePool", FakeEncodePool)
+    FakeEncodePool.instances = []
+
+    encoder = _encoder(docs_dir, encode_workers=2)
+    try:
+        encoder.build()
+    finally:
+        encoder.close()
+
+    [pool] = FakeEncodePool.instances
+    upserts = fake_client.collection.upserts
+    # Window of 2 workers * 4 shards * 32 texts covers all three files: one call
+    assert len(pool.calls) == 1
+    assert {file for files in upserts for file in files} == {"a.txt", "b.txt", "c.txt"}
+    assert len(pool.calls[0]) == sum(len(files) for files in upserts)
+    # Upserts stay per file and get the embeddings of their own texts
+    assert all(len(set(files)) == 1 for files in upserts)
+    for text, embedding in fake_client.collection.embeddings.items():
+        np.testing.assert_allclose(embedding, FakeModel().encode([text])[0])
+
+
+class CountingTokenizer:
+    """Fast-tokenizer stand-in: one token per word plus two special tokens; counts texts."""
+
+    is_fast = True
+
+    def __init__(self):
+        self.tokenized = []
+
+    def __call__(self, texts, add_special_tokens=True, **kwargs):
+        self.tokenized.extend(texts)
+        extra = 2 if add_special_tokens else 0
+        return {"input_ids": [[0] * (len(text.split()) + extra) for text in texts]}
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+
+class TokenizingFakeModel(FakeModel):
+    max_seq_length = 8
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.tokenizer = CountingTokenizer()
+
+
+def test_chunks_are_tokenized_once_for_truncation_and_buckets(docs_dir, fake_client, monkeypatch):
+    _write(docs_dir, "a.txt", 40)
+    monkeypatch.setattr(semantic_encoder, "SentenceTransformer", TokenizingFakeModel)
+
+    encoder = _encoder(docs_dir, batch_size=64, model_name="fake-tokenizing")
+    try:
+        stats = encoder.build()
+        tokenized = encoder.modelo.tokenizer.tokenized
+    finally:
+        encoder.close()
+
+    embedded = fake_client.collection.documents
+    assert len(embedded) > 32  # several buckets: the lengths were needed for bucketing
+    assert sorted(tokenized) == sorted(embedded)
+    words = sum(len(text.split()) for text in embedded)
+    assert stats["truncamento"]["tokens_total"] == words
+    assert stats["truncamento"]["tokens_truncados"] == sum(max(0, len(t.split()) - 6) for t in embedded)
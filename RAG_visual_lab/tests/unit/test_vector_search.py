@@ -0,0 +1,163 @@
+"""
+Unit Tests: Vector Search
+=========================
+
+Tests for the vectorized exact cosine search used by the RAG Clássico page,
+and for the Maximal Marginal Relevance selection used by RetrieverProvider.
+
+Test Strategy:
+    - Compare results against a brute-force reference implementation
+    - Validate ordering, top_k bounds and zero-norm handling
+    - MMR matches a per-candidate greedy loop and skips near-duplicates
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from utils.vector_search import (
+    CompressedVectorIndex,
+    VectorSearchIndex,
+    mmr_select,
+    normalize_rows,
+    quantize_int8,
+    top_k_indices,
+)
+
+
+def _brute_force(query, embeddings, top_k):
+    scores = []
+    for i, emb in enumerate(embeddings):
+        denom = np.linalg.norm(query) * np.linalg.norm(emb)
+        scores.append((i, 0.0 if denom == 0 else float(np.dot(query, emb) / denom)))
+    scores.sort(key=lambda item: item[1], reverse=True)
+    return scores[:top_k]
+
+
+def test_search_matches_brute_force():
+    """The vectorized search returns the same ranking as the per-chunk loop."""
+    rng = np.random.default_rng(42)
+    embeddings = rng.normal(size=(500, 32))
+    query = rng.normal(size=32)
+
+    index = VectorSearchIndex(embeddings)
+    indices, scores = index.search(query, top_k=10)
+
+    expected = _brute_force(query, embeddings, 10)
+    assert list(indices) == [i for i, _ in expected]
+    np.testing.assert_allclose(scores, [s for _, s in expected], rtol=1e-5)
+
+
+def test_top_k_larger_than_index_returns_everything_sorted():
+    """top_k above the number of vectors returns all of them, best first."""
+    scores = np.array([0.1, 0.9, 0.5])
+    assert list(top_k_indices(scores, 10)) == [1, 2, 0]
+    assert len(top_k_indices(scores, 0)) == 0
+
+
+def test_zero_norm_rows_score_zero():
+    """Zero vectors get similarity 0 instead of NaN."""
+    index = VectorSearchIndex(np.array([[0.0, 0.0], [1.0, 0.0]]))
+    indices, scores = index.search(np.array([1.0, 0.0]), top_k=2)
+
+    assert list(indices) == [1, 0]
+    assert scores[1] == 0.0
+    assert not np.isnan(normalize_rows(np.zeros((1, 3)))).any()
+
+
+def test_index_rejects_non_matrix():
+    """A 1-D array is not a valid embedding matrix."""
+    with pytest.raises(ValueError):
+        VectorSearchIndex(np.array([1.0, 2.0]))
+
+
+@pytest.mark.parametrize("dtype,max_ratio", [("float16", 0.5), ("int8", 0.27)])
+def test_compressed_index_rescoring_preserves_top_k(dtype, max_ratio):
+    """Compressed search plus full-precision rescoring returns the exact ranking."""
+    rng = np.random.default_rng(7)
+    embeddings = rng.normal(size=(2000, 64)).astype(np.float32)
+    queries = rng.normal(size=(20, 64))
+
+    exact = VectorSearchIndex(embeddings)
+    compressed = CompressedVectorIndex(embeddings, dtype=dtype, full_precision=embeddings)
+
+    assert compressed.nbytes <= exact.nbytes * max_ratio
+    for query in queries:
+        expected_indices, expected_scores = exact.search(query, top_k=10)
+        indices, scores = compressed.search(query, top_k=10)
+        assert list(indices) == list(expected_indices)
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+
+def test_compressed_index_without_rescoring_is_close():
+    rng = np.random.default_rng(1)
+    embeddings = rng.normal(size=(300, 32))
+    query = rng.normal(size=32)
+
+    compressed = CompressedVectorIndex(embeddings, dtype="int8")
+
+    np.testing.assert_allclose(compressed.scores(query), VectorSearchIndex(embeddings).scores(query), atol=0.02)
+    np.testing.assert_allclose(compressed.dequantize(), normalize_rows(embeddings), atol=0.01)
+
+
+def test_quantize_int8_roundtrip_and_zero_rows():
+    matrix = np.array([[0.5, -1.0, 0.25], [0.0, 0.0, 0.0]])
+
+    codes, scales = quantize_int8(matrix)
+
+    assert codes.dtype == np.int8 and np.abs(codes).max() == 127
+    np.testing.assert_allclose(codes * scales[:, None], matrix, atol=scales[0] / 2)
+    assert scales[1] == 0 and not codes[1].any()
+
+
+def test_compressed_index_validates_arguments():
+    with pytest.raises(ValueError):
+        CompressedVectorIndex(np.ones((2, 2)), dtype="int4")
+    with pytest.raises(ValueError):
+        CompressedVectorIndex(np.ones((2, 2)), full_precision=np.ones((3, 2)))
+
+
+def _mmr_reference(query, candidates, top_k, lambda_mult):
+    def cos(a, b):
+        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+    selected = []
+    remaining = list(range(len(candidates)))
+    while remaining and len(selected) < top_k:
+        def score(i):
+            redundancy = max((cos(candidates[i], candidates[j]) for j in selected), default=0.0)
+            if not selected:
+                return cos(query, candidates[i])
+            return lambda_mult * cos(query, candidates[i]) - (1 - lambda_mult) * redundancy
+        best = max(remaining, key=score)
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+@pytest.mark.parametrize("lambda_mult", [0.0, 0.3, 0.7, 1.0])
+def test_mmr_select_matches_greedy_reference(lambda_mult):
+    rng = np.random.default_rng(7)
+    candidates = rng.normal(size=(40, 16))
+    query = rng.normal(size=16)
+
+    selected = mmr_select(query, candidates, top_k=8, lambda_mult=lambda_mult)
+
+    assert selected.tolist() == _mmr_reference(query, candidates, 8, lambda_mult)
+
+
+def test_mmr_select_skips_near_duplicates():
+    query = np.array([1.0, 0.0, 0.0])
+    candidates = np.array([[1.0, 0.1, 0.0], [1.0, 0.11, 0.0], [0.8, 0.0, 0.6]])
+
+    assert mmr_select(query, candidates, top_k=2, lambda_mult=0.5).tolist() == [0, 2]
+    assert mmr_select(query, candidates, top_k=2, lambda_mult=1.0).tolist() == [0, 1]
+    assert mmr_select(query, candidates, top_k=1, relevance=np.array([0.1, 0.2, 1.0])).tolist() == [2]
+    assert mmr_select(query, candidates, top_k=10).shape == (3,)
+    assert mmr_select(query, np.empty((0, 3)), top_k=2).shape == (0,)
+    with pytest.raises(ValueError):
+        mmr_select(query, candidates, top_k=2, lambda_mult=1.5)
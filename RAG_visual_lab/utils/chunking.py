@@ -0,0 +1,381 @@
+"""
+Chunking
+========
+
+Divide textos em chunks com overlap sem exigir o texto inteiro em memória.
+
+A fonte pode ser uma string, um iterável de pedaços (str ou bytes), um
+arquivo aberto ou um mmap. Apenas uma janela de aproximadamente
+`chunk_size` caracteres (mais o último pedaço lido) fica em memória, então
+exports de markdown com centenas de megabytes podem ser divididos
+sem serem carregados por completo.
+
+É o motor único de chunking do projeto: `chunk_text` (páginas do
+RAG_visual_lab) e `chunks.Chunks` (SemanticEncoder e chunks_lab) delegam
+para `iter_chunks`. Cada chunk tenta terminar em um parágrafo ('\\n\\n') ou
+frase ('. ') nos últimos 30% da janela, ou em um espaço nos últimos 20%.
+
+Também há um modo por tokens (`iter_token_chunks`), que usa o tokenizer do
+modelo de embeddings para que nenhum chunk passe do limite de sequência do
+modelo (acima dele o texto é truncado e não contribui para o embedding).
+
+Benchmark de throughput: `python chunks_lab/benchmark_chunking.py`.
+"""
+
+import codecs
+import math
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+# Caracteres lidos por vez de arquivos e mmaps
+READ_BLOCK_SIZE = 64 * 1024
+
+TextSource = Union[str, bytes, Iterable[Union[str, bytes]], Any]
+
+
+class TextChunk(NamedTuple):
+    """Chunk com suas posições na fonte: fonte[start:end] == text."""
+
+    text: str
+    start: int
+    end: int
+
+
+def _iter_pieces(source: TextSource, encoding: str = "utf-8") -> Iterator[str]:
+    """
+    Normaliza a fonte em uma sequência de pedaços de texto.
+
+    Bytes (arquivos binários, mmaps, iteráveis de bytes) são decodificados de
+    forma incremental, então caracteres multibyte divididos entre dois blocos
+    são preservados.
+    """
+    if isinstance(source, str):
+        yield source
+        return
+
+    if isinstance(source, (bytes, bytearray)):
+        yield bytes(source).decode(encoding, errors="replace")
+        return
+
+    if hasattr(source, "read"):
+        blocks: Iterable[Union[str, bytes]] = iter(lambda: source.read(READ_BLOCK_SIZE), source.read(0))
+    else:
+        blocks = source
+
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    for block in blocks:
+        if isinstance(block, (bytes, bytearray, memoryview)):
+            block = decoder.decode(bytes(block))
+        if block:
+            yield block
+
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _break_offsets(chunk_size: int) -> Tuple[int, int]:
+    """
+    Menor deslocamento aceito para quebra em parágrafo/frase (últimos 30% da
+    janela) e em palavra (últimos 20%).
+    """
+    return math.floor(chunk_size * 0.7) + 1, math.floor(chunk_size * 0.8) + 1
+
+
+def _break_position(text: str, start: int, end: int, chunk_size: int) -> int:
+    """
+    Escolhe onde o chunk text[start:end] termina, preferindo quebras naturais.
+
+    As buscas usam rfind/find com limites diretamente sobre o texto: nenhuma
+    cópia da janela é criada e cada busca cobre só a faixa em que uma quebra
+    seria aceita.
+    """
+    min_sentence, min_space = _break_offsets(chunk_size)
+
+    # Tenta quebrar em parágrafo (dupla quebra de linha) nos últimos 30%
+    cut = text.rfind('\n\n', start + min_sentence, end)
+    if cut != -1:
+        return cut + 2
+
+    # Se não encontrou parágrafo, tenta quebrar em frase (ponto + espaço) nos últimos 30%
+    cut = text.rfind('. ', start + min_sentence, end)
+    if cut != -1:
+        return cut + 2
+
+    # Havendo frase fora dessa faixa, mantém o corte no tamanho máximo;
+    # senão tenta quebrar em palavra (espaço) nos últimos 20%
+    if text.find('. ', start, end) == -1:
+        cut = text.rfind(' ', start + min_space, end)
+        if cut != -1:
+            return cut + 1
+
+    return end
+
+
+def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    """Ajusta (start, end) para excluir os espaços das pontas."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _iter_text_chunks(text: str, chunk_size: int, overlap: int) -> Iterator[TextChunk]:
+    """
+    Caminho rápido para textos já em memória: sem buffer nem cópias da janela.
+
+    Repete as regras de _break_position/_strip_span em linha, pois é o laço
+    executado para cada chunk de todos os documentos.
+    """
+    text_length = len(text)
+    find, rfind = text.find, text.rfind
+    min_sentence, min_space = _break_offsets(chunk_size)
+    start = 0
+
+    while start < text_length:
+        end = start + chunk_size
+
+        # Se não é o último chunk, tenta quebrar em uma posição melhor
+        if end < text_length:
+            cut = rfind('\n\n', start + min_sentence, end)
+            if cut == -1:
+                cut = rfind('. ', start + min_sentence, end)
+            if cut != -1:
+                end = cut + 2
+            elif find('. ', start, end) == -1:
+                cut = rfind(' ', start + min_space, end)
+                if cut != -1:
+                    end = cut + 1
+        else:
+            end = text_length
+
+        chunk = text[start:end]
+        stripped = chunk.strip()
+        if stripped:  # Só gera se o chunk não estiver vazio
+            chunk_start = start + (len(chunk) - len(chunk.lstrip()) if chunk[0].isspace() else 0)
+            yield TextChunk(stripped, chunk_start, chunk_start + len(stripped))
+
+        if end >= text_length:
+            break
+
+        # Próximo início considerando o overlap; garante que sempre avança
+        start = max(end - overlap, start + 1)
+
+
+def iter_chunks(
+    source: TextSource,
+    chunk_size: int = 1200,
+    overlap: int = 100,
+    encoding: str = "utf-8",
+) -> Iterator[TextChunk]:
+    """
+    Gera os chunks da fonte sob demanda, com suas posições (em caracteres).
+
+    Args:
+        source: String, bytes, iterável de pedaços (str/bytes), arquivo aberto
+                (texto ou binário) ou mmap
+        chunk_size: Tamanho máximo de cada chunk (em caracteres)
+        overlap: Número de caracteres de overlap entre chunks
+        encoding: Codificação usada para decodificar fontes em bytes
+
+    Yields:
+        TextChunk(text, start, end), sem espaços nas pontas
+
+    Raises:
+        ValueError: Se chunk_size <= 0, overlap < 0 ou overlap >= chunk_size
+
+    Exemplo:
+        >>> with open("export.md", encoding="utf-8") as f:
+        ...     for chunk in iter_chunks(f, chunk_size=2000, overlap=200):
+        ...         print(chunk.start, chunk.end)
+    """
+    if chunk_size <= 0 or overlap < 0:
+        raise ValueError("chunk_size deve ser positivo e overlap não negativo")
+    if overlap >= chunk_size:
+        raise ValueError("overlap deve ser menor que chunk_size")
+
+    if isinstance(source, str):
+        yield from _iter_text_chunks(source, chunk_size, overlap)
+        return
+
+    pieces = _iter_pieces(source, encoding)
+    buffer = ""        # Janela do texto ainda necessária
+    offset = 0         # Posição absoluta de buffer[0]
+    exhausted = False
+    start = 0
+
+    while True:
+        # Lê até ter mais de chunk_size caracteres a partir de start (ou até o fim):
+        # assim sabemos se este é o último chunk
+        while not exhausted and offset + len(buffer) <= start + chunk_size:
+            piece = next(pieces, None)
+            if piece is None:
+                exhausted = True
+            else:
+                buffer += piece
+
+        available = offset + len(buffer)
+        if start >= available:
+            break
+
+        local = start - offset
+        end = start + chunk_size
+
+        # Se não é o último chunk, tenta quebrar em uma posição melhor
+        if end < available:
+            end = offset + _break_position(buffer, local, local + chunk_size, chunk_size)
+        else:
+            end = available
+
+        chunk_start, chunk_end = _strip_span(buffer, local, end - offset)
+        if chunk_start < chunk_end:  # Só gera se o chunk não estiver vazio
+            yield TextChunk(buffer[chunk_start:chunk_end], offset + chunk_start, offset + chunk_end)
+
+        if end >= available:
+            break
+
+        # Próximo início considerando o overlap; garante que sempre avança
+        start = max(end - overlap, start + 1)
+
+        # Descarta o texto já consumido. Só copia quando a parte descartada é
+        # maior que a restante, mantendo o custo total linear
+        consumed = start - offset
+        if consumed > len(buffer) - consumed:
+            buffer = buffer[consumed:]
+            offset = start
+
+
+
+# ==================== CHUNKING POR TOKENS ====================
+
+def _token_offsets(text: str, tokenizer: Any) -> List[Tuple[int, int]]:
+    """
+    Tokeniza o texto uma única vez e retorna as posições (início, fim) de cada token.
+
+    Exige um tokenizer "fast" (HuggingFace), o único que informa offsets.
+    """
+    if not getattr(tokenizer, "is_fast", True):
+        raise ValueError("O chunking por tokens exige um tokenizer fast (com offset_mapping)")
+
+    encoding = tokenizer(
+        text,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        return_attention_mask=False,
+        verbose=False,
+    )
+    return [tuple(offset) for offset in encoding["offset_mapping"]]
+
+
+def iter_token_chunks(
+    text: str,
+    tokenizer: Any,
+    max_tokens: int,
+    overlap_tokens: int = 0,
+) -> Iterator[TextChunk]:
+    """
+    Gera chunks com no máximo `max_tokens` tokens do tokenizer do modelo.
+
+    O texto é tokenizado uma vez e os offsets de cada token são reutilizados
+    para todas as janelas. Dentro de cada janela valem as mesmas quebras
+    naturais do modo por caracteres (parágrafo, frase, palavra).
+
+    Args:
+        text: Texto a dividir
+        tokenizer: Tokenizer fast do modelo (ex: SentenceTransformer(...).tokenizer)
+        max_tokens: Máximo de tokens por chunk (sem os tokens especiais)
+        overlap_tokens: Tokens de overlap entre chunks consecutivos
+
+    Yields:
+        TextChunk(text, start, end), com posições em caracteres
+
+    Raises:
+        ValueError: Se max_tokens <= 0, overlap_tokens < 0 ou overlap_tokens >= max_tokens
+    """
+    if max_tokens <= 0 or overlap_tokens < 0:
+        raise ValueError("max_tokens deve ser positivo e overlap_tokens não negativo")
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens deve ser menor que max_tokens")
+    if not text:
+        return
+
+    offsets = _token_offsets(text, tokenizer)
+    token_starts = [start for start, _ in offsets]
+    n_tokens = len(offsets)
+    first = 0
+
+    while first < n_tokens:
+        last = first + max_tokens  # Primeiro token fora da janela
+        start = offsets[first][0]
+
+        if last < n_tokens:
+            # A janela vai até o início do primeiro token que não cabe nela
+            limit = offsets[last][0]
+            end = _break_position(text, start, limit, limit - start)
+            # Tokens que começam antes do corte pertencem a este chunk
+            last = max(bisect_left(token_starts, end, first + 1), first + 1)
+        else:
+            end = len(text)
+
+        chunk_start, chunk_end = _strip_span(text, start, end)
+        if chunk_start < chunk_end:  # Só gera se o chunk não estiver vazio
+            yield TextChunk(text[chunk_start:chunk_end], chunk_start, chunk_end)
+
+        if last >= n_tokens:
+            break
+
+        # Próximo início considerando o overlap; garante que sempre avança.
+        # Recua até um token que inicia palavra: começar no meio de uma palavra
+        # faria o modelo retokenizá-la em mais tokens do que o previsto
+        previous, first = first, max(last - overlap_tokens, first + 1)
+        while first - 1 > previous and not _starts_word(text, offsets[first][0]):
+            first -= 1
+
+
+def _starts_word(text: str, position: int) -> bool:
+    return position == 0 or text[position - 1].isspace() or not text[position].isalnum()
+
+
+def truncation_report(
+    chunks: Sequence[str],
+    tokenizer: Any,
+    max_tokens: int,
+    lengths: Optional[Sequence[int]] = None
+) -> Dict[str, Any]:
+    """
+    Mede quanto do texto de cada chunk o modelo descartaria por truncamento.
+
+    Args:
+        chunks: Chunks a avaliar (ex: gerados no modo por caracteres)
+        tokenizer: Tokenizer do modelo
+        max_tokens: Tokens que o modelo efetivamente lê (sem os especiais)
+        lengths: Tokens de cada chunk (sem os especiais), se já foram contados.
+                 Default: os chunks são tokenizados aqui
+
+    Returns:
+        dict: chunks, chunks_truncados, tokens_total, tokens_truncados e
+        fracao_truncada (tokens truncados / tokens totais)
+    """
+    if lengths is not None:
+        lengths = [int(length) for length in lengths]
+    elif not chunks:
+        lengths = []
+    else:
+        encoding = tokenizer(
+            list(chunks),
+            add_special_tokens=False,
+            return_attention_mask=False,
+            verbose=False,
+        )
+        lengths = [len(ids) for ids in encoding["input_ids"]]
+
+    total = sum(lengths)
+    truncated = sum(max(0, length - max_tokens) for length in lengths)
+    return {
+        "chunks": len(lengths),
+        "chunks_truncados": sum(length > max_tokens for length in lengths),
+        "tokens_total": total,
+        "tokens_truncados": truncated,
+        "fracao_truncada": round(truncated / total, 4) if total else 0.0,
+    }
@@ -0,0 +1,179 @@
+"""
+Deduplicação de Chunks
+======================
+
+Remove chunks repetidos antes do embedding.
+
+PDFs de periódicos repetem cabeçalhos, rodapés e citações em todas as
+páginas; cada cópia custa um forward pass, ocupa espaço no índice e
+desperdiça posições do contexto na recuperação.
+
+Duas etapas:
+- Exata: hash SHA-1 do texto normalizado (minúsculas, só as palavras)
+- Quase-duplicatas: assinatura MinHash dos shingles de palavras, com LSH
+  (bandas) para encontrar candidatos sem comparar todos os pares. Um chunk é
+  descartado se a similaridade de Jaccard estimada com um chunk já aceito
+  for >= `threshold`.
+"""
+
+import hashlib
+import re
+import zlib
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Primo de Mersenne 2^61 - 1, usado nas permutações do MinHash
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def _choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Escolhe (bandas, linhas por banda) cujo limiar do LSH, (1/b)^(1/r), fica
+    logo abaixo de `threshold`: pares acima do limiar quase sempre viram candidatos.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+class ChunkDeduplicator:
+    """
+    Filtra duplicatas exatas e quase-duplicatas de uma sequência de chunks.
+
+    O estado é cumulativo: cada chunk é comparado com todos os aceitos
+    anteriormente pelo mesmo deduplicador.
+
+    Exemplo de uso:
+        >>> dedup = ChunkDeduplicator(threshold=0.9)
+        >>> unique = dedup.filter(chunks_doc_1) + dedup.filter(chunks_doc_2)
+        >>> dedup.stats()["quase_duplicados"]
+        12
+    """
+
+    DEFAULT_THRESHOLD = 0.9
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        num_perm: int = 64,
+        shingle_size: int = 5,
+        seed: int = 1,
+    ):
+        """
+        Args:
+            threshold: Similaridade de Jaccard (0-1] a partir da qual um chunk é
+                       quase-duplicata. 1.0 mantém apenas a etapa exata
+            num_perm: Número de permutações do MinHash (precisão da estimativa)
+            shingle_size: Palavras por shingle
+            seed: Semente das permutações
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold deve estar no intervalo (0, 1]")
+        if num_perm <= 0 or shingle_size <= 0:
+            raise ValueError("num_perm e shingle_size devem ser positivos")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+
+        rng = np.random.RandomState(seed)
+        # a, b < 2^32 e hashes < 2^32: a * h + b cabe em 64 bits sem overflow
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self._exact: set = set()
+        self._signatures: List[np.ndarray] = []
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self._counts = {"chunks_gerados": 0, "duplicados_exatos": 0, "quase_duplicados": 0}
+
+    def filter(self, chunks: Sequence[str]) -> List[str]:
+        """Retorna os chunks que não duplicam nenhum chunk já aceito (ordem preservada)."""
+        return [chunk for chunk in chunks if self.add(chunk)]
+
+    def add(self, chunk: str) -> bool:
+        """
+        Registra o chunk se ele for novo.
+
+        Returns:
+            bool: True se o chunk foi aceito, False se é duplicata
+        """
+        self._counts["chunks_gerados"] += 1
+        words = _WORD_PATTERN.findall(chunk.lower())
+
+        digest = hashlib.sha1(" ".join(words).encode("utf-8")).digest()
+        if digest in self._exact:
+            self._counts["duplicados_exatos"] += 1
+            return False
+
+        signature = None
+        if self.threshold < 1:
+            signature = self._minhash(words)
+            if self._has_near_duplicate(signature):
+                self._counts["quase_duplicados"] += 1
+                return False
+
+        self._exact.add(digest)
+        if signature is not None:
+            self._index(signature)
+        return True
+
+    def clear_index(self) -> None:
+        """Esquece os chunks já aceitos, mantendo os contadores de stats()."""
+        self._exact.clear()
+        self._signatures.clear()
+        self._buckets = [{} for _ in range(self.bands)]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            dict: chunks_gerados, duplicados_exatos, quase_duplicados e chunks_unicos
+        """
+        removed = self._counts["duplicados_exatos"] + self._counts["quase_duplicados"]
+        return {**self._counts, "chunks_unicos": self._counts["chunks_gerados"] - removed}
+
+    def _minhash(self, words: List[str]) -> np.ndarray:
+        size = self.shingle_size
+        if len(words) <= size:
+            shingles = {" ".join(words)}
+        else:
+            shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # Uma permutação por linha: (a * h + b) mod p, e o mínimo sobre os shingles
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def _has_near_duplicate(self, signature: np.ndarray) -> bool:
+        checked: set = set()
+        for band, key in self._band_keys(signature):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                # Fração de posições iguais estima a similaridade de Jaccard
+                if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                    return True
+        return False
+
+    def _index(self, signature: np.ndarray) -> None:
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        for band, key in self._band_keys(signature):
+            self._buckets[band].setdefault(key, []).append(position)
+
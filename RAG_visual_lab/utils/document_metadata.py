@@ -0,0 +1,128 @@
+"""
+Metadados de Documentos
+=======================
+
+Informações por chunk gravadas pelo SemanticEncoder e usadas para restringir
+buscas (parâmetro `where` do RetrieverProvider):
+
+- Título do documento: primeiro cabeçalho markdown ("# Título") ou, sem
+  cabeçalho, o nome do arquivo sem extensão
+- Intervalo de páginas: o conversor de PDF separa as páginas com form feed
+  ("\\f"); a página de uma posição do texto é o número de quebras antes dela
+  mais um. Documentos sem quebras (Office, imagens e PDFs com formulários)
+  não têm páginas
+
+matches_where avalia, sobre um dict de metadados, o mesmo subconjunto de
+filtros `where` do ChromaDB, para os armazenamentos que não são o ChromaDB
+(índice flat).
+"""
+
+import os
+import re
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional, Tuple
+
+PAGE_BREAK = "\f"
+MAX_TITLE_LENGTH = 200
+
+_HEADING_PATTERN = re.compile(r"^#{1,6}[ \t]+(.+?)[ \t#]*$", re.MULTILINE)
+
+_COMPARISONS = {
+    "$eq": lambda value, target: value == target,
+    "$ne": lambda value, target: value != target,
+    "$gt": lambda value, target: value > target,
+    "$gte": lambda value, target: value >= target,
+    "$lt": lambda value, target: value < target,
+    "$lte": lambda value, target: value <= target,
+    "$in": lambda value, target: value in target,
+    "$nin": lambda value, target: value not in target,
+}
+
+
+def document_title(text: str, file: str) -> str:
+    """
+    Título do documento: o primeiro cabeçalho markdown ou o nome do arquivo.
+
+    Exemplo:
+        >>> document_title("# Direitos Fundamentais\\n\\nArt. 5º...", "cf88.pdf")
+        'Direitos Fundamentais'
+        >>> document_title("Texto sem cabeçalho", "2111.01888v1.pdf")
+        '2111.01888v1'
+    """
+    match = _HEADING_PATTERN.search(text or "")
+    title = match.group(1).strip() if match else ""
+    return (title or os.path.splitext(os.path.basename(file))[0])[:MAX_TITLE_LENGTH]
+
+
+def page_breaks(text: str) -> List[int]:
+    """Posições das quebras de página do texto (vazia se o documento não tem páginas)."""
+    return [match.start() for match in re.finditer(PAGE_BREAK, text or "")]
+
+
+def page_range(breaks: List[int], start: int, end: int) -> Optional[Tuple[int, int]]:
+    """
+    Páginas (numeradas a partir de 1) do trecho [start, end) do texto.
+
+    Args:
+        breaks: Resultado de page_breaks para o texto
+        start, end: Posições do chunk no texto (TextChunk.start/end)
+
+    Returns:
+        tuple[int, int] | None: (primeira, última) página; None sem quebras
+    """
+    if not breaks:
+        return None
+    first = bisect_right(breaks, start) + 1
+    last = bisect_right(breaks, max(start, end - 1)) + 1
+    return first, last
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    Avalia um filtro `where` no formato do ChromaDB sobre os metadados de um chunk.
+
+    Suporta igualdade direta ({"campo": valor}), os operadores $eq, $ne, $gt,
+    $gte, $lt, $lte, $in e $nin, e as combinações $and/$or. Um campo ausente
+    nunca satisfaz a condição (como no ChromaDB).
+
+    Raises:
+        ValueError: Se o filtro usar um operador desconhecido
+
+    Exemplo:
+        >>> matches_where({"source_file": "cf88.pdf", "page_start": 12},
+        ...               {"$and": [{"source_file": "cf88.pdf"}, {"page_start": {"$gte": 10}}]})
+        True
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key.startswith("$"):
+            raise ValueError(f"Operador lógico desconhecido no filtro: '{key}'")
+        elif not _matches_field(metadata, key, condition):
+            return False
+    return True
+
+
+def _matches_field(metadata: Dict[str, Any], key: str, condition: Any) -> bool:
+    if key not in metadata:
+        return False
+    value = metadata[key]
+    if not isinstance(condition, dict):
+        return value == condition
+    for operator, target in condition.items():
+        comparison = _COMPARISONS.get(operator)
+        if comparison is None:
+            raise ValueError(f"Operador desconhecido no filtro: '{operator}'")
+        try:
+            if not comparison(value, target):
+                return False
+        except TypeError:
+            # Tipos incomparáveis (ex.: texto >= número) não satisfazem o filtro
+            return False
+    return True
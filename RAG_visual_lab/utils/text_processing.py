@@ -14,6 +14,8 @@ from typing import Optional, Any
 from io import BytesIO
 import streamlit as st
 
+from utils.chunking import iter_chunks
+
 
 def extract_text_from_file(uploaded_file: Any) -> Optional[str]:
     """
@@ -108,52 +110,8 @@ def chunk_text(
         st.error(f"Configuração de Chunking Inválida: O 'Overlap' ({overlap}) deve ser menor que o 'Tamanho do Chunk' ({chunk_size}).")
         return []
 
-    chunks = []
-    start = 0
-    text_length = len(text)
-    
-    while start < text_length:
-        # Define o final do chunk atual
-        end = start + chunk_size
-        
-        # Se não é o último chunk, tenta quebrar em uma posição melhor
-        if end < text_length:
-            # Procura por quebras naturais próximas ao final do chunk
-            chunk_section = text[start:end]
-            
-            # Tenta quebrar em parágrafo (dupla quebra de linha)
-            last_paragraph = chunk_section.rfind('\n\n')
-            if last_paragraph > len(chunk_section) * 0.7:  # Se encontrou um parágrafo nos últimos 30%
-                end = start + last_paragraph + 2
-            
-            # Se não encontrou parágrafo, tenta quebrar em frase (ponto + espaço)
-            elif '. ' in chunk_section:
-                last_sentence = chunk_section.rfind('. ')
-                if last_sentence > len(chunk_section) * 0.7:  # Se encontrou uma frase nos últimos 30%
-                    end = start + last_sentence + 2
-            
-            # Se não encontrou frase, tenta quebrar em palavra (espaço)
-            elif ' ' in chunk_section:
-                last_space = chunk_section.rfind(' ')
-                if last_space > len(chunk_section) * 0.8:  # Se encontrou um espaço nos últimos 20%
-                    end = start + last_space + 1
-        
-        # Extrai o chunk atual
-        chunk = text[start:end].strip()
-        if chunk:  # Só adiciona se o chunk não estiver vazio
-            chunks.append(chunk)
-        
-        # Calcula a próxima posição inicial considerando o overlap
-        if end >= text_length:
-            break
-        
-        start = end - overlap
-        
-        # Garante que não voltamos para trás demais
-        if start < 0:
-            start = 0
-    
-    return chunks
+    # Para textos muito grandes (arquivos, mmaps) use utils.chunking.iter_chunks
+    return [chunk.text for chunk in iter_chunks(text, chunk_size, overlap)]
 
 
 def count_tokens_approximate(text: str) -> int:
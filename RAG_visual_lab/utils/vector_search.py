@@ -0,0 +1,335 @@
+"""
+Busca Vetorial
+==============
+
+Busca exata por similaridade cosseno sobre uma matriz de embeddings em memória.
+
+A matriz é normalizada uma única vez na construção do índice; cada consulta
+custa então um único produto matriz-vetor seguido de uma seleção parcial
+(argpartition) dos Top-K, em vez de calcular as normas e ordenar todos os
+chunks a cada busca.
+
+CompressedVectorIndex guarda a matriz em float16 ou int8 (com uma escala por
+vetor), 2x a 4x menor que float32 e 4x a 8x menor que float64. A busca roda
+sobre a matriz comprimida e os melhores candidatos são reordenados com os
+vetores em precisão total, que podem ficar em disco (np.memmap).
+
+mmr_select escolhe, entre os candidatos de uma busca, um subconjunto
+relevante e diverso (Maximal Marginal Relevance): chunks sobrepostos quase
+idênticos não ocupam várias posições do top-k.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Normaliza cada linha para norma unitária (float32).
+
+    Linhas de norma zero permanecem zeradas, resultando em similaridade 0.
+
+    Args:
+        matrix: Matriz (n, d) ou vetor (d,)
+
+    Returns:
+        Cópia normalizada em float32 com o mesmo shape
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Retorna os índices dos `top_k` maiores scores, em ordem decrescente.
+
+    Usa argpartition (O(n)) e ordena apenas os K selecionados.
+
+    Args:
+        scores: Vetor de scores (n,)
+        top_k: Quantidade de índices a retornar
+
+    Returns:
+        Array de índices ordenados do maior para o menor score
+    """
+    n = scores.shape[0]
+    top_k = min(top_k, n)
+    if top_k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    if top_k < n:
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(n)
+
+    # Ordenação estável para manter a ordem original em caso de empate
+    order = np.argsort(-scores[candidates], kind="stable")
+    return candidates[order]
+
+
+def top_k_indices_batch(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Versão em lote de top_k_indices: os `top_k` maiores scores de cada linha.
+
+    Args:
+        scores: Matriz de scores (n_queries, n)
+        top_k: Quantidade de índices por linha
+
+    Returns:
+        Matriz (n_queries, min(top_k, n)) de índices, cada linha em ordem decrescente
+    """
+    n = scores.shape[1]
+    top_k = min(top_k, n)
+    if top_k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.intp)
+
+    if top_k < n:
+        candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def mmr_select(
+    query_embedding: np.ndarray,
+    candidate_embeddings: np.ndarray,
+    top_k: int,
+    lambda_mult: float = 0.5,
+    relevance: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Seleciona `top_k` candidatos por Maximal Marginal Relevance.
+
+    A cada passo escolhe o candidato que maximiza
+    lambda * sim(query, c) - (1 - lambda) * max(sim(c, já escolhidos)),
+    com similaridade cosseno. As similaridades entre candidatos são calculadas
+    em um único produto de matrizes e o máximo em relação aos escolhidos é
+    atualizado incrementalmente, então cada passo é O(n).
+
+    Args:
+        query_embedding: Vetor da query (d,)
+        candidate_embeddings: Matriz (n, d) dos candidatos
+        top_k: Quantidade de candidatos a selecionar
+        lambda_mult: 1.0 = só relevância (ordem da busca); 0.0 = só diversidade
+        relevance: Relevância de cada candidato (n,), no lugar da similaridade
+                   com a query (ex: score da busca híbrida normalizado em [0, 1])
+
+    Returns:
+        Índices dos selecionados, na ordem de seleção
+
+    Exemplo:
+        >>> mmr_select(q, np.stack([a, a_copia, b]), top_k=2, lambda_mult=0.5)
+        array([0, 2])
+    """
+    if not 0.0 <= lambda_mult <= 1.0:
+        raise ValueError("lambda_mult deve estar entre 0 e 1")
+    candidates = normalize_rows(np.asarray(candidate_embeddings, dtype=np.float32))
+    n = candidates.shape[0]
+    top_k = min(top_k, n)
+    if top_k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    if relevance is None:
+        relevance = candidates @ normalize_rows(np.asarray(query_embedding, dtype=np.float32))
+    relevance = np.asarray(relevance, dtype=np.float32)
+    similarity = candidates @ candidates.T
+    max_similarity = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected = np.empty(top_k, dtype=np.intp)
+
+    for step in range(top_k):
+        if step == 0:
+            scores = relevance.copy()
+        else:
+            scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected[step] = best
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantização escalar simétrica por linha: linha ≈ codes * scale.
+
+    Args:
+        matrix: Matriz (n, d)
+
+    Returns:
+        Tupla (codes int8 (n, d), scales float32 (n,)), com |codes| <= 127
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127.0 if matrix.size else np.zeros(len(matrix), dtype=np.float32)
+    safe = np.where(scales > 0, scales, 1.0)
+    codes = np.rint(matrix / safe[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class VectorSearchIndex:
+    """
+    Índice de busca exata por similaridade cosseno.
+
+    Exemplo de uso:
+        >>> index = VectorSearchIndex(np.array(embeddings))
+        >>> indices, scores = index.search(query_embedding, top_k=5)
+    """
+
+    def __init__(self, embeddings: np.ndarray):
+        """
+        Args:
+            embeddings: Matriz (n_chunks, dim) com os embeddings dos chunks
+        """
+        embeddings = np.asarray(embeddings)
+        if embeddings.ndim != 2:
+            raise ValueError("embeddings deve ser uma matriz 2D (n_chunks, dim)")
+
+        self.matrix = normalize_rows(embeddings)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """Memória ocupada pela matriz do índice."""
+        return self.matrix.nbytes
+
+    def scores(self, query_embedding: np.ndarray) -> np.ndarray:
+        """Similaridade cosseno da query com todos os vetores do índice."""
+        query = normalize_rows(np.asarray(query_embedding).reshape(-1))
+        return self.matrix @ query
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Busca os `top_k` vetores mais similares à query.
+
+        Args:
+            query_embedding: Embedding da query (dim,)
+            top_k: Número de resultados
+
+        Returns:
+            Tupla (índices, scores), ambos ordenados do mais similar ao menos similar
+        """
+        scores = self.scores(query_embedding)
+        indices = top_k_indices(scores, top_k)
+        return indices, scores[indices]
+
+
+class CompressedVectorIndex:
+    """
+    Índice de busca por similaridade cosseno sobre vetores comprimidos.
+
+    Os vetores normalizados são guardados em float16 ou em int8 com uma
+    escala por vetor. A busca seleciona `rescore_factor * top_k` candidatos
+    com os scores aproximados e, se `full_precision` for fornecida, recalcula
+    os scores desses candidatos com os vetores originais: a ordem do Top-K é
+    a mesma da busca exata sempre que os verdadeiros Top-K estão entre os
+    candidatos.
+
+    Exemplo de uso:
+        >>> full = np.load("embeddings.npy", mmap_mode="r")  # float32 em disco
+        >>> index = CompressedVectorIndex(full, dtype="int8", full_precision=full)
+        >>> indices, scores = index.search(query_embedding, top_k=5)
+        >>> index.nbytes / (full.shape[0] * full.shape[1] * 4)
+        0.26
+    """
+
+    DTYPES = ("float16", "int8")
+    BLOCK_ROWS = 8192
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        dtype: str = "int8",
+        full_precision: Optional[np.ndarray] = None,
+        rescore_factor: int = 4,
+    ):
+        """
+        Args:
+            embeddings: Matriz (n_chunks, dim) com os embeddings dos chunks
+            dtype: "float16" ou "int8" (com escala por vetor)
+            full_precision: Vetores originais usados para reordenar os candidatos
+                            (ex: np.memmap); None usa apenas os scores comprimidos
+            rescore_factor: Candidatos por resultado reordenados em precisão total
+        """
+        embeddings = np.asarray(embeddings)
+        if embeddings.ndim != 2:
+            raise ValueError("embeddings deve ser uma matriz 2D (n_chunks, dim)")
+        if dtype not in self.DTYPES:
+            raise ValueError(f"dtype deve ser um de {self.DTYPES}, recebido: '{dtype}'")
+        if rescore_factor < 1:
+            raise ValueError("rescore_factor deve ser >= 1")
+        if full_precision is not None and full_precision.shape != embeddings.shape:
+            raise ValueError("full_precision deve ter o mesmo shape de embeddings")
+
+        self.dtype = dtype
+        self.full_precision = full_precision
+        self.rescore_factor = rescore_factor
+
+        normalized = normalize_rows(embeddings)
+        if dtype == "int8":
+            self.codes, self.scales = quantize_int8(normalized)
+        else:
+            self.codes, self.scales = normalized.astype(np.float16), None
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.codes.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """Memória ocupada pelo índice (sem os vetores em precisão total)."""
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def dequantize(self) -> np.ndarray:
+        """Matriz normalizada aproximada, em float32 (ex: para visualização)."""
+        matrix = self.codes.astype(np.float32)
+        if self.scales is not None:
+            matrix *= self.scales[:, None]
+        return matrix
+
+    def scores(self, query_embedding: np.ndarray) -> np.ndarray:
+        """Similaridade cosseno aproximada da query com todos os vetores do índice."""
+        query = normalize_rows(np.asarray(query_embedding).reshape(-1))
+        scores = np.empty(len(self), dtype=np.float32)
+        # Converte um bloco por vez: nunca há uma cópia float32 da matriz inteira
+        for start in range(0, len(self), self.BLOCK_ROWS):
+            block = self.codes[start:start + self.BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Busca os `top_k` vetores mais similares à query.
+
+        Args:
+            query_embedding: Embedding da query (dim,)
+            top_k: Número de resultados
+
+        Returns:
+            Tupla (índices, scores), ambos ordenados do mais similar ao menos similar.
+            Com full_precision, os scores são exatos
+        """
+        scores = self.scores(query_embedding)
+        if self.full_precision is None:
+            indices = top_k_indices(scores, top_k)
+            return indices, scores[indices]
+
+        candidates = np.sort(top_k_indices(scores, top_k * self.rescore_factor))
+        exact = VectorSearchIndex(self.full_precision[candidates]).scores(query_embedding)
+        best = top_k_indices(exact, top_k)
+        return candidates[best], exact[best]
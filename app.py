@@ -52,7 +52,11 @@ if query := st.chat_input("Digite sua pergunta..."):
             generation = Generation(model="gemini-2.5-flash-lite")
             
             # A parte "R" do RAG
-            result = retriever.search(query, n_results=10, show_metadata=False)
+            # (o modelo e o cliente ficam no registro do processo entre mensagens)
+            try:
+                result = retriever.search(query, n_results=10, show_metadata=False)
+            finally:
+                retriever.close()
 
             # A parte "A" do RAG
             prompt = augmentation.generate_prompt(query, result)
@@ -0,0 +1,221 @@
+# arquivo benchmark_embeddings.py
+
+"""
+Benchmark dos backends de embedding (torch, onnx, onnx-int8) nos PDFs de docs/.
+
+Para cada backend mede:
+- tempo de carga do modelo (inclui a exportação int8 na primeira execução)
+- latência de uma query (p50/p95, batch de 1, como na busca das páginas)
+- throughput de indexação (chunks/s, como no SemanticEncoder.build)
+- concordância com o torch: cosseno médio entre os vetores e sobreposição
+  do top-k recuperado para as mesmas queries
+
+Com --batching compara, no primeiro backend, três formas de montar os
+batches dos micro-batches do SemanticEncoder: ordem de chegada, ordenação
+por caracteres (a do SentenceTransformer) e buckets por tokens
+(services.embedding_batching). Mostra o padding (tokens processados /
+tokens reais) e o throughput de cada uma. O throughput dos buckets por
+tokens já desconta a tokenização extra usada para medir os comprimentos,
+que também é informada à parte.
+
+Uso:
+    python benchmark_embeddings.py --backends torch onnx onnx-int8 --top-k 10
+    python benchmark_embeddings.py --batching --backends torch
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parent
+sys.path.append(str(ROOT_DIR / "RAG_visual_lab"))
+
+from chunks import Chunks
+from services.embedding_backend import BACKENDS, load_sentence_transformer
+from services.embedding_batching import encode_bucketed, length_buckets, token_lengths
+from utils.vector_search import VectorSearchIndex
+
+DOCS_DIR = ROOT_DIR / "docs"
+DEFAULT_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+
+
+def load_pdf_chunks(docs_dir: Path, chunk_size: int, overlap_size: int) -> List[str]:
+    """Extrai o texto dos PDFs com PyPDF2 e divide em chunks como o SemanticEncoder."""
+    from PyPDF2 import PdfReader  # type: ignore
+
+    chunker = Chunks(chunk_size=chunk_size, overlap_size=overlap_size)
+    chunks: List[str] = []
+    for pdf_path in sorted(docs_dir.glob("**/*.pdf")):
+        reader = PdfReader(str(pdf_path))
+        text = "\n\n".join(page.extract_text() or "" for page in reader.pages)
+        chunks.extend(chunker.create_chunks(text))
+    return chunks
+
+
+def sample_queries(chunks: List[str], count: int, seed: int = 0) -> List[str]:
+    """Usa a primeira frase de chunks sorteados como queries."""
+    rng = random.Random(seed)
+    picked = rng.sample(chunks, min(count, len(chunks)))
+    return [chunk.split(". ")[0][:200] for chunk in picked]
+
+
+def percentile_ms(timings: List[float], q: float) -> float:
+    return float(np.percentile(timings, q) * 1000)
+
+
+def run_backend(model_name: str, backend: str, chunks: List[str], queries: List[str], batch_size: int) -> Dict:
+    start = time.perf_counter()
+    model = load_sentence_transformer(model_name, backend)
+    load_time = time.perf_counter() - start
+
+    model.encode(queries[:2])  # aquecimento
+
+    latencies = []
+    query_embeddings = []
+    for query in queries:
+        start = time.perf_counter()
+        query_embeddings.append(model.encode([query])[0])
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    chunk_embeddings = model.encode(chunks, batch_size=batch_size)
+    encode_time = time.perf_counter() - start
+
+    return {
+        "load_s": load_time,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "chunks_por_s": len(chunks) / encode_time,
+        "queries": np.asarray(query_embeddings, dtype=np.float32),
+        "chunks": np.asarray(chunk_embeddings, dtype=np.float32),
+    }
+
+
+def mean_cosine(a: np.ndarray, b: np.ndarray) -> float:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return float(np.mean(np.sum(a * b, axis=1)))
+
+
+def topk_overlap(reference: Dict, result: Dict, top_k: int) -> float:
+    """Fração média do top-k do torch que o backend também recupera."""
+    ref_index = VectorSearchIndex(reference["chunks"])
+    index = VectorSearchIndex(result["chunks"])
+    overlaps = []
+    for ref_query, query in zip(reference["queries"], result["queries"]):
+        ref_ids = ref_index.search(ref_query, top_k)[0]
+        ids = index.search(query, top_k)[0]
+        overlaps.append(len(set(ref_ids) & set(ids)) / len(ref_ids))
+    return float(np.mean(overlaps))
+
+
+def batching_plans(chunks: List[str], lengths: np.ndarray, micro_batch: int, batch_size: int) -> Dict:
+    """Índices de cada forward pass, por estratégia, micro-batch a micro-batch."""
+    plans: Dict[str, List[np.ndarray]] = {"chegada": [], "caracteres": [], "tokens": []}
+    for start in range(0, len(chunks), micro_batch):
+        indices = np.arange(start, min(start + micro_batch, len(chunks)))
+        chars = [len(chunks[i]) for i in indices]
+        plans["chegada"] += [indices[i:i + batch_size] for i in range(0, len(indices), batch_size)]
+        plans["caracteres"] += [indices[b] for b in length_buckets(chars, batch_size)]
+        plans["tokens"] += [indices[b] for b in length_buckets(lengths[indices], batch_size)]
+    return plans
+
+
+def compare_batching(model, chunks: List[str], micro_batch: int, batch_size: int, repeat: int) -> None:
+    lengths = token_lengths(model, chunks)
+    plans = batching_plans(chunks, lengths, micro_batch, batch_size)
+    micro_batches = [chunks[i:i + micro_batch] for i in range(0, len(chunks), micro_batch)]
+
+    runs = {
+        "chegada": lambda: [model.encode([chunks[i] for i in b], batch_size=len(b)) for b in plans["chegada"]],
+        "caracteres": lambda: [model.encode(mb, batch_size=batch_size) for mb in micro_batches],
+        "tokens": lambda: [encode_bucketed(model, mb, batch_size) for mb in micro_batches],
+    }
+
+    # Custo extra dos buckets por tokens: o encode tokeniza os textos de novo
+    tokenize_timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for mb in micro_batches:
+            token_lengths(model, mb)
+        tokenize_timings.append(time.perf_counter() - start)
+
+    print(f"\n{'estratégia':>10} | {'padding':>7} | {'chunks/s':>8}")
+    baseline = None
+    tokens_time = None
+    for name, run in runs.items():
+        padded = sum(len(b) * int(lengths[b].max()) for b in plans[name])
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        throughput = len(chunks) / min(timings)
+        baseline = baseline or throughput
+        if name == "tokens":
+            tokens_time = min(timings)
+        print(f"{name:>10} | {padded / lengths.sum():>6.2f}x | {throughput:>8.1f} ({throughput / baseline:.2f}x)")
+
+    tokenize_time = min(tokenize_timings)
+    print(
+        f"\nTokenização para medir os comprimentos: {tokenize_time:.3f}s "
+        f"({tokenize_time / tokens_time:.1%} do tempo de 'tokens', já incluída no seu throughput)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark dos backends de embedding nos PDFs de docs/")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--overlap-size", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=100, help="Queries sorteadas dos chunks")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--batching", action="store_true", help="Compara as estratégias de batching")
+    parser.add_argument("--micro-batch", type=int, default=256, help="Micro-batch do SemanticEncoder")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por estratégia (usa o menor tempo)")
+    args = parser.parse_args()
+
+    print(f"== Extraindo e dividindo os PDFs em {DOCS_DIR} ==")
+    chunks = load_pdf_chunks(DOCS_DIR, args.chunk_size, args.overlap_size)
+
+    if args.batching:
+        model = load_sentence_transformer(args.model, args.backends[0])
+        print(f"{len(chunks)} chunks, backend '{args.backends[0]}', batch {args.batch_size}")
+        compare_batching(model, chunks, args.micro_batch, args.batch_size, args.repeat)
+        return
+
+    queries = sample_queries(chunks, args.queries)
+    print(f"{len(chunks)} chunks, {len(queries)} queries, {os.cpu_count()} CPUs\n")
+
+    results = {}
+    for backend in args.backends:
+        print(f"⏱️ Backend '{backend}'...")
+        results[backend] = run_backend(args.model, backend, chunks, queries, args.batch_size)
+
+    reference = results.get("torch")
+    print(f"\n{'backend':>10} | {'carga (s)':>9} | {'p50 (ms)':>8} | {'p95 (ms)':>8} | {'chunks/s':>8} | "
+          f"{'cosseno':>7} | top-{args.top_k}")
+    for backend, result in results.items():
+        agreement = "-"
+        cosine = "-"
+        if reference is not None and backend != "torch":
+            cosine = f"{mean_cosine(reference['chunks'], result['chunks']):.4f}"
+            agreement = f"{topk_overlap(reference, result, args.top_k):.1%}"
+        print(
+            f"{backend:>10} | {result['load_s']:>9.1f} | {result['p50_ms']:>8.1f} | {result['p95_ms']:>8.1f} | "
+            f"{result['chunks_por_s']:>8.1f} | {cosine:>7} | {agreement}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,32 @@
+# arquivo chunks.py
+
+import os
+import sys
+
+# Motor de chunking único, compartilhado com o RAG_visual_lab (utils/chunking.py)
+_lab_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "RAG_visual_lab")
+if _lab_dir not in sys.path:
+    sys.path.append(_lab_dir)
+
+from utils.chunking import iter_chunks as _iter_text_chunks
+from utils.chunking import iter_token_chunks, truncation_report
+
+
 class Chunks:
-    def __init__(self, chunk_size=5000, overlap_size=1000):
+    """
+    Divide textos em chunks com sobreposição.
+    
+    Por padrão chunk_size e overlap_size são medidos em caracteres. Com um
+    `tokenizer` (modo por tokens) eles passam a ser medidos em tokens do
+    modelo de embeddings; use Chunks.for_model para cortar os chunks no
+    limite de sequência do modelo, sem texto truncado no encode.
+    """
+    
+    def __init__(self, chunk_size=5000, overlap_size=1000, tokenizer=None):
 
         self.chunk_size = chunk_size
         self.overlap_size = overlap_size
+        self.tokenizer = tokenizer
         
         # Validação básica
         if self.overlap_size >= self.chunk_size:
@@ -10,92 +34,123 @@ class Chunks:
         if self.chunk_size <= 0 or self.overlap_size < 0:
             raise ValueError("Tamanhos devem ser valores positivos")
     
+    @classmethod
+    def for_model(cls, model, overlap_size=0, chunk_size=None):
+        """
+        Cria um chunker por tokens limitado ao max_seq_length do modelo.
+        
+        Args:
+            model: SentenceTransformer (usa model.tokenizer e model.max_seq_length)
+            overlap_size: Tokens de sobreposição entre chunks
+            chunk_size: Tokens por chunk (default e máximo: o limite do modelo)
+        
+        Quando chunk_size passa do limite do modelo, o overlap é reduzido na
+        mesma proporção (ex.: 2000/500 com limite de 126 tokens vira 126/31),
+        mantendo a fração de sobreposição pedida.
+        
+        Raises:
+            ValueError: Se o overlap não couber no chunk (informa os dois valores)
+        """
+        max_tokens = cls.model_max_tokens(model)
+        requested = chunk_size or max_tokens
+        chunk_size = min(requested, max_tokens)
+        if requested > chunk_size:
+            overlap_size = overlap_size * chunk_size // requested
+        if overlap_size >= chunk_size:
+            raise ValueError(
+                f"overlap_size ({overlap_size} tokens) deve ser menor que chunk_size "
+                f"({chunk_size} tokens, limite do modelo: {max_tokens})"
+            )
+        return cls(chunk_size=chunk_size, overlap_size=overlap_size, tokenizer=model.tokenizer)
+    
+    @staticmethod
+    def model_max_tokens(model):
+        """Tokens de texto que o modelo lê por entrada (max_seq_length sem os tokens especiais)."""
+        tokenizer = model.tokenizer
+        special = tokenizer.num_special_tokens_to_add() if hasattr(tokenizer, "num_special_tokens_to_add") else 2
+        return model.max_seq_length - special
+    
+    @property
+    def unit(self):
+        return "tokens" if self.tokenizer is not None else "chars"
+    
     def create_chunks(self, text):
 
         if not text or not isinstance(text, str):
             return []
         
-        chunks = []
-        start = 0
-        text_length = len(text)
-        
-        while start < text_length:
-            # Define o final do chunk atual
-            end = start + self.chunk_size
-            
-            # Se não é o último chunk, tenta quebrar em uma posição melhor
-            if end < text_length:
-                # Procura por quebras naturais próximas ao final do chunk
-                chunk_text = text[start:end]
-                
-                # Tenta quebrar em parágrafo (dupla quebra de linha)
-                last_paragraph = chunk_text.rfind('\n\n')
-                if last_paragraph > len(chunk_text) * 0.7:  # Se encontrou um parágrafo nos últimos 30%
-                    end = start + last_paragraph + 2
-                
-                # Se não encontrou parágrafo, tenta quebrar em frase (ponto + espaço)
-                elif '. ' in chunk_text:
-                    last_sentence = chunk_text.rfind('. ')
-                    if last_sentence > len(chunk_text) * 0.7:  # Se encontrou uma frase nos últimos 30%
-                        end = start + last_sentence + 2
-                
-                # Se não encontrou frase, tenta quebrar em palavra (espaço)
-                elif ' ' in chunk_text:
-                    last_space = chunk_text.rfind(' ')
-                    if last_space > len(chunk_text) * 0.8:  # Se encontrou um espaço nos últimos 20%
-                        end = start + last_space + 1
-            
-            # Extrai o chunk atual
-            chunk = text[start:end].strip()
-            if chunk:  # Só adiciona se o chunk não estiver vazio
-                chunks.append(chunk)
-            
-            # Calcula a próxima posição inicial considerando o overlay
-            if end >= text_length:
-                break
-            
-            start = end - self.overlap_size
-            
-            # Garante que não voltamos para trás demais
-            if start < 0:
-                start = 0
-        
-        return chunks
+        return [chunk.text for chunk in self.iter_chunks(text)]
+    
+    def iter_chunks(self, source):
+        """
+        Gera os chunks sob demanda como TextChunk(text, start, end).
+        
+        Usa o mesmo motor de chunk_text (utils/chunking.py no RAG_visual_lab).
+        
+        Aceita string, iterável de pedaços, arquivo aberto ou mmap e mantém em
+        memória apenas uma janela do tamanho do chunk, então serve para
+        arquivos grandes demais para create_chunks.
+        
+        No modo por tokens o texto é tokenizado de uma vez, então `source`
+        deve ser uma string.
+        
+        Exemplo:
+            >>> with open("export.md", encoding="utf-8") as f:
+            ...     for chunk in Chunks(2000, 500).iter_chunks(f):
+            ...         salvar(chunk.text, chunk.start, chunk.end)
+        """
+        if self.tokenizer is not None:
+            if not isinstance(source, str):
+                raise TypeError("O modo por tokens aceita apenas texto (str)")
+            return iter_token_chunks(source, self.tokenizer, self.chunk_size, self.overlap_size)
+        return _iter_text_chunks(source, self.chunk_size, self.overlap_size)
+    
+    def truncation_report(self, chunks, model, lengths=None):
+        """
+        Quantos tokens dos chunks o modelo truncaria (útil no modo por caracteres).
+        
+        Args:
+            lengths: Tokens de cada chunk com os especiais, se já foram contados
+                     (ex: token_lengths(model, chunks, truncate=False)). Evita
+                     tokenizar os chunks mais uma vez
+        
+        Returns:
+            dict: chunks, chunks_truncados, tokens_total, tokens_truncados, fracao_truncada
+        """
+        max_tokens = self.model_max_tokens(model)
+        if lengths is not None:
+            special = model.max_seq_length - max_tokens
+            lengths = [max(0, int(length) - special) for length in lengths]
+        return truncation_report(chunks, model.tokenizer, max_tokens, lengths=lengths)
     
     def create_chunks_with_metadata(self, text, source_info=None):
-        chunks = self.create_chunks(text)
+        if not text or not isinstance(text, str):
+            return []
+        
+        chunks = list(self.iter_chunks(text))
         
         chunks_with_metadata = []
         for i, chunk in enumerate(chunks):
             chunk_metadata = {
                 'chunk_id': i,
-                'chunk_text': chunk,
-                'chunk_size': len(chunk),
+                'chunk_text': chunk.text,
+                'chunk_size': len(chunk.text),
                 'total_chunks': len(chunks),
-                'chunk_start_char': self._calculate_start_position(chunks, i),
+                'chunk_start_char': chunk.start,
+                'chunk_end_char': chunk.end,
                 'source_info': source_info or {}
             }
             chunks_with_metadata.append(chunk_metadata)
         
         return chunks_with_metadata
     
-    def _calculate_start_position(self, chunks, chunk_index):
-        if chunk_index == 0:
-            return 0
-        
-        # Estimativa baseada no tamanho dos chunks anteriores menos os overlays
-        estimated_position = 0
-        for i in range(chunk_index):
-            estimated_position += len(chunks[i]) - self.overlap_size
-        
-        return max(0, estimated_position)
-    
     def get_chunk_info(self):
         
         return {
             'chunk_size': self.chunk_size,
             'overlap_size': self.overlap_size,
-            'effective_chunk_step': self.chunk_size - self.overlap_size
+            'effective_chunk_step': self.chunk_size - self.overlap_size,
+            'unit': self.unit
         }
     
     def update_settings(self, chunk_size=None, overlap_size=None):
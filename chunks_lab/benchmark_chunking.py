@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# Permite importar chunks.py mesmo executando o script dentro de chunks_lab
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from chunks import Chunks
+
+DOCS_DIR = ROOT_DIR / "docs"
+
+
+def legacy_create_chunks(text: str, chunk_size: int, overlap_size: int) -> List[str]:
+    """
+    Algoritmo anterior (cópia de Chunks.create_chunks/chunk_text), mantido aqui
+    apenas como referência: copia a janela a cada chunk e a varre até duas vezes.
+    """
+    chunks = []
+    start = 0
+    text_length = len(text)
+
+    while start < text_length:
+        end = start + chunk_size
+
+        if end < text_length:
+            chunk_text = text[start:end]
+
+            last_paragraph = chunk_text.rfind('\n\n')
+            if last_paragraph > len(chunk_text) * 0.7:
+                end = start + last_paragraph + 2
+            elif '. ' in chunk_text:
+                last_sentence = chunk_text.rfind('. ')
+                if last_sentence > len(chunk_text) * 0.7:
+                    end = start + last_sentence + 2
+            elif ' ' in chunk_text:
+                last_space = chunk_text.rfind(' ')
+                if last_space > len(chunk_text) * 0.8:
+                    end = start + last_space + 1
+
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+
+        if end >= text_length:
+            break
+
+        start = max(end - overlap_size, 0)
+
+    return chunks
+
+
+def load_pdf_texts(docs_dir: Path) -> Dict[str, str]:
+    """Extrai o texto dos PDFs de docs/ com PyPDF2 (mesmo extrator do chunks_lab)."""
+    from PyPDF2 import PdfReader  # type: ignore
+
+    texts = {}
+    for pdf_path in sorted(docs_dir.glob("**/*.pdf")):
+        reader = PdfReader(str(pdf_path))
+        texts[pdf_path.name] = "\n\n".join(page.extract_text() or "" for page in reader.pages)
+    return texts
+
+
+def best_time(func: Callable[[], object], repeat: int) -> float:
+    """Menor tempo (em segundos) entre `repeat` execuções."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de throughput do chunking nos PDFs de docs/")
+    parser.add_argument("--repeat", type=int, default=5, help="Execuções por cenário (usa o menor tempo)")
+    args = parser.parse_args()
+
+    print(f"== Extraindo texto dos PDFs em {DOCS_DIR} ==")
+    texts = load_pdf_texts(DOCS_DIR)
+    corpus = list(texts.values())
+    total_chars = sum(len(text) for text in corpus)
+    print(f"{len(corpus)} PDFs, {total_chars / 1e6:.2f} M caracteres\n")
+
+    print(f"{'chunk/overlap':>14} | {'legado (MB/s)':>13} | {'motor (MB/s)':>12} | {'streaming (MB/s)':>16} | speedup")
+    for chunk_size, overlap_size in [(500, 100), (1200, 100), (2000, 500), (5000, 1000)]:
+        chunker = Chunks(chunk_size=chunk_size, overlap_size=overlap_size)
+
+        # Os três caminhos devem produzir exatamente os mesmos chunks
+        for text in corpus:
+            expected = legacy_create_chunks(text, chunk_size, overlap_size)
+            assert chunker.create_chunks(text) == expected
+            assert [c.text for c in chunker.iter_chunks(text[i:i + 4096] for i in range(0, len(text), 4096))] == expected
+
+        legacy = best_time(lambda: [legacy_create_chunks(t, chunk_size, overlap_size) for t in corpus], args.repeat)
+        engine = best_time(lambda: [chunker.create_chunks(t) for t in corpus], args.repeat)
+        streaming = best_time(
+            lambda: [list(chunker.iter_chunks(t[i:i + 4096] for i in range(0, len(t), 4096))) for t in corpus],
+            args.repeat,
+        )
+
+        mb = total_chars / 1e6
+        print(
+            f"{chunk_size:>6}/{overlap_size:<7} | {mb / legacy:>13.1f} | {mb / engine:>12.1f} | "
+            f"{mb / streaming:>16.1f} | {legacy / engine:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
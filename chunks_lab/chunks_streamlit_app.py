@@ -138,13 +138,14 @@ def build_metadata_dataframe(metadata: List[Dict[str, Any]]) -> pd.DataFrame:
     """Prepara DataFrame com colunas normalizadas do metadata."""
 
     if not metadata:
-        return pd.DataFrame(columns=["chunk_id", "chunk_size", "chunk_start_char"])
+        return pd.DataFrame(columns=["chunk_id", "chunk_size", "chunk_start_char", "chunk_end_char"])
 
     normalized = [
         {
             "chunk_id": entry.get("chunk_id"),
             "chunk_size": entry.get("chunk_size"),
             "chunk_start_char": entry.get("chunk_start_char"),
+            "chunk_end_char": entry.get("chunk_end_char"),
             "total_chunks": entry.get("total_chunks"),
             "preview": entry.get("chunk_text", "")[:80] + "...",
         }
@@ -336,7 +337,7 @@ if run_button:
                                                 sx={"mt": 1},
                                             ):
                                                 mui_module.Chip(
-                                                    label=f"Início estimado: {meta['chunk_start_char']}"
+                                                    label=f"Posição: {meta['chunk_start_char']}–{meta['chunk_end_char']}"
                                                 )
                                                 mui_module.Chip(
                                                     label=f"Total de chunks: {meta['total_chunks']}"
@@ -2,6 +2,13 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+import hashlib
+import threading
+
+import markitdown
 from markitdown import MarkItDown
 
 from google import genai
@@ -83,100 +90,331 @@ class GeminiWrapper:
 
 client = GeminiWrapper(gemini_client)
 
+DOCUMENT_EXTENSIONS = {
+    'pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx',
+    'csv', 'txt', 'json', 'xml', 'html', 'htm', 'yaml',
+}
+
+IMAGE_EXTENSIONS = {
+    'jpg', 'png', 'jpeg', 'gif', 'bmp', 'webp', 'svg', 'tiff', 'ico',
+}
+
+MARKDOWN_DIR = os.path.join(os.path.dirname(__file__), "markdown")
+CONVERSION_CACHE_DIR = os.path.join(MARKDOWN_DIR, ".cache")
+
+IMAGE_LLM_MODEL = "gemini-2.5-flash"
+IMAGE_LLM_PROMPT = "Em 3 parágrafos, descreva a imagem detalhadamente em pt-br"
+
+
+def hash_file(file_path):
+    """SHA-256 do conteúdo do arquivo, lido em blocos de 1 MB."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _converter_settings(extension):
+    """Configuração do conversor que, se alterada, invalida o markdown em cache."""
+    version = getattr(markitdown, "__version__", "unknown")
+    if extension in IMAGE_EXTENSIONS:
+        return f"markitdown={version}|model={IMAGE_LLM_MODEL}|prompt={IMAGE_LLM_PROMPT}"
+    return f"markitdown={version}"
+
+
+class ConversionCache:
+    """
+    Cache em disco do markdown convertido, indexado pelo hash do arquivo de
+    origem mais a configuração do conversor (versão, modelo e prompt).
+
+    Evita reconverter (e pagar novamente a descrição de imagens pelo Gemini)
+    documentos que não mudaram. Quando o tamanho total passa de `max_bytes`,
+    as entradas menos usadas recentemente (pelo mtime) são removidas.
+    """
+
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+
+    def __init__(self, cache_dir=CONVERSION_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._sizes = {
+            entry.name: entry.stat().st_size
+            for entry in os.scandir(self.cache_dir)
+            if entry.is_file() and entry.name.endswith(".md")
+        }
+
+    @staticmethod
+    def make_key(file_hash, settings):
+        return hashlib.sha256(f"{file_hash}\x00{settings}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Retorna o markdown em cache ou None."""
+        path = os.path.join(self.cache_dir, key + ".md")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        os.utime(path)  # marca como usado recentemente
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key, text):
+        """Armazena o markdown (escrita atômica) e aplica o limite de tamanho."""
+        name = key + ".md"
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._sizes[name] = os.path.getsize(path)
+            self._evict_locked(keep=name)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._sizes),
+                "bytes": sum(self._sizes.values()),
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+    def _evict_locked(self, keep):
+        total = sum(self._sizes.values())
+        if total <= self.max_bytes:
+            return
+
+        def mtime(name):
+            try:
+                return os.path.getmtime(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                return 0.0
+
+        for name in sorted(self._sizes, key=mtime):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= self._sizes.pop(name)
+            self.evictions += 1
+
+
+def _with_header(md_file, text):
+    """Prefixa o markdown com o cabeçalho que identifica o arquivo de origem."""
+    return f"\n\n{'='*80}\nARQUIVO: {md_file}\n{'='*80}\n\n{text}"
+
+
+def _is_current(path, text):
+    """Verdadeiro se o arquivo já contém exatamente `text`."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read() == text
+    except (FileNotFoundError, UnicodeDecodeError):
+        return False
+
+
+def _completed(value):
+    """Future já resolvido (conversões síncronas e hits de cache)."""
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def _new_document_converter():
+    return MarkItDown(enable_plugins=True)
+
+
+def _new_image_converter():
+    return MarkItDown(llm_client=client,
+                      llm_model=IMAGE_LLM_MODEL,
+                      llm_prompt=IMAGE_LLM_PROMPT,
+                      enable_plugins=True)
+
+
+# Conversor reutilizado por cada processo do pool (criado no initializer)
+_worker_converter = None
+
+
+def _init_document_worker():
+    global _worker_converter
+    _worker_converter = _new_document_converter()
+
+
+def _convert_document_in_worker(file_path):
+    return _worker_converter.convert(file_path).text_content
+
+
 class ReadFiles:
-    def __init__(self):
-        pass
+    """
+    Converte documentos e imagens para markdown usando MarkItDown.
+
+    Parâmetros:
+    - max_workers (int): processos para converter PDF/Office em paralelo.
+      1 (default) converte sequencialmente; None usa todos os núcleos.
+    - image_workers (int): threads para as imagens descritas pelo Gemini
+      (chamadas de rede, limitadas para não estourar a cota da API).
+    - use_cache (bool): reutiliza o markdown de arquivos já convertidos
+      (cache em markdown/.cache, indexado pelo hash do arquivo).
+    - cache_max_bytes (int): tamanho máximo do cache de conversão.
+    """
+
+    def __init__(self, max_workers=1, image_workers=4, use_cache=True,
+                 cache_max_bytes=ConversionCache.DEFAULT_MAX_BYTES):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.image_workers = max(1, image_workers)
+        self.cache = ConversionCache(max_bytes=cache_max_bytes) if use_cache else None
+        self._document_converter = None
+        self._local = threading.local()
+    
+    @staticmethod
+    def is_supported(file_name):
+        extension = file_name.split('.')[-1]
+        return extension in DOCUMENT_EXTENSIONS or extension in IMAGE_EXTENSIONS
     
     def docs_to_markdown(self, dir_path):
         
         png = self.read_dir(dir_path)
-        processed_files = []  # Track files processed in this run
-
-        for file in png:
-            
-            file_path = os.path.join(dir_path, file)
+        file_paths = [os.path.join(dir_path, file) for file in png]
         
-            # quero que vc leia o file e diga qual o tipo do arquivo (pdf, doc, docx, image e ect)
-            extension = file.split('.')[-1] 
-            
-            if extension == 'pdf' or \
-            extension == 'doc' or \
-            extension == 'docx' or \
-            extension == "xls" or \
-            extension == "xlsx" or \
-            extension == "ppt" or \
-            extension == "pptx" or \
-            extension == "csv" or \
-            extension == "txt" or \
-            extension == "json" or \
-            extension == "xml" or \
-            extension == "html" or \
-            extension == "htm" or \
-            extension == "yaml": 
-                
-                md = MarkItDown(enable_plugins=True)
-                
-                result = md.convert(file_path)
-                            
-            elif extension == 'jpg' or \
-                extension == 'png' or \
-                extension == 'jpeg' or \
-                extension == 'gif' or \
-                extension == 'bmp' or \
-                extension == 'webp' or \
-                extension == 'svg' or \
-                extension == 'tiff' or \
-                extension == 'ico':
-                
-                md = MarkItDown(llm_client=client,
-                                llm_model="gemini-2.5-flash",
-                                llm_prompt="""Em 3 parágrafos, 
-                                descreva a imagem detalhadamente em 
-                                pt-br""",
-                                enable_plugins=True)
-                
-                result = md.convert(file_path)
-                
-            else:
-                continue  # Skip unsupported file types
-                
-            # SALVE O RESULTADO EM UM ARQUIVO MD NA PASTA MARKDOWN
-            # O nome do arquivo em "file.split" pode conter mais de um ponto
-            # por exemplo: 2111.01888v1.pdf
-            # entao o nome do arquivo md deve ser: 2111.01888v1.md
-            # No código abaixo vc deve pegar no split o último ponto
-            # e usar ele para criar o nome do arquivo md
-            # por exemplo: 2111.01888v1.pdf
-            # o último ponto é o ".pdf"
-            # entao o nome do arquivo md deve ser: 2111.01888v1.md
-            
-
-            # Remove apenas a última extensão (após o último ponto)
-            filename_without_ext = os.path.splitext(file)[0]
-            markdown_dir = os.path.join(os.path.dirname(__file__), "markdown")
-            md_path = os.path.join(markdown_dir, filename_without_ext + ".md")
-            
-            # se não existir a pasta markdown, crie
-            if not os.path.exists(markdown_dir):
-                os.makedirs(markdown_dir)
-            
+        # Junta o conteúdo dos arquivos processados nesta execução
+        # (para corpora grandes prefira iter_markdown, que não concatena tudo)
+        return "".join(md_content for _, md_content in self.iter_markdown(file_paths))
+    
+    def iter_markdown(self, file_paths):
+        """
+        Converte os arquivos e gera (nome_do_arquivo, markdown) um documento por vez.
+        
+        No máximo max_workers documentos ficam em conversão/memória ao mesmo
+        tempo, então o consumo de memória não depende do tamanho do corpus.
+        O markdown vem com o cabeçalho "ARQUIVO: <nome>.md" de docs_to_markdown.
+        Arquivos de tipo não suportado são ignorados.
+        """
+        file_paths = [p for p in file_paths if self.is_supported(os.path.basename(p))]
+        window = max(1, self.max_workers)
+        
+        with self._executors(file_paths) as executors:
+            pending = deque()
+            for file_path in file_paths:
+                pending.append((file_path, *self._submit(file_path, *executors)))
+                if len(pending) >= window:
+                    yield self._finish_as_markdown(*pending.popleft())
+            while pending:
+                yield self._finish_as_markdown(*pending.popleft())
+    
+    @contextmanager
+    def _executors(self, file_paths):
+        """Cria os pools de conversão (processos para documentos, threads para imagens)."""
+        extensions = [os.path.basename(p).split('.')[-1] for p in file_paths]
+        n_documents = sum(ext in DOCUMENT_EXTENSIONS for ext in extensions)
+        n_images = len(extensions) - n_documents
+        parallel = self.max_workers > 1
+        
+        process_pool = None
+        if parallel and n_documents > 1:
+            process_pool = ProcessPoolExecutor(
+                max_workers=min(self.max_workers, n_documents),
+                initializer=_init_document_worker,
+            )
+        image_pool = ThreadPoolExecutor(max_workers=self.image_workers if parallel else 1) if n_images else None
+        
+        try:
+            yield process_pool, image_pool
+        finally:
+            for pool in (process_pool, image_pool):
+                if pool is not None:
+                    pool.shutdown(wait=True, cancel_futures=True)
+    
+    def _submit(self, file_path, process_pool, image_pool):
+        """
+        Inicia a conversão de um arquivo suportado.
+        
+        Returns:
+            tuple: (Future com o markdown, chave do cache a gravar ou None em caso de hit)
+        """
+        extension = os.path.basename(file_path).split('.')[-1]
+        
+        cache_key = None
+        if self.cache is not None:
+            cache_key = ConversionCache.make_key(hash_file(file_path), _converter_settings(extension))
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return _completed(cached), None
+        
+        if extension in IMAGE_EXTENSIONS:
+            # Imagens esperam pela rede: vão para o pool de threads
+            return image_pool.submit(self._convert_image, file_path), cache_key
+        if process_pool is not None:
+            return process_pool.submit(_convert_document_in_worker, file_path), cache_key
+        return _completed(self._convert_document(file_path)), cache_key
+    
+    def _finish(self, file_path, future, cache_key):
+        """Aguarda a conversão, grava cache e markdown. Retorna (nome do .md, texto)."""
+        text = future.result()
+        if cache_key is not None:
+            self.cache.put(cache_key, text)
+        return self._save_markdown(os.path.basename(file_path), text), text
+    
+    def _finish_as_markdown(self, file_path, future, cache_key):
+        md_file, text = self._finish(file_path, future, cache_key)
+        return os.path.basename(file_path), _with_header(md_file, text)
+    
+    def cache_stats(self):
+        """Estatísticas do cache de conversão (hits, misses, bytes, entradas, despejos)."""
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.stats()}
+    
+    def _convert_document(self, file_path):
+        if self._document_converter is None:
+            self._document_converter = _new_document_converter()
+        return self._document_converter.convert(file_path).text_content
+    
+    def _convert_image(self, file_path):
+        # Uma instância por thread: MarkItDown não é garantidamente thread-safe
+        converter = getattr(self._local, "image_converter", None)
+        if converter is None:
+            converter = self._local.image_converter = _new_image_converter()
+        return converter.convert(file_path).text_content
+    
+    def _save_markdown(self, file, text_content):
+        # SALVE O RESULTADO EM UM ARQUIVO MD NA PASTA MARKDOWN
+        # O nome do arquivo pode conter mais de um ponto, por exemplo:
+        # 2111.01888v1.pdf -> 2111.01888v1.md
+        # Remove apenas a última extensão (após o último ponto)
+        filename_without_ext = os.path.splitext(file)[0]
+        md_path = os.path.join(MARKDOWN_DIR, filename_without_ext + ".md")
+        
+        # se não existir a pasta markdown, crie
+        if not os.path.exists(MARKDOWN_DIR):
+            os.makedirs(MARKDOWN_DIR)
+        
+        # Em um hit do cache o .md normalmente já está atualizado: não reescreve
+        if not _is_current(md_path, text_content):
             with open(md_path, "w", encoding="utf-8") as f:
-                f.write(result.text_content)
-            
-            processed_files.append(filename_without_ext + ".md")
-            
-        # LER APENAS O CONTEUDO DOS ARQUIVOS PROCESSADOS NESTA EXECUÇÃO
-        md_content = ""
-        
-        markdown_dir = os.path.join(os.path.dirname(__file__), "markdown")
-        for md_file in processed_files:
-            with open(os.path.join(markdown_dir, md_file), "r", encoding="utf-8") as f:
-                md_content += f"\n\n{'='*80}\n"
-                md_content += f"ARQUIVO: {md_file}\n"
-                md_content += f"{'='*80}\n\n"
-                md_content += f.read()
-        
-        return md_content
+                f.write(text_content)
+        
+        return filename_without_ext + ".md"
     
     def read_dir(self, dir_path):
         
@@ -9,6 +9,16 @@ _root_dir = _current_dir
 if _root_dir not in sys.path:
     sys.path.insert(0, _root_dir)
 
+# Registro de modelos/clientes compartilhado com o RAG_visual_lab
+_lab_dir = os.path.join(_root_dir, "RAG_visual_lab")
+if _lab_dir not in sys.path:
+    sys.path.append(_lab_dir)
+
+from services.model_registry import acquire_client, acquire_model, release_client, release_model
+from services.embedding_cache import encode_with_cache
+
+MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+
 # Obter o diretório do script atual
 script_dir = os.path.dirname(os.path.abspath(__file__))
 chroma_db_path = os.path.join(script_dir, "RAG_visual_lab", "chroma_db")
@@ -31,15 +41,16 @@ class Retriever:
         self._initialize()
     
     def _initialize(self):
-        """Inicializa o cliente ChromaDB e carrega o modelo."""
+        """Inicializa o cliente ChromaDB e carrega o modelo (reutilizados entre instâncias)."""
         try:
             # Conectar ao ChromaDB
-            self.client = chromadb.PersistentClient(path=self.db_path)
+            self.client = acquire_client(
+                self.db_path, lambda: chromadb.PersistentClient(path=self.db_path)
+            )
             self.collection = self.client.get_collection(name=self.collection_name)
             
             # Carregar modelo de embeddings
-            print("Carregando modelo de embeddings...")
-            self.modelo = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+            self.modelo = acquire_model(MODEL_NAME, self._load_model)
             
             print(f"✅ Conectado à coleção '{self.collection_name}'")
             print(f"📊 Total de documentos: {self.collection.count()}")
@@ -49,6 +60,20 @@ class Retriever:
             print("Certifique-se de que o banco ChromaDB foi criado executando rag_classic.py primeiro.")
             sys.exit(1)
     
+    def _load_model(self):
+        print("Carregando modelo de embeddings...")
+        return SentenceTransformer(MODEL_NAME)
+    
+    def close(self):
+        """Libera o modelo e o cliente no registro do processo."""
+        if self.modelo is not None:
+            release_model(MODEL_NAME)
+            self.modelo = None
+        if self.client is not None:
+            release_client(self.db_path)
+            self.client = None
+        self.collection = None
+    
     def search(self, query_text, n_results=5, show_metadata=False):
         """
         Busca documentos similares à query.
@@ -62,8 +87,8 @@ class Retriever:
             dict: Resultados da busca
         """
         try:
-            # Gerar embedding da query
-            query_embedding = self.modelo.encode([query_text])
+            # Gerar embedding da query (queries repetidas vêm do cache)
+            query_embedding = encode_with_cache(self.modelo, MODEL_NAME, [query_text])
             
             # Buscar no ChromaDB
             results = self.collection.query(
@@ -9,12 +9,64 @@ _root_dir = _current_dir
 if _root_dir not in sys.path:
     sys.path.insert(0, _root_dir)
 
+# Registro de modelos/clientes compartilhado com o RAG_visual_lab
+_lab_dir = os.path.join(_root_dir, "RAG_visual_lab")
+if _lab_dir not in sys.path:
+    sys.path.append(_lab_dir)
+
 from chunks import Chunks
-from read_files import ReadFiles
+from read_files import ReadFiles, hash_file
 from sentence_transformers import SentenceTransformer
 import chromadb
-import uuid
-from typing import Any, Dict, List, Optional, cast
+import hashlib
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, cast
+from services.bm25_index import bm25_index_path, build_bm25_index
+from services.embedding_backend import DEFAULT_BACKEND, load_sentence_transformer, model_key, validate_backend
+from services.embedding_batching import encode_bucketed, has_fast_tokenizer, token_lengths
+from services.embedding_pool import EncodePool, resolve_workers, window_size
+from services.flat_index import export_flat_index, flat_index_path
+from services.model_registry import acquire_client, acquire_model, release_client, release_model
+from utils.deduplication import ChunkDeduplicator
+from utils.document_metadata import document_title, page_breaks, page_range
+
+
+class _BatchWriter:
+    """
+    Executa as gravações no ChromaDB em uma thread dedicada, na ordem de envio.
+
+    No máximo uma gravação fica pendente: submit() espera a anterior terminar,
+    então o batch N é embedado enquanto o batch N-1 é gravado, e apenas esses
+    dois batches ficam em memória.
+    """
+
+    def __init__(self) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._pending: Optional[Future] = None
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        self.wait()
+        self._pending = self._pool.submit(fn, *args, **kwargs)
+
+    def wait(self) -> None:
+        """Aguarda a gravação pendente, propagando seu erro."""
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            pending.result()
+
+    def __enter__(self) -> "_BatchWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                self.wait()
+        finally:
+            self._pool.shutdown(wait=True)
 
 
 class SemanticEncoder:
@@ -23,12 +75,57 @@ class SemanticEncoder:
 
     Parâmetros:
     - docs_dir (str): diretório onde estão os documentos
-    - chunk_size (int): tamanho de cada chunk
+    - chunk_size (int): tamanho de cada chunk (na unidade de chunk_unit)
     - overlap_size (int): tamanho da sobreposição entre chunks
     - db_path (str): caminho do banco ChromaDB (default: "./chroma_db")
     - collection_name (str): nome da coleção no ChromaDB (default: "documentos_rag")
+    - model_name (str): modelo SentenceTransformer (default: "paraphrase-multilingual-MiniLM-L12-v2")
+    - conversion_workers (int): processos para converter os documentos (default: 1; None = todos os núcleos)
+    - batch_size (int): chunks por micro-batch de embedding/upsert (default: 256),
+      limitado ao tamanho máximo de batch aceito pelo ChromaDB
+    - progress_callback (callable): chamado após cada micro-batch com um dict
+      {"arquivo", "chunks_arquivo", "total_arquivo", "chunks_salvos"}
+    - chunk_unit (str): "chars" (default) ou "tokens". Em "tokens" os tamanhos
+      são medidos com o tokenizer do modelo e o chunk_size é limitado ao
+      max_seq_length (o overlap_size é reduzido na mesma proporção), então
+      nenhum texto é truncado no encode. Em "chars" o
+      build informa quantos tokens o modelo truncou (estatística "truncamento")
+    - dedup_threshold (float): chunks duplicados (hash exato) ou quase duplicados
+      (MinHash, Jaccard >= dedup_threshold) são descartados antes do embedding
+      (default: 0.9; None desativa). Contagens na estatística "deduplicacao"
+    - backend (str): backend de inferência do modelo: "torch" (default), "onnx"
+      ou "onnx-int8" (pesos quantizados, mais rápido em CPU). Ver
+      services.embedding_backend
+    - encode_workers (int): processos que geram os embeddings durante o build
+      (default: 1, no próprio processo; None = todos os núcleos). Com mais de
+      um, os chunks de cada micro-batch são ordenados por tamanho e divididos
+      entre os processos (services.embedding_pool)
+    - lexical_index (bool): ao fim de cada build, grava o índice BM25 da coleção
+      em <db_path>/bm25/<coleção> para o modo híbrido do RetrieverProvider
+      (default: True). Estatística "indice_bm25"
+
+    Metadados de cada chunk: chunk_id, chunk_size, source (diretório),
+    source_file, title (primeiro cabeçalho do documento ou nome do arquivo),
+    ingested_at (timestamp Unix da ingestão do arquivo) e, para PDFs com
+    quebras de página, page_start/page_end. Permitem restringir a busca com
+    o parâmetro `where` do RetrieverProvider.
+
+    O modelo e o cliente vêm do registro do processo (services.model_registry),
+    então vários encoders no mesmo processo compartilham uma única instância.
+
+    Modo incremental (build(incremental=True)): cada arquivo é identificado pelo
+    hash SHA-256 do conteúdo e registrado em um manifesto
+    (<db_path>/manifests/<coleção>.json). Apenas arquivos novos ou alterados são
+    convertidos e divididos, e desses só os chunks novos são embedados (os IDs
+    dos chunks vêm do conteúdo, não da posição); chunks de arquivos removidos
+    são apagados.
     """
 
+    DEFAULT_MODEL = 'paraphrase-multilingual-MiniLM-L12-v2'
+    DEFAULT_BATCH_SIZE = 256
+    # Versão do esquema dos chunks: metadados (ver _iter_document_chunks) e IDs (ver _chunk_ids)
+    METADATA_VERSION = 3
+
     def __init__(
         self,
         docs_dir: str,
@@ -36,39 +133,144 @@ class SemanticEncoder:
         overlap_size: int,
         db_path: str = "./chroma_db",
         collection_name: str = "documentos_rag",
+        model_name: str = DEFAULT_MODEL,
+        conversion_workers: Optional[int] = 1,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        chunk_unit: str = "chars",
+        dedup_threshold: Optional[float] = ChunkDeduplicator.DEFAULT_THRESHOLD,
+        backend: str = DEFAULT_BACKEND,
+        encode_workers: Optional[int] = 1,
+        lexical_index: bool = True,
     ) -> None:
+        if batch_size <= 0:
+            raise ValueError("batch_size deve ser positivo")
+        if chunk_unit not in ("chars", "tokens"):
+            raise ValueError("chunk_unit deve ser 'chars' ou 'tokens'")
+
         self.docs_dir = docs_dir
         self.chunk_size = chunk_size
         self.overlap_size = overlap_size
         self.db_path = db_path
         self.collection_name = collection_name
+        self.model_name = model_name
+        self.progress_callback = progress_callback
+        self.chunk_unit = chunk_unit
+        self.dedup_threshold = dedup_threshold
+        self.backend = validate_backend(backend)
+        self.model_key = model_key(model_name, backend)
+        self.encode_workers = resolve_workers(encode_workers)
+        self._encode_pool: Optional[EncodePool] = None
+        self.lexical_index = lexical_index
 
         # Dependências
-        self.rf = ReadFiles()
-        self.chunker = Chunks(chunk_size=self.chunk_size, overlap_size=self.overlap_size)
-        self.modelo = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-        self.client = chromadb.PersistentClient(path=self.db_path)
+        self.rf = ReadFiles(max_workers=conversion_workers)
+        self._truncation: Optional[Dict[str, Any]] = None
+        self._deduplicator: Optional[ChunkDeduplicator] = None
+        self.client = None
         self.collection = None
-
-    def build(self, reset_collection: bool = True, collection_name: Optional[str] = None) -> dict:
+        self.modelo = acquire_model(self.model_key, self._load_model)
+        try:
+            if chunk_unit == "tokens":
+                self.chunker = Chunks.for_model(self.modelo, overlap_size=self.overlap_size, chunk_size=self.chunk_size)
+                # Valores efetivos: limitados ao max_seq_length do modelo
+                self.chunk_size = self.chunker.chunk_size
+                self.overlap_size = self.chunker.overlap_size
+            else:
+                self.chunker = Chunks(chunk_size=self.chunk_size, overlap_size=self.overlap_size)
+            self.client = acquire_client(self.db_path, lambda: chromadb.PersistentClient(path=self.db_path))
+        except Exception:
+            # Sem isso a referência ao modelo ficaria presa no registro do processo
+            self.close()
+            raise
+
+        # O ChromaDB rejeita operações com mais itens que get_max_batch_size()
+        max_batch_size = getattr(self.client, "get_max_batch_size", None)
+        self.batch_size = min(batch_size, max_batch_size()) if callable(max_batch_size) else batch_size
+
+    def _load_model(self) -> SentenceTransformer:
+        """Carrega o modelo no backend configurado (apenas quando não está no registro)."""
+        if self.backend == DEFAULT_BACKEND:
+            return SentenceTransformer(self.model_name)
+        return load_sentence_transformer(self.model_name, self.backend)
+
+    def close(self) -> None:
+        """Libera o modelo e o cliente no registro do processo."""
+        if self.modelo is not None:
+            release_model(self.model_key)
+            self.modelo = None
+        if self.client is not None:
+            release_client(self.db_path)
+            self.client = None
+
+    def build(
+        self,
+        reset_collection: bool = True,
+        collection_name: Optional[str] = None,
+        incremental: bool = False,
+    ) -> dict:
         """
         Lê os documentos do diretório, cria chunks, gera embeddings e salva no ChromaDB.
 
+        Os documentos são processados em streaming, um por vez: os chunks de
+        cada arquivo são gerados apenas a partir do seu conteúdo e gravados
+        com os metadados do documento (source_file, title, páginas,
+        ingested_at) e IDs determinísticos.
+
+        Um build completo com reset_collection grava o manifesto do modo
+        incremental (hash e número de chunks de cada arquivo): o próximo
+        build incremental sem mudanças não embeda nada.
+
         Args:
             reset_collection (bool): Se verdadeiro, apaga a coleção antes de recriá-la.
+            incremental (bool): Se verdadeiro, processa apenas arquivos novos ou
+                alterados desde o último build (ignora reset_collection).
         Returns:
             dict: Estatísticas do processo (número de chunks salvos e total de documentos na coleção).
         """
         collection_name = collection_name or self.collection_name
         self.collection_name = collection_name
 
-        # 1) Ler documentos e consolidar em markdown
-        mds = self.rf.docs_to_markdown(self.docs_dir)
-
-        # 2) Criar chunks
-        text_chunks = self.chunker.create_chunks(mds)
-
-        if not text_chunks:
+        if incremental:
+            return self._build_incremental(collection_name)
+
+        # O manifesto anterior deixa de valer até o fim do build (um build
+        # interrompido não pode ser retomado como se estivesse completo)
+        manifest_path = self._manifest_path(collection_name)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+        # Pipeline em streaming: cada documento é lido, convertido, dividido,
+        # embedado e gravado antes do próximo, então a memória fica limitada
+        # ao maior documento (e não ao corpus inteiro)
+        files = self._supported_files()
+        file_hashes = {file: hash_file(os.path.join(self.docs_dir, file)) for file in files}
+        files_manifest: Dict[str, Any] = {}
+        collection = None
+        chunks_salvos = 0
+        self._reset_truncation()
+        self._reset_deduplicator()
+
+        with _BatchWriter() as writer, self._encoding():
+            # Deduplicação por arquivo, como no build incremental: o manifesto
+            # gravado no fim permite que builds incrementais removam arquivos
+            documents = self._iter_document_chunks(files, dedup_per_file=True)
+            for file, text_chunks, chunk_metadatas, plan in self._iter_encoded(documents, self._plan_all):
+                files_manifest[file] = {"hash": file_hashes[file], "chunks": len(text_chunks)}
+                if not text_chunks:
+                    continue
+
+                # A coleção só é (re)criada quando há o que gravar
+                if collection is None:
+                    collection = self._prepare_collection(collection_name, reset_collection)
+
+                chunks_salvos = self._upsert_chunks(
+                    writer, collection, file, text_chunks, chunk_metadatas, chunks_salvos,
+                    embeddings=plan["embeddings"],
+                )
+                print(f"✅ '{file}': {len(text_chunks)} chunks indexados.")
+
+        if collection is None:
             print("⚠️ Nenhum chunk foi gerado. Verifique o conteúdo em 'docs'.")
             try:
                 existing_collection = self.client.get_collection(name=collection_name)
@@ -81,11 +283,115 @@ class SemanticEncoder:
                 "total_documentos": total_docs,
             }
 
-        # 3) Gerar embeddings
-        base_vetorial_documentos = self.modelo.encode(text_chunks)
-        embeddings = base_vetorial_documentos.tolist()  # ChromaDB requer lista
+        self.collection = collection
+        # Sem reset, a coleção pode guardar chunks antigos que o manifesto não descreve
+        if reset_collection:
+            self._save_manifest(manifest_path, self._index_settings(), files_manifest)
+        print(f"✅ Salvos {chunks_salvos} chunks no ChromaDB!")
+        print(
+            f"📊 Coleção '{self.collection_name}' agora possui {self.collection.count()} documentos"
+        )
+
+        return {
+            "chunks_salvos": chunks_salvos,
+            "colecao": self.collection_name,
+            "total_documentos": self.collection.count(),
+            **self._build_lexical_index(collection_name, changed=True),
+            "cache_conversao": self.rf.cache_stats(),
+            **self._truncation_stats(),
+            **self._dedup_stats(),
+        }
+
+    def _supported_files(self) -> List[str]:
+        """Arquivos suportados do diretório de documentos, em ordem estável."""
+        return sorted(file for file in self.rf.read_dir(self.docs_dir) if self.rf.is_supported(file))
+
+    def _iter_document_chunks(
+        self, files: List[str], dedup_per_file: bool = False
+    ) -> Iterator[Tuple[str, List[str], List[Dict[str, Any]]]]:
+        """
+        Gera (arquivo, chunks, metadados dos chunks) um documento por vez, já
+        sem duplicatas.
+
+        Os chunks nunca atravessam a fronteira entre dois documentos. Com
+        dedup_per_file, cada arquivo só é deduplicado contra si mesmo. Os
+        metadados trazem o título, a ingestão e, quando o documento tem
+        quebras de página, as páginas de cada chunk.
+        """
+        paths = [os.path.join(self.docs_dir, file) for file in files]
+        for file, markdown in self.rf.iter_markdown(paths):
+            chunks = list(self.chunker.iter_chunks(markdown)) if markdown else []
+            if self._deduplicator is not None:
+                if dedup_per_file:
+                    self._deduplicator.clear_index()
+                chunks = [chunk for chunk in chunks if self._deduplicator.add(chunk.text)]
+            text_chunks = [chunk.text for chunk in chunks]
+
+            document = {"title": document_title(markdown, file), "ingested_at": int(time.time())}
+            breaks = page_breaks(markdown)
+            chunk_metadatas = []
+            for chunk in chunks:
+                pages = page_range(breaks, chunk.start, chunk.end)
+                chunk_metadatas.append(
+                    document if pages is None else {**document, "page_start": pages[0], "page_end": pages[1]}
+                )
+            yield file, text_chunks, chunk_metadatas
+
+    def _reset_deduplicator(self) -> None:
+        if self.dedup_threshold is None:
+            self._deduplicator = None
+        else:
+            self._deduplicator = ChunkDeduplicator(threshold=self.dedup_threshold)
+
+    def _dedup_stats(self) -> Dict[str, Any]:
+        """Estatística "deduplicacao" do build (vazia se desativada)."""
+        if self._deduplicator is None:
+            return {}
+        stats = self._deduplicator.stats()
+        removed = stats["duplicados_exatos"] + stats["quase_duplicados"]
+        if removed:
+            print(f"🧹 {removed} chunks duplicados descartados antes do embedding.")
+        return {"deduplicacao": stats}
+
+    def _reset_truncation(self) -> None:
+        """
+        Zera a contagem de tokens truncados do build. Só se aplica ao modo por
+        caracteres com um modelo que expõe tokenizer e max_seq_length.
+        """
+        measurable = hasattr(self.modelo, "tokenizer") and hasattr(self.modelo, "max_seq_length")
+        if self.chunk_unit == "chars" and measurable:
+            self._truncation = {"chunks_truncados": 0, "tokens_total": 0, "tokens_truncados": 0}
+        else:
+            self._truncation = None
+
+    def _track_truncation(self, text_chunks: List[str], lengths: Optional[Any] = None) -> None:
+        """Soma ao build o truncamento dos chunks embedados (lengths: ver Chunks.truncation_report)."""
+        if self._truncation is None or not text_chunks:
+            return
+        report = self.chunker.truncation_report(text_chunks, self.modelo, lengths=lengths)
+        for key in self._truncation:
+            self._truncation[key] += report[key]
+
+    def _truncation_stats(self) -> Dict[str, Any]:
+        """Estatística "truncamento" do build (vazia no modo por tokens)."""
+        if self._truncation is None:
+            return {}
+        total = self._truncation["tokens_total"]
+        truncated = self._truncation["tokens_truncados"]
+        if truncated:
+            print(
+                f"✂️ {truncated} de {total} tokens ({truncated / total:.1%}) excederam o limite do modelo "
+                f"e não foram embedados. Considere chunk_unit='tokens'."
+            )
+        return {
+            "truncamento": {
+                **self._truncation,
+                "fracao_truncada": round(truncated / total, 4) if total else 0.0,
+            }
+        }
 
-        # 4) (Re)criar/obter coleção
+    def _prepare_collection(self, collection_name: str, reset_collection: bool) -> Any:
+        """Apaga (opcionalmente) e obtém/cria a coleção de destino."""
         if reset_collection:
             try:
                 self.client.delete_collection(name=collection_name)
@@ -93,43 +399,385 @@ class SemanticEncoder:
             except Exception:
                 pass
 
+        return self.client.get_or_create_collection(
+            name=collection_name,
+            metadata={"description": "Coleção de chunks de documentos com embeddings"},
+        )
+
+    @contextmanager
+    def _encoding(self) -> Iterator[None]:
+        """
+        Mantém o pool de processos de embedding aberto durante o build.
+
+        Os processos só são iniciados no primeiro micro-batch: um build
+        incremental sem arquivos alterados não paga o custo de iniciá-los.
+        """
+        if self.encode_workers == 1:
+            yield
+            return
+
+        self._encode_pool = EncodePool(self.modelo, self.encode_workers)
         try:
-            self.collection = self.client.get_collection(name=collection_name)
-        except Exception:
-            self.collection = self.client.create_collection(
-                name=collection_name,
-                metadata={"description": "Coleção de chunks de documentos com embeddings"},
+            yield
+        finally:
+            pool, self._encode_pool = self._encode_pool, None
+            pool.close()
+
+    def _encode(self, batch: List[str]) -> Any:
+        """
+        Embeddings de um micro-batch, no pool de processos quando ativo.
+
+        Os chunks são agrupados por comprimento em tokens: os fragmentos
+        finais de cada documento não pagam o padding dos chunks cheios. No
+        modo por caracteres, o batch é tokenizado uma única vez para o
+        relatório de truncamento e para os buckets (fora o encode do modelo).
+        """
+        lengths = None
+        if self._truncation is not None and batch:
+            if has_fast_tokenizer(self.modelo):
+                lengths = token_lengths(self.modelo, batch, truncate=False)
+            self._track_truncation(batch, lengths)
+        if self._encode_pool is not None:
+            return self._encode_pool.encode(batch, lengths=lengths)
+        return encode_bucketed(self.modelo, batch, lengths=lengths)
+
+    def _encode_window(self) -> int:
+        """
+        Chunks por chamada ao pool de processos (0 sem pool): vários
+        micro-batches, para que cada processo receba vários shards.
+        """
+        if self._encode_pool is None:
+            return 0
+        return window_size(self._encode_pool.workers, EncodePool.DEFAULT_BATCH_SIZE, self.batch_size)
+
+    def _iter_encoded(
+        self,
+        documents: Iterator[Tuple[str, List[str], List[Dict[str, Any]]]],
+        plan_document: Callable[[str, List[str]], Dict[str, Any]],
+    ) -> Iterator[Tuple[str, List[str], List[Dict[str, Any]], Dict[str, Any]]]:
+        """
+        Gera (arquivo, chunks, metadados, plano) para cada documento.
+
+        `plan_document` decide quais chunks embedar (key positions). Com o
+        pool de processos, os documentos seguintes são lidos até somar
+        _encode_window() chunks a embedar, que vão ao pool em uma única
+        chamada; o plano de cada documento recebe a sua fatia (key
+        embeddings). Sem pool, embeddings é None e cada micro-batch é
+        embedado em _upsert_chunks, documento por documento.
+        """
+        window = self._encode_window()
+        pending: List[Tuple[str, List[str], List[Dict[str, Any]], Dict[str, Any]]] = []
+        n_pending = 0
+        for file, text_chunks, chunk_metadatas in documents:
+            plan = {**plan_document(file, text_chunks), "embeddings": None}
+            if not window:
+                yield file, text_chunks, chunk_metadatas, plan
+                continue
+            pending.append((file, text_chunks, chunk_metadatas, plan))
+            n_pending += len(plan["positions"])
+            if n_pending >= window:
+                yield from self._encode_pending(pending)
+                pending, n_pending = [], 0
+        yield from self._encode_pending(pending)
+
+    def _encode_pending(
+        self, pending: List[Tuple[str, List[str], List[Dict[str, Any]], Dict[str, Any]]]
+    ) -> Iterator[Tuple[str, List[str], List[Dict[str, Any]], Dict[str, Any]]]:
+        """Embeda os chunks de vários documentos de uma vez e divide o resultado por documento."""
+        texts = [text_chunks[i] for _, text_chunks, _, plan in pending for i in plan["positions"]]
+        embeddings = self._encode(texts) if texts else None
+        offset = 0
+        for file, text_chunks, chunk_metadatas, plan in pending:
+            n = len(plan["positions"])
+            if embeddings is not None:
+                plan["embeddings"] = embeddings[offset:offset + n]
+            offset += n
+            yield file, text_chunks, chunk_metadatas, plan
+
+    @staticmethod
+    def _plan_all(file: str, text_chunks: List[str]) -> Dict[str, Any]:
+        """Build completo: todos os chunks do arquivo são embedados."""
+        return {"positions": list(range(len(text_chunks)))}
+
+    def _plan_new_chunks(self, file: str, text_chunks: List[str]) -> Dict[str, Any]:
+        """
+        Build incremental: só os chunks com IDs que ainda não estão na coleção.
+
+        IDs derivados do conteúdo: um chunk que não mudou mantém o ID mesmo
+        que mude de posição. Os IDs gravados incluem os de um build
+        interrompido antes de o arquivo entrar no manifesto.
+        """
+        assert self.collection is not None, "Collection não foi inicializada"
+        ids = self._chunk_ids(file, text_chunks)
+        stored = set(self.collection.get(where={"source_file": file}, include=[])["ids"])
+        return {
+            "ids": ids,
+            "stale": sorted(stored.difference(ids)),
+            "positions": [i for i, chunk_id in enumerate(ids) if chunk_id not in stored],
+            "kept": [i for i, chunk_id in enumerate(ids) if chunk_id in stored],
+        }
+
+    def _upsert_chunks(
+        self,
+        writer: _BatchWriter,
+        collection: Any,
+        file: str,
+        text_chunks: List[str],
+        chunk_metadatas: List[Dict[str, Any]],
+        chunks_salvos: int = 0,
+        positions: Optional[List[int]] = None,
+        ids: Optional[List[str]] = None,
+        embeddings: Optional[Any] = None,
+    ) -> int:
+        """
+        Gera os embeddings dos chunks de um arquivo e faz upsert na coleção
+        em micro-batches de `batch_size`.
+
+        Args:
+            writer: Executor das gravações (sobrepõe embedding e upsert)
+            collection: Coleção de destino
+            file: Nome do arquivo de origem (metadado `source_file`)
+            text_chunks: Chunks do arquivo
+            chunk_metadatas: Metadados de documento de cada chunk (título, páginas, ingestão)
+            chunks_salvos: Chunks já enviados neste build (para o progresso)
+            positions: Posições dos chunks a embedar (default: todos). O build
+                       incremental passa apenas os chunks novos do arquivo
+            ids: IDs dos chunks (default: calculados com _chunk_ids)
+            embeddings: Embeddings já calculados dos chunks em `positions`
+                        (ver _iter_encoded). Default: embedados aqui, por micro-batch
+
+        Returns:
+            int: Total de chunks enviados no build, incluindo os deste arquivo
+        """
+        if ids is None:
+            ids = self._chunk_ids(file, text_chunks)
+        if positions is None:
+            positions = list(range(len(text_chunks)))
+        total = len(positions)
+        for start in range(0, total, self.batch_size):
+            batch_positions = positions[start:start + self.batch_size]
+            batch = [text_chunks[i] for i in batch_positions]
+
+            if embeddings is None:
+                batch_embeddings = self._encode(batch)
+            else:
+                batch_embeddings = embeddings[start:start + self.batch_size]
+            writer.submit(
+                collection.upsert,
+                ids=[ids[i] for i in batch_positions],
+                embeddings=batch_embeddings.tolist(),  # ChromaDB requer lista
+                documents=batch,
+                metadatas=cast(Any, [
+                    self._chunk_metadata(file, i, text_chunks[i], chunk_metadatas[i]) for i in batch_positions
+                ]),
             )
 
-        # 5) Inserir dados
-        ids = [str(uuid.uuid4()) for _ in range(len(text_chunks))]
-        metadatas: List[Dict[str, Any]] = [
-            {
-                "chunk_id": i,
-                "chunk_size": len(chunk),
-                "source": self.docs_dir,
-            }
-            for i, chunk in enumerate(text_chunks)
-        ]
+            chunks_salvos += len(batch)
+            if self.progress_callback is not None:
+                self.progress_callback({
+                    "arquivo": file,
+                    "chunks_arquivo": start + len(batch),
+                    "total_arquivo": total,
+                    "chunks_salvos": chunks_salvos,
+                })
+
+        return chunks_salvos
+
+    def _chunk_metadata(
+        self, file: str, index: int, chunk: str, document_metadata: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Metadados gravados com o chunk na posição `index` do arquivo."""
+        return {
+            "chunk_id": index,
+            "chunk_size": len(chunk),
+            "source": self.docs_dir,
+            "source_file": file,
+            **document_metadata,
+        }
+
+    # ==================== BUILD INCREMENTAL ====================
 
-        self.collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            documents=text_chunks,
-            metadatas=cast(Any, metadatas),
+    def _build_incremental(self, collection_name: str) -> dict:
+        """
+        Sincroniza a coleção com o diretório processando apenas o que mudou.
+
+        Os chunks de cada arquivo recebem IDs determinísticos derivados do
+        conteúdo (ver _chunk_ids) e o metadado `source_file`. Em um arquivo
+        alterado, apenas os chunks com IDs novos são embedados; os que
+        sumiram são apagados e os mantidos só têm os metadados atualizados.
+        Se não houver manifesto (ou se chunk_size, overlap_size ou o modelo
+        mudaram), a coleção é reconstruída por arquivo.
+        """
+        manifest_path = self._manifest_path(collection_name)
+        manifest = self._load_manifest(manifest_path)
+        settings = self._index_settings()
+
+        if manifest is None or manifest.get("settings") != settings:
+            print(f"🔁 Sem manifesto compatível para '{collection_name}': reconstruindo a coleção.")
+            try:
+                self.client.delete_collection(name=collection_name)
+            except Exception:
+                pass
+            previous_files: Dict[str, Any] = {}
+        else:
+            previous_files = manifest.get("files", {})
+
+        self.collection = self.client.get_or_create_collection(
+            name=collection_name,
+            metadata={"description": "Coleção de chunks de documentos com embeddings"},
         )
 
-        print(f"✅ Salvos {len(text_chunks)} chunks no ChromaDB!")
+        # 1) Hash de conteúdo de cada arquivo suportado
+        current_hashes = {
+            file: hash_file(os.path.join(self.docs_dir, file))
+            for file in self._supported_files()
+        }
+
+        removed = [file for file in previous_files if file not in current_hashes]
+        changed = [
+            file for file, file_hash in current_hashes.items()
+            if previous_files.get(file, {}).get("hash") != file_hash
+        ]
+        unchanged = len(current_hashes) - len(changed)
+
+        files_manifest = {
+            file: entry for file, entry in previous_files.items()
+            if file in current_hashes and file not in changed
+        }
+
+        # 2) Apagar chunks de arquivos removidos
+        for file in removed:
+            self.collection.delete(where={"source_file": file})
+            print(f"🗑️ Chunks de '{file}' removidos da coleção.")
+        if removed:
+            self._save_manifest(manifest_path, settings, files_manifest)
+
+        # 3) Converter, dividir, embedar e fazer upsert dos arquivos alterados,
+        #    um documento por vez
+        chunks_salvos = 0
+        self._reset_truncation()
+        self._reset_deduplicator()
+        chunks_reaproveitados = 0
+        with _BatchWriter() as writer, self._encoding():
+            # Deduplicação por arquivo: um chunk nunca depende de outro arquivo,
+            # que poderia ser removido em um build posterior
+            documents = self._iter_document_chunks(changed, dedup_per_file=True)
+            for file, text_chunks, chunk_metadatas, plan in self._iter_encoded(documents, self._plan_new_chunks):
+                ids, stale = plan["ids"], plan["stale"]
+                new_positions, kept_positions = plan["positions"], plan["kept"]
+
+                # Gravações seguem a ordem de envio: delete antes dos upserts do arquivo
+                if stale:
+                    writer.submit(self.collection.delete, ids=stale)
+                # Chunks mantidos: apenas os metadados (posição, páginas, ingestão), sem embedding
+                for start in range(0, len(kept_positions), self.batch_size):
+                    batch_positions = kept_positions[start:start + self.batch_size]
+                    writer.submit(
+                        self.collection.update,
+                        ids=[ids[i] for i in batch_positions],
+                        metadatas=cast(Any, [
+                            self._chunk_metadata(file, i, text_chunks[i], chunk_metadatas[i])
+                            for i in batch_positions
+                        ]),
+                    )
+                chunks_salvos = self._upsert_chunks(
+                    writer, self.collection, file, text_chunks, chunk_metadatas, chunks_salvos,
+                    positions=new_positions, ids=ids, embeddings=plan["embeddings"],
+                )
+                chunks_reaproveitados += len(kept_positions)
+                print(
+                    f"✅ '{file}': {len(new_positions)} chunks novos, "
+                    f"{len(kept_positions)} reaproveitados, {len(stale)} removidos."
+                )
+
+                # Manifesto salvo por arquivo, depois dos seus upserts:
+                # uma interrupção não perde o progresso
+                files_manifest[file] = {"hash": current_hashes[file], "chunks": len(text_chunks)}
+                writer.submit(self._save_manifest, manifest_path, settings, dict(files_manifest))
+
+        self._save_manifest(manifest_path, settings, files_manifest)
+
         print(
-            f"📊 Coleção '{self.collection_name}' agora possui {self.collection.count()} documentos"
+            f"📊 Coleção '{collection_name}': {len(changed)} arquivo(s) processado(s), "
+            f"{unchanged} inalterado(s), {len(removed)} removido(s)."
         )
 
         return {
-            "chunks_salvos": len(text_chunks),
-            "colecao": self.collection_name,
+            "chunks_salvos": chunks_salvos,
+            "chunks_reaproveitados": chunks_reaproveitados,
+            "colecao": collection_name,
             "total_documentos": self.collection.count(),
+            "arquivos_processados": changed,
+            "arquivos_removidos": removed,
+            "arquivos_inalterados": unchanged,
+            **self._build_lexical_index(collection_name, changed=bool(changed or removed)),
+            "cache_conversao": self.rf.cache_stats(),
+            **self._truncation_stats(),
+            **self._dedup_stats(),
+        }
+
+    def _build_lexical_index(self, collection_name: str, changed: bool) -> Dict[str, Any]:
+        """
+        Recria o índice BM25 a partir da coleção (fonte da verdade após o build).
+
+        Sem mudanças na coleção, um índice existente é mantido.
+        """
+        path = bm25_index_path(self.db_path, collection_name)
+        if not self.lexical_index or self.collection is None or (not changed and os.path.exists(path)):
+            return {}
+        return {"indice_bm25": build_bm25_index(self.collection, path)}
+
+    def _index_settings(self) -> Dict[str, Any]:
+        """Parâmetros que, se alterados, invalidam todos os chunks já indexados."""
+        return {
+            "chunk_size": self.chunk_size,
+            "overlap_size": self.overlap_size,
+            "model_name": self.model_name,
+            "chunk_unit": self.chunk_unit,
+            "dedup_threshold": self.dedup_threshold,
+            "backend": self.backend,
+            # Novos campos de metadados exigem reindexar os chunks antigos
+            "metadata_version": self.METADATA_VERSION,
         }
 
+    def _manifest_path(self, collection_name: str) -> str:
+        return os.path.join(self.db_path, "manifests", f"{collection_name}.json")
+
+    @staticmethod
+    def _load_manifest(manifest_path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    @staticmethod
+    def _save_manifest(manifest_path: str, settings: Dict[str, Any], files: Dict[str, Any]) -> None:
+        """Grava o manifesto de forma atômica (arquivo temporário + replace)."""
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "files": files}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    @staticmethod
+    def _chunk_ids(source_file: str, text_chunks: List[str]) -> List[str]:
+        """
+        IDs determinísticos dos chunks de um arquivo: arquivo + hash do texto +
+        ocorrência (para chunks idênticos repetidos no arquivo).
+
+        A posição não entra no ID: um chunk cujo texto não mudou mantém o ID
+        mesmo que outro chunk antes dele seja removido, e não é embedado de novo.
+        """
+        occurrences: Counter = Counter()
+        ids = []
+        for chunk in text_chunks:
+            digest = hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+            key = f"{source_file}\x00{digest}\x00{occurrences[digest]}"
+            occurrences[digest] += 1
+            ids.append(hashlib.sha256(key.encode("utf-8")).hexdigest()[:32])
+        return ids
+
 
 
 if __name__ == "__main__":
@@ -141,6 +789,23 @@ if __name__ == "__main__":
     docs_base = os.path.join(script_dir, "docs")
     chroma_db_path = os.path.join(script_dir, "RAG_visual_lab", "chroma_db")
 
+    # Por padrão apenas arquivos novos/alterados são reprocessados;
+    # use `python semantic_encoder.py --full` para reconstruir tudo.
+    incremental = "--full" not in sys.argv
+    # Backend do modelo: `--backend=onnx-int8` quantiza o modelo (mais rápido em CPU)
+    backend = next((arg.split("=", 1)[1] for arg in sys.argv if arg.startswith("--backend=")), "torch")
+    # Processos de embedding: `--encode-workers=N` (padrão: 1, no processo principal).
+    # O pool é opcional: a conversão já usa um processo por núcleo e os dois
+    # pools juntos disputariam os mesmos núcleos
+    encode_workers = next(
+        (int(arg.split("=", 1)[1]) for arg in sys.argv if arg.startswith("--encode-workers=")), 1
+    )
+    # Exporta cada coleção para o índice flat (RetrieverProvider(vector_store="flat")):
+    # `--export-flat` (float32), `--export-flat=float16` ou `--export-flat=int8`
+    export_flat = next(
+        (arg.partition("=")[2] or "float32" for arg in sys.argv if arg.startswith("--export-flat")), None
+    )
+
     # Lista de datasets para processar (nome da coleção -> subpasta em docs)
     datasets = [
         {"name": "synthetic_dataset_papers", "subdir": "synthetic_dataset_papers"},
@@ -165,9 +830,21 @@ if __name__ == "__main__":
                 overlap_size=500,
                 db_path=chroma_db_path,
                 collection_name=ds["name"],
+                conversion_workers=None,  # um processo de conversão por núcleo
+                backend=backend,
+                encode_workers=encode_workers,
             )
 
-            stats = retriever.build(collection_name=ds["name"])
+            try:
+                stats = retriever.build(collection_name=ds["name"], incremental=incremental)
+                if export_flat and retriever.collection is not None:
+                    stats["indice_flat"] = export_flat_index(
+                        retriever.collection,
+                        flat_index_path(chroma_db_path, ds["name"]),
+                        dtype=export_flat,
+                    )
+            finally:
+                retriever.close()
             results[ds["name"]] = stats
 
         except Exception as e: